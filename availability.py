@@ -0,0 +1,148 @@
+"""
+Брони по времени: разбор введённых гостем даты/времени в ISO и загрузка зала по слотам.
+
+Гости пишут «26 января», «26.01», «завтра», «в пятницу» и «19:30», «19.30», «1930».
+normalize_slot() превращает это в 'YYYY-MM-DDTHH:MM' (локальное время заведения),
+а Availability держит в памяти занятые места по слотам на каждый день.
+"""
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+_MONTHS = {
+    "янв": 1, "фев": 2, "мар": 3, "апр": 4, "мая": 5, "май": 5, "июн": 6,
+    "июл": 7, "авг": 8, "сен": 9, "окт": 10, "ноя": 11, "дек": 12,
+}
+_WEEKDAYS = {"пон": 0, "вто": 1, "сре": 2, "чет": 3, "пят": 4, "суб": 5, "вос": 6}
+_RELATIVE = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
+
+_NUMERIC_DATE_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$|^(\d{1,2})[./-](\d{1,2})(?:[./-](\d{2,4}))?$")
+_WORD_DATE_RE = re.compile(r"^(\d{1,2})\s+([а-яё]+)\.?(?:\s+(\d{4}))?")
+_TIME_RE = re.compile(r"(\d{1,2})(?:\s*[:.\-\s]\s*(\d{2})|(\d{2}))?(?:\s*(?:ч|час\w*))?$")
+
+
+def parse_date(text: str, today: date) -> Optional[date]:
+    """Дата из ввода гостя. Без года — ближайшая такая дата не раньше вчерашнего дня."""
+    s = text.strip().lower().removeprefix("на ").removeprefix("в ").removeprefix("во ").strip()
+    if not s:
+        return None
+    if s in _RELATIVE:
+        return today + timedelta(days=_RELATIVE[s])
+    if s[:3] in _WEEKDAYS and not s[0].isdigit():
+        return today + timedelta(days=(_WEEKDAYS[s[:3]] - today.weekday()) % 7)
+
+    year: Optional[int] = None
+    m = _NUMERIC_DATE_RE.match(s)
+    if m:
+        if m.group(1):
+            year, month, day = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        else:
+            day, month = int(m.group(4)), int(m.group(5))
+            if m.group(6):
+                year = int(m.group(6))
+                if year < 100:
+                    year += 2000
+    else:
+        m = _WORD_DATE_RE.match(s)
+        if not m or m.group(2)[:3] not in _MONTHS:
+            return None
+        day, month = int(m.group(1)), _MONTHS[m.group(2)[:3]]
+        if m.group(3):
+            year = int(m.group(3))
+
+    try:
+        if year is not None:
+            return date(year, month, day)
+        d = date(today.year, month, day)
+        if d < today - timedelta(days=1):
+            d = date(today.year + 1, month, day)
+        return d
+    except ValueError:
+        return None
+
+
+def parse_time(text: str) -> Optional[time]:
+    s = text.strip().lower().removeprefix("в ").removeprefix("к ").strip()
+    m = _TIME_RE.match(s)
+    if not m:
+        return None
+    hour = int(m.group(1))
+    minute = int(m.group(2) or m.group(3) or 0)
+    if hour == 24 and minute == 0:
+        hour = 0
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return time(hour, minute)
+
+
+def normalize_slot(date_text: str, time_text: str, today: date) -> Optional[str]:
+    """'26 января' + '19:30' → '2026-01-26T19:30'; не разобрали — None."""
+    d = parse_date(date_text, today)
+    t = parse_time(time_text)
+    if d is None or t is None:
+        return None
+    return datetime.combine(d, t).strftime("%Y-%m-%dT%H:%M")
+
+
+# ==========================================================
+# ЗАГРУЗКА ЗАЛА
+# ==========================================================
+class Availability:
+    """
+    Занятые места по слотам: day ('YYYY-MM-DD') -> список длиной 24*60/slot.
+
+    Бронь на T занимает duration минут, т.е. span слотов начиная с T
+    (через полночь — в следующий день). Проверка «сядут ли N гостей в T» —
+    максимум по span ячейкам: от числа броней не зависит.
+    """
+
+    def __init__(self, capacity: int, slot_minutes: int = 30, duration_minutes: int = 120) -> None:
+        self.capacity = capacity
+        self.slot_minutes = slot_minutes
+        self.span = max(1, -(-duration_minutes // slot_minutes))
+        self.per_day = 24 * 60 // slot_minutes
+        self._days: dict[str, list[int]] = {}
+
+    def _cells(self, slot_at: str, create: bool) -> Iterator[tuple[Optional[list[int]], int]]:
+        start = datetime.strptime(slot_at, "%Y-%m-%dT%H:%M")
+        day = start.date()
+        idx = (start.hour * 60 + start.minute) // self.slot_minutes
+        for _ in range(self.span):
+            if idx >= self.per_day:
+                day += timedelta(days=1)
+                idx = 0
+            key = day.isoformat()
+            cells = self._days.get(key)
+            if cells is None and create:
+                cells = self._days[key] = [0] * self.per_day
+            yield cells, idx
+            idx += 1
+
+    def add(self, slot_at: str, guests: int) -> None:
+        for cells, idx in self._cells(slot_at, create=True):
+            cells[idx] += guests
+
+    def taken(self, slot_at: str) -> int:
+        return max((cells[idx] if cells else 0) for cells, idx in self._cells(slot_at, create=False))
+
+    def free(self, slot_at: str) -> int:
+        return self.capacity - self.taken(slot_at)
+
+    def can_seat(self, slot_at: str, guests: int) -> bool:
+        return guests <= self.free(slot_at)
+
+    def day(self, d: date) -> list[int]:
+        """Занято мест по каждому слоту дня (копия)."""
+        return list(self._days.get(d.isoformat()) or [0] * self.per_day)
+
+    def slot_label(self, idx: int) -> str:
+        minutes = idx * self.slot_minutes
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def prune(self, before: date) -> None:
+        """Выкинуть прошедшие дни, чтобы память не росла."""
+        cutoff = before.isoformat()
+        for key in [k for k in self._days if k < cutoff]:
+            del self._days[key]
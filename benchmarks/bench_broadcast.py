@@ -0,0 +1,176 @@
+"""
+Рассылка гостям (broadcast.py) на десятках тысяч получателей.
+
+Во временной БД — гости с бронями и предзаказами (часть пересекается,
+у многих по нескольку записей). Bot API — StubRequest с задержкой;
+каждый BLOCK_EVERY-й гость «заблокировал бота» и получает 403.
+
+1) Рассылка с афишей: посреди прогона задача убивается (как падение
+   процесса), новый Broadcaster продолжает её с курсора. Считаем дубли
+   по чатам, потерянных на обрыве, сколько раз файл грузился целиком
+   и пик памяти (tracemalloc; в нём и журнал вызовов StubRequest).
+2) Вторая рассылка текстом: заблокировавшим бота не должно уйти ничего.
+
+Запуск:  python benchmarks/bench_broadcast.py [--guests 30000] [--latency-ms 5]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import db  # noqa: E402
+import harness  # noqa: E402
+from broadcast import Broadcaster  # noqa: E402
+from fake_bot_api import _chat_id  # noqa: E402
+from media_cache import MediaCache  # noqa: E402
+from ratelimit import TelegramRateLimiter  # noqa: E402
+from stub_bot import StubRequest  # noqa: E402
+from telegram import Bot  # noqa: E402
+from telegram.request import RequestData  # noqa: E402
+
+BLOCK_EVERY = 50
+FIRST_ID = 100_000
+SEND_METHODS = ("sendMessage", "sendDocument")
+
+
+class BlockingStub(StubRequest):
+    """Каждый BLOCK_EVERY-й гость заблокировал бота: 403 на любую отправку."""
+
+    async def do_request(self, url: str, method: str, request_data: RequestData | None = None, **kw) -> tuple[int, bytes]:
+        code, body = await super().do_request(url, method, request_data, **kw)
+        params = request_data.parameters if request_data else {}
+        if url.rsplit("/", 1)[-1] in SEND_METHODS and _chat_id(params) % BLOCK_EVERY == 0:
+            return 403, json.dumps(
+                {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            ).encode()
+        return code, body
+
+
+def fill(guests: int) -> None:
+    """Брони у всех гостей (у каждого третьего — две), предзаказы у каждого второго."""
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO bookings (tg_user_id, date, time, guests, name, phone) VALUES (?, '26 января', '19:30', 2, 'Гость', '+7999')",
+            ((FIRST_ID + i,) for i in range(guests) for _ in range(2 if i % 3 == 0 else 1)),
+        )
+        conn.executemany(
+            "INSERT INTO preorders (tg_user_id, phone) VALUES (?, '+7999')",
+            ((FIRST_ID + i,) for i in range(0, guests, 2)),
+        )
+        # гости только с предзаказом — за хвостом броней
+        conn.executemany(
+            "INSERT INTO preorders (tg_user_id, phone) VALUES (?, '+7999')",
+            ((FIRST_ID + guests + i,) for i in range(guests // 10)),
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def make_broadcaster(bot: Bot, assets: Path) -> Broadcaster:
+    unlimited = TelegramRateLimiter(per_second=10**9)
+    return Broadcaster(bot, unlimited, MediaCache(), assets, per_second=10**9)
+
+
+async def run(guests: int, latency: float, assets: Path) -> dict:
+    stub = BlockingStub(latency=latency)
+    bot = Bot("123:bench", request=stub, get_updates_request=stub)
+    await bot.initialize()
+    total = guests + guests // 10
+    expected_blocked = sum(1 for i in range(FIRST_ID, FIRST_ID + total) if i % BLOCK_EVERY == 0)
+    report: dict = {"recipients": total}
+
+    try:
+        bid = await db.create_broadcast(-1001, "Афиша на неделю", "events.pdf")
+
+        # 1) прогон, убитый посередине
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        first = make_broadcaster(bot, assets)
+        task = asyncio.create_task(first.run_broadcast(await db.running_broadcast()))
+        while sum(1 for c in stub.calls if c.method in SEND_METHODS) < total // 2:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        killed_at = sum(1 for c in stub.calls if c.method in SEND_METHODS)
+
+        # 2) «после рестарта»: новый объект, тот же курсор в БД
+        resumed = make_broadcaster(bot, assets)
+        row = await db.running_broadcast()
+        resumed_from = row["cursor"]
+        await resumed.run_broadcast(row)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        sends = [c for c in stub.calls if c.method in SEND_METHODS]
+        per_chat = Counter(_chat_id(c.params) for c in sends)
+        done = await db.last_broadcast()
+        report["first"] = {
+            "status": done["status"],
+            "elapsed_s": round(elapsed, 2),
+            "sends_per_s": round(len(sends) / elapsed, 1),
+            "killed_after_sends": killed_at,
+            "resumed_after_user_id": resumed_from,
+            "sent": done["sent"],
+            "blocked": done["blocked"],
+            "failed": done["failed"],
+            "expected_blocked": expected_blocked,
+            "chats_with_duplicates": sum(1 for n in per_chat.values() if n > 1),
+            "lost_on_kill": total - len(per_chat),
+            # загрузка файла целиком — в params нет file_id (строки doc-...)
+            "file_uploads": sum(1 for c in sends if c.method == "sendDocument" and not str(c.params.get("document", "")).startswith("doc-")),
+            "peak_mem_mb": round(peak / 2**20, 2),
+        }
+
+        # 3) вторая рассылка: заблокировавшие пропускаются без запросов
+        mark = len(stub.calls)
+        await db.create_broadcast(-1001, "Сегодня живая музыка")
+        await make_broadcaster(bot, assets).run_broadcast(await db.running_broadcast())
+        second = [c for c in stub.calls[mark:] if c.method in SEND_METHODS]
+        done = await db.last_broadcast()
+        report["second"] = {
+            "status": done["status"],
+            "sends": len(second),
+            "sent": done["sent"],
+            "blocked_contacted": sum(1 for c in second if _chat_id(c.params) % BLOCK_EVERY == 0),
+        }
+        report["broadcast_id"] = bid
+    finally:
+        await bot.shutdown()
+        await db.close_db()
+    return report
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--guests", type=int, default=30_000)
+    ap.add_argument("--latency-ms", type=float, default=5.0)
+    args = ap.parse_args()
+
+    with harness.temp_db() as tmp:
+        fill(args.guests)
+        assets = tmp / "assets"
+        assets.mkdir()
+        (assets / "events.pdf").write_bytes(b"%PDF-1.4 bench" * 1000)
+        report = asyncio.run(run(args.guests, args.latency_ms / 1000, assets))
+
+    harness.report("broadcast", args, report)
+
+
+if __name__ == "__main__":
+    main()
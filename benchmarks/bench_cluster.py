@@ -0,0 +1,174 @@
+"""
+Кластерный режим на одной машине: ingress + N процессов-воркеров против фейкового Bot API.
+
+Поднимает FakeBotApi с задержкой ответа, запускает bot.py с BOT_MODE=cluster
+и шлёт на вебхук предзаказы из многих чатов: чаты параллельно, внутри чата
+по очереди. Для сравнения — то же при CLUSTER_WORKERS=1.
+
+Проверяем:
+  • порядок внутри чата — предзаказы гостя в БД идут в том же порядке, что он их отправил;
+  • общий лимитер — сообщений персоналу за любую секунду не больше GLOBAL_PER_SECOND
+    на все воркеры вместе.
+
+Запуск:  python benchmarks/bench_cluster.py [--chats 50] [--per-chat 4] [--workers 1,4]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import harness  # noqa: E402
+from fake_bot_api import FakeBotApi, _chat_id  # noqa: E402
+from ratelimit import GLOBAL_PER_SECOND  # noqa: E402
+
+# личный чат сотрудника: у групп ещё лимит 20/мин, он бы растянул замер на минуты
+STAFF_CHAT_ID = 7001
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def preorder_update(user_id: int, seq: int) -> dict:
+    payload = {
+        "type": "preorder",
+        "phone": "+79990000000",
+        "desired_time": "19:30",
+        "comment": str(seq),
+        "items": [{"id": "beer", "name": "Пиво", "qty": 1, "sum": 350}],
+        "total": 350,
+    }
+    return {
+        "message": {
+            "message_id": seq,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Guest"},
+            "web_app_data": {"data": json.dumps(payload), "button_text": "Заказ"},
+        }
+    }
+
+
+def _max_per_second(ts: list[float]) -> int:
+    ts = sorted(ts)
+    best = lo = 0
+    for hi, t in enumerate(ts):
+        while ts[lo] <= t - 1.0:
+            lo += 1
+        best = max(best, hi - lo + 1)
+    return best
+
+
+async def run(workers: int, chats: int, per_chat: int, latency: float, tmp: Path) -> dict:
+    api = FakeBotApi(latency=latency)
+    port = await api.start()
+    hook_port = _free_port()
+    db_path = tmp / f"cluster-{workers}.db"
+    env = {
+        **os.environ,
+        "BOT_API_URL": f"http://127.0.0.1:{port}/bot",
+        "BOT_MODE": "cluster",
+        "CLUSTER_WORKERS": str(workers),
+        "DB_PATH": str(db_path),
+        "CLUSTER_QUEUE": str(tmp / f"queue-{workers}.db"),
+        "CLUSTER_SOCKET": str(tmp / f"limiter-{workers}.sock"),
+        "NOTIFY_CHAT_IDS": str(STAFF_CHAT_ID),
+        "WEBAPP_URL": "https://example.org/app",
+        "FLOOD_CONTROL": "0",
+        "WEBHOOK_URL": f"http://127.0.0.1:{hook_port}/telegram",
+        "WEBHOOK_LISTEN": "127.0.0.1",
+        "WEBHOOK_PORT": str(hook_port),
+        "WEBHOOK_SECRET": "bench-secret",
+    }
+
+    ready = api.expect("setWebhook")
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(ROOT / "bot.py"), env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    total = chats * per_chat
+    try:
+        await asyncio.wait_for(ready, timeout=20)
+        # getMe: один от ingress и по одному от каждого воркера
+        while sum(1 for c in api.calls if c.method == "getMe") < workers + 1:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.5)
+
+        async def guest(user_id: int) -> None:
+            for seq in range(per_chat):
+                await api.push_update(preorder_update(user_id, seq))
+
+        mark = len(api.calls)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(guest(100_000 + c) for c in range(chats)))
+        t_ingress = time.perf_counter() - t0
+
+        def count(pred) -> int:
+            return sum(1 for c in api.calls[mark:] if c.method == "sendMessage" and pred(_chat_id(c.params)))
+
+        # на каждый предзаказ — ответ в чат и подтверждение в личку
+        while count(lambda cid: cid != STAFF_CHAT_ID) < 2 * total:
+            await asyncio.sleep(0.02)
+        t_handled = time.perf_counter() - t0
+        while count(lambda cid: cid == STAFF_CHAT_ID) < total:
+            await asyncio.sleep(0.05)
+        t_staff = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        await proc.wait()
+        await api.stop()
+
+    staff_ts = [c.at for c in api.calls[mark:] if c.method == "sendMessage" and _chat_id(c.params) == STAFF_CHAT_ID]
+
+    per_user: dict[int, list[int]] = defaultdict(list)
+    with sqlite3.connect(db_path) as conn:
+        for user_id, comment in conn.execute("SELECT tg_user_id, comment FROM preorders ORDER BY id"):
+            per_user[user_id].append(int(comment))
+    out_of_order = sum(1 for seqs in per_user.values() if seqs != sorted(seqs))
+
+    return {
+        "workers": workers,
+        "updates": total,
+        "ingress_s": round(t_ingress, 3),
+        "handled_s": round(t_handled, 3),
+        "handled_per_s": round(total / t_handled, 1),
+        "staff_delivered_s": round(t_staff, 3),
+        "staff_max_per_s": _max_per_second(staff_ts),
+        "staff_limit_per_s": GLOBAL_PER_SECOND,
+        "preorders_saved": sum(len(s) for s in per_user.values()),
+        "chats_out_of_order": out_of_order,
+    }
+
+
+async def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--chats", type=int, default=50)
+    ap.add_argument("--per-chat", type=int, default=4)
+    ap.add_argument("--workers", type=str, default="1,4")
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for w in (int(x) for x in args.workers.split(",") if x):
+            runs.append(await run(w, args.chats, args.per_chat, args.latency_ms / 1000, Path(tmp)))
+
+    harness.report("cluster", args, {"cpus": os.cpu_count(), "runs": runs})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Стресс-тест параллельной обработки апдейтов (CONCURRENT_UPDATES).
+
+Много чатов шлют вперемешку /start и «Главное меню»; Bot API — StubRequest
+со случайной задержкой, чтобы апдейты одного чата имели шанс обогнать друг
+друга. Апдейты идут через настоящий update_queue → update processor.
+
+Проверяем, что внутри чата апдейты не пересекаются и идут по порядку
+update_id (иначе — код выхода 1), и сколько чатов обрабатывалось одновременно.
+Для сравнения — тот же поток при workers=1 (последовательно, как по умолчанию).
+
+Запуск:  python benchmarks/bench_concurrency.py [--chats 200] [--per-chat 5] [--workers 1,8,32]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("WEBAPP_URL", "https://example.org/app")
+# одни и те же гости жмут кнопки сотни раз: троттлинг съел бы замер (он — в bench_throttle.py)
+os.environ.setdefault("FLOOD_CONTROL", "0")
+
+import bot  # noqa: E402
+import db  # noqa: E402
+import harness  # noqa: E402
+from bench_handlers import go_home_from_menu_update, start_update  # noqa: E402
+from stub_bot import StubRequest  # noqa: E402
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+
+def make_updates(chats: int, per_chat: int, seed: int) -> list[dict]:
+    """per_chat апдейтов на чат, чаты вперемешку; внутри чата update_id растёт."""
+    rnd = random.Random(seed)
+    order = [c for c in range(chats) for _ in range(per_chat)]
+    rnd.shuffle(order)
+    updates = []
+    for update_id, c in enumerate(order, 1):
+        make = start_update if rnd.random() < 0.5 else go_home_from_menu_update
+        u = make(update_id)
+        # все построители берут чат из n % USERS — подменяем на свой
+        uid = 100_000 + c
+        body = u.get("message") or u["callback_query"]
+        body.setdefault("from", {})["id"] = uid
+        chat = (body.get("message") or body)["chat"]
+        chat["id"] = uid
+        updates.append(u)
+    return updates
+
+
+async def run(workers: int, updates: list[dict], latency: float, jitter: float) -> dict:
+    bot.CONCURRENT_UPDATES = workers
+    bot.rate_limiter.per_second = bot.rate_limiter.group_per_minute = 10**9
+    stub = StubRequest(latency=latency, jitter=jitter, seed=workers)
+    app = bot.build_application(request=stub)
+
+    events: list[tuple[float, str, int, int]] = []  # (t, 'b'|'e', chat_id, update_id)
+
+    async def begin(update: Update, context) -> None:
+        events.append((time.perf_counter(), "b", update.effective_chat.id, update.update_id))
+
+    async def end(update: Update, context) -> None:
+        events.append((time.perf_counter(), "e", update.effective_chat.id, update.update_id))
+
+    app.add_handler(TypeHandler(Update, begin), group=-100)
+    app.add_handler(TypeHandler(Update, end), group=100)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    try:
+        t0 = time.perf_counter()
+        for u in updates:
+            await app.update_queue.put(Update.de_json(u, app.bot))
+        while sum(1 for e in events if e[1] == "e") < len(updates):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - t0
+    finally:
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+    # порядок и непересечение внутри чата, пик одновременно обрабатываемых чатов
+    per_chat: dict[int, list[tuple[str, int]]] = defaultdict(list)
+    in_flight = peak = 0
+    for _, kind, chat_id, update_id in sorted(events):
+        per_chat[chat_id].append((kind, update_id))
+        in_flight += 1 if kind == "b" else -1
+        peak = max(peak, in_flight)
+    overlapping = out_of_order = 0
+    for seq in per_chat.values():
+        # b1 e1 b2 e2 ...: следующий апдейт чата начинается после конца предыдущего
+        if [k for k, _ in seq] != ["b", "e"] * (len(seq) // 2) or any(seq[i][1] != seq[i + 1][1] for i in range(0, len(seq), 2)):
+            overlapping += 1
+        ids = [i for k, i in seq if k == "b"]
+        if ids != sorted(ids):
+            out_of_order += 1
+
+    return {
+        "workers": workers,
+        "updates": len(updates),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(updates) / elapsed, 1),
+        "peak_in_flight": peak,
+        "chats_overlapping": overlapping,
+        "chats_out_of_order": out_of_order,
+        "api_calls": len(stub.calls),
+    }
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--chats", type=int, default=200)
+    ap.add_argument("--per-chat", type=int, default=5)
+    ap.add_argument("--workers", type=str, default="1,8,32")
+    ap.add_argument("--latency-ms", type=float, default=10.0)
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    updates = make_updates(args.chats, args.per_chat, args.seed)
+    runs = []
+    for w in (int(x) for x in args.workers.split(",") if x):
+        with harness.temp_db():
+            runs.append(asyncio.run(run(w, updates, args.latency_ms / 1000, args.jitter_ms / 1000)))
+
+    harness.report("concurrency", args, {"runs": runs})
+    # это стресс-тест гарантии порядка: нарушение — ошибка, а не цифра в отчёте
+    broken = [r["workers"] for r in runs if r["chats_overlapping"] or r["chats_out_of_order"]]
+    if broken:
+        sys.exit(f"❌ Порядок внутри чата нарушен при workers={','.join(map(str, broken))}")
+
+
+if __name__ == "__main__":
+    main()
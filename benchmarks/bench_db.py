@@ -0,0 +1,118 @@
+"""
+Сравнение задержек event loop при записи броней:
+старый вариант (sqlite3.connect + INSERT + commit прямо в корутине)
+против потока БД из db.py (одно соединение, WAL, пачки в одной транзакции).
+
+Запуск:  python benchmarks/bench_db.py [--bookings 500] [--concurrency 50]
+Пишет во временную БД, spalnik.db не трогает.
+"""
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import db  # noqa: E402
+import harness  # noqa: E402
+
+BOOKING = dict(
+    tg_user_id=1,
+    tg_username="guest",
+    date="26 января",
+    time="19:30",
+    guests=4,
+    name="Иван",
+    phone="+79990000000",
+    comment="",
+)
+
+
+def legacy_create_booking(path: Path, **kw) -> int:
+    """Как было до async-слоя: новое соединение и commit на каждую бронь."""
+    with sqlite3.connect(path) as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO bookings (tg_user_id, tg_username, date, time, guests, name, phone, comment)
+            VALUES (:tg_user_id, :tg_username, :date, :time, :guests, :name, :phone, :comment)
+            """,
+            kw,
+        )
+        conn.commit()
+        return int(cur.lastrowid)
+
+
+async def _monitor(stop: asyncio.Event, lags: list[float], tick: float = 0.001) -> None:
+    """Засекаем, насколько позже положенного просыпается корутина — это и есть стопор loop."""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.perf_counter() - t0 - tick))
+
+
+async def _run(mode: str, path: Path, bookings: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            if mode == "legacy":
+                legacy_create_booking(path, **BOOKING)
+            else:
+                await db.create_booking(**BOOKING)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    mon = asyncio.create_task(_monitor(stop, lags))
+    await asyncio.sleep(0.01)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(bookings)))
+    elapsed = time.perf_counter() - t0
+
+    stop.set()
+    await mon
+    if mode == "async":
+        await db.close_db()
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "bookings": bookings,
+        "elapsed_s": round(elapsed, 4),
+        "bookings_per_s": round(bookings / elapsed, 1),
+        "loop_stall_max_ms": round(lags[-1] * 1000, 3) if lags else 0.0,
+        "loop_stall_p99_ms": round(lags[int(len(lags) * 0.99) - 1] * 1000, 3) if lags else 0.0,
+        "loop_stall_mean_ms": round(statistics.fmean(lags) * 1000, 3) if lags else 0.0,
+        "loop_stall_total_ms": round(sum(lags) * 1000, 1),
+    }
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--bookings", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=50)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("legacy", "async"):
+            path = Path(tmp) / f"{mode}.db"
+            db.DB_PATH = path
+            db.init_db()
+            if mode == "legacy":
+                # старый режим журнала, как у файла до перехода на WAL
+                with sqlite3.connect(path) as conn:
+                    conn.execute("PRAGMA journal_mode = DELETE")
+            results.append(asyncio.run(_run(mode, path, args.bookings, args.concurrency)))
+
+    harness.report("db", args, {"runs": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Защита от повторных web_app_data (dedup.py + processed_updates).
+
+Апдейты идут через настоящий build_application() со StubRequest:
+  1) N разных предзаказов — обычный путь (запись в БД);
+  2) те же апдейты ещё раз (Telegram повторил доставку) — повтор;
+  3) тот же заказ с новым update_id (гость нажал «Отправить» дважды);
+  4) «рестарт»: новый Application и пустой LRU — сначала с прогревом из БД
+     в post_init, потом без него (повтор ловит только таблица).
+Для каждого этапа — задержка обработчика, обращения к потоку БД
+и сколько сообщений «НОВЫЙ ПРЕДЗАКАЗ» встало в outbox.
+В свежем Application к обращениям добавляется чтение chat_data/user_data
+гостя из persistence (по разу на гостя) — это не защита от повторов.
+
+Запуск:  python benchmarks/bench_dedup.py [--n 500]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("NOTIFY_CHAT_IDS", "-1001")
+os.environ.setdefault("WEBAPP_URL", "https://example.org/app")
+os.environ.setdefault("FLOOD_CONTROL", "0")
+
+import bot  # noqa: E402
+import db  # noqa: E402
+import harness  # noqa: E402
+from bench_handlers import preorder_update  # noqa: E402
+from dedup import SeenKeys  # noqa: E402
+from stub_bot import StubRequest  # noqa: E402
+from telegram import Update  # noqa: E402
+
+make_preorder = preorder_update(3)
+
+
+class CountingDb:
+    """Считает задания в поток БД (db.run → DbThread.submit)."""
+
+    def __init__(self) -> None:
+        self.jobs = 0
+        self._submit = db._db.submit
+
+    def submit(self, fn):
+        self.jobs += 1
+        return self._submit(fn)
+
+
+async def _staff_messages() -> int:
+    return await db.run(lambda conn: conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0])
+
+
+async def _app(stub: StubRequest, warm: bool):
+    bot.seen_updates = SeenKeys()
+    app = bot.build_application(request=stub)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if bot.outbox_worker is not None:
+        await bot.outbox_worker.stop()
+    if not warm:
+        bot.seen_updates = SeenKeys()
+    return app
+
+
+async def _close(app) -> None:
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+
+
+async def stage(app, counter: CountingDb, name: str, updates: list[dict]) -> dict:
+    before = await _staff_messages()
+    jobs = counter.jobs
+    latencies = []
+    for u in updates:
+        update = Update.de_json(u, app.bot)
+        t0 = time.perf_counter()
+        await app.process_update(update)
+        latencies.append(time.perf_counter() - t0)
+    db_jobs = counter.jobs - jobs
+    latencies.sort()
+    return {
+        "stage": name,
+        "updates": len(updates),
+        "p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+        "db_jobs_per_update": round(db_jobs / len(updates), 2),
+        "staff_messages_queued": await _staff_messages() - before,
+    }
+
+
+async def run(n: int) -> dict:
+    bot.rate_limiter.per_second = bot.rate_limiter.group_per_minute = 10**9
+    counter = CountingDb()
+    db._db.submit = counter.submit
+    stub = StubRequest()
+    originals = [make_preorder(i) for i in range(1, n + 1)]
+
+    def resubmitted(u: dict, update_id: int) -> dict:
+        return {**u, "update_id": update_id}
+
+    stages = []
+    app = await _app(stub, warm=True)
+    try:
+        stages.append(await stage(app, counter, "new", originals))
+        stages.append(await stage(app, counter, "redelivered (same update_id)", originals))
+        stages.append(await stage(app, counter, "double submit (new update_id)", [resubmitted(u, 10**6 + i) for i, u in enumerate(originals)]))
+    finally:
+        await _close(app)
+
+    for warm in (True, False):
+        app = await _app(stub, warm=warm)
+        try:
+            label = "after restart, LRU warmed from db" if warm else "after restart, empty LRU"
+            stages.append(await stage(app, counter, label, originals))
+        finally:
+            await _close(app)
+
+    keys = await db.run(lambda conn: conn.execute("SELECT COUNT(*) FROM processed_updates").fetchone()[0])
+    await db.close_db()
+    return {"stages": stages, "processed_updates_rows": keys}
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--n", type=int, default=500)
+    args = ap.parse_args()
+
+    with harness.temp_db():
+        report = asyncio.run(run(args.n))
+
+    harness.report("dedup", args, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Выгрузка /export (export.py): потоковая запись в gzip против «всё в память».
+
+Во временной БД — брони и предзаказы с позициями за последние 60 дней.
+Для каждой выгрузки одновременно:
+  • следим за задержками event loop;
+  • пишем брони через поток БД каждые 5 мс — выгрузка не должна их тормозить.
+Сравнение — наивный вариант: fetchall() в потоке БД (db.run), список
+в памяти, потом запись файла. Память — пик tracemalloc (все потоки).
+
+В конце — /export через build_application() со StubRequest: документ уходит в чат.
+
+Запуск:  python benchmarks/bench_export.py [--bookings 100000] [--preorders 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import datetime as dt
+import gzip
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("NOTIFY_CHAT_IDS", "-1001")
+os.environ.setdefault("WEBAPP_URL", "https://example.org/app")
+os.environ.setdefault("FLOOD_CONTROL", "0")
+
+import bot  # noqa: E402
+import db  # noqa: E402
+import export  # noqa: E402
+import harness  # noqa: E402
+from bench_db import BOOKING, _monitor  # noqa: E402
+from stub_bot import StubRequest  # noqa: E402
+from telegram import Update  # noqa: E402
+
+DAYS = 60
+
+
+def fill(bookings: int, preorders: int) -> None:
+    now = dt.datetime.utcnow()
+    ts = lambda i, n: (now - dt.timedelta(days=DAYS * (n - i) / n)).strftime("%Y-%m-%d %H:%M:%S")  # noqa: E731
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO bookings (created_at, tg_user_id, tg_username, date, time, guests, name, phone, comment, slot_at)"
+            " VALUES (?, ?, 'guest', '26 января', '19:30', 4, 'Иван Петров', '+79990000000', 'у окна, день рождения', '2025-01-26T19:30')",
+            ((ts(i, bookings), 100_000 + i % 5000) for i in range(bookings)),
+        )
+        conn.executemany(
+            "INSERT INTO preorders (id, created_at, tg_user_id, phone, desired_time, comment, total)"
+            " VALUES (?, ?, ?, '+79990000000', '19:30', 'без лука', 1400)",
+            ((i + 1, ts(i, preorders), 100_000 + i % 5000) for i in range(preorders)),
+        )
+        conn.executemany(
+            "INSERT INTO preorder_items (preorder_id, item_id, name, qty, sum) VALUES (?, ?, ?, 2, 350)",
+            ((i // 3 + 1, f"item{i % 3}", f"Позиция {i % 3}") for i in range(preorders * 3)),
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def naive_select(kind: str, start: dt.date, end: dt.date):
+    """Как сделали бы «в лоб»: fn(conn) для db.run, которая собирает всё в список."""
+    sql = export._BOOKINGS_SQL if kind == "bookings" else export._PREORDERS_SQL
+    params = (start.isoformat(), end.isoformat())
+
+    def _select(conn) -> list[dict]:
+        rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+        if kind == "preorders":
+            by_id: dict[int, list] = {}
+            for r in conn.execute(export._ITEMS_SQL, params).fetchall():
+                by_id.setdefault(r["preorder_id"], []).append({"id": r["item_id"], "name": r["name"], "qty": r["qty"], "sum": r["sum"]})
+            for r in rows:
+                r["items"] = by_id.get(r["id"], [])
+        return rows
+
+    return _select
+
+
+async def measure(mode: str, kind: str, fmt: str, start: dt.date, end: dt.date, tmp: Path) -> dict:
+    lags: list[float] = []
+    writes: list[float] = []
+    stop = asyncio.Event()
+    mon = asyncio.create_task(_monitor(stop, lags))
+
+    async def writer() -> None:
+        while not stop.is_set():
+            t = time.perf_counter()
+            await db.create_booking(**BOOKING)
+            writes.append(time.perf_counter() - t)
+            await asyncio.sleep(0.005)
+
+    wr = asyncio.create_task(writer())
+    await asyncio.sleep(0.05)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if mode == "stream":
+        path, count = await export.export_file(kind, fmt, start, end)
+    else:
+        rows = await db.run(naive_select(kind, start, end))
+        path = tmp / f"naive.{fmt}.gz"
+        buf = io.StringIO()
+        if fmt == "csv":
+            w = csv.DictWriter(buf, fieldnames=export.COLUMNS[kind])
+            w.writeheader()
+            for r in rows:
+                if kind == "preorders":
+                    r["items"] = export._items_text(r["items"])
+                w.writerow(r)
+        else:
+            for r in rows:
+                buf.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+        path.write_bytes(gzip.compress(buf.getvalue().encode("utf-8"), 6))
+        count = len(rows)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stop.set()
+    await asyncio.gather(mon, wr)
+    size = path.stat().st_size
+    with gzip.open(path, "rt", encoding="utf-8-sig") as f:
+        lines = sum(1 for _ in f)
+    path.unlink()
+
+    writes.sort()
+    return {
+        "mode": mode,
+        "kind": kind,
+        "format": fmt,
+        "rows": count,
+        "lines_in_file": lines,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(count / elapsed),
+        "file_kb": size // 1024,
+        "peak_mem_mb": round(peak / 2**20, 2),
+        "loop_stall_max_ms": round(max(lags) * 1000, 1),
+        "db_write_p50_ms": round(statistics.median(writes) * 1000, 2),
+        "db_write_max_ms": round(writes[-1] * 1000, 1),
+    }
+
+
+async def via_command() -> dict:
+    stub = StubRequest()
+    app = bot.build_application(request=stub)
+    await app.initialize()
+    try:
+        update = {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": -1001, "type": "supergroup", "title": "Заказы"},
+                "from": {"id": 7, "is_bot": False, "first_name": "Staff"},
+                "text": "/export preorders json",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 7}],
+            },
+        }
+        t0 = time.perf_counter()
+        await app.process_update(Update.de_json(update, app.bot))
+        docs = [c for c in stub.calls if c.method == "sendDocument"]
+        return {
+            "command": "/export preorders json",
+            "elapsed_s": round(time.perf_counter() - t0, 2),
+            "documents_sent": len(docs),
+            "caption": docs[0].params.get("caption") if docs else None,
+        }
+    finally:
+        await app.shutdown()
+
+
+async def run(args: argparse.Namespace, tmp: Path) -> dict:
+    end = dt.date.today()
+    start = end - dt.timedelta(days=DAYS)
+    runs = []
+    try:
+        for kind, fmt in (("bookings", "csv"), ("preorders", "json")):
+            for mode in ("naive", "stream"):
+                runs.append(await measure(mode, kind, fmt, start, end, tmp))
+        command = await via_command()
+    finally:
+        await db.close_db()
+    return {"runs": runs, "command": command}
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--bookings", type=int, default=100_000)
+    ap.add_argument("--preorders", type=int, default=50_000)
+    args = ap.parse_args()
+
+    with harness.temp_db() as tmp:
+        fill(args.bookings, args.preorders)
+        report = asyncio.run(run(args, tmp))
+
+    harness.report("export", args, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Прогон синтетических апдейтов через настоящую цепочку обработчиков bot.py.
+
+Application собирается тем же build_application(), что и в main(), но HTTP слой
+подменён на StubRequest (задержка настраивается, сети нет). Для каждого вида
+апдейта считаем пропускную способность, p50/p95/p99 и число вызовов Bot API.
+Фоновые отправки (outbox) считаются отдельно.
+
+Запуск:  python benchmarks/bench_handlers.py [--n 200] [--latency-ms 20] [--out result.json]
+Результат — JSON (stdout или --out), чтобы сравнивать релизы между собой.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("NOTIFY_CHAT_IDS", "-1001,-1002")
+os.environ.setdefault("WEBAPP_URL", "https://example.org/app")
+# одни и те же гости жмут кнопки сотни раз: троттлинг съел бы замер (он — в bench_throttle.py)
+os.environ.setdefault("FLOOD_CONTROL", "0")
+
+import bot  # noqa: E402
+import db  # noqa: E402
+import harness  # noqa: E402
+from stub_bot import StubRequest  # noqa: E402
+from telegram import Update  # noqa: E402
+
+USERS = 50
+
+
+def _user(uid: int) -> dict:
+    return {"id": uid, "is_bot": False, "first_name": f"Guest{uid}", "username": f"guest{uid}"}
+
+
+def _chat(uid: int) -> dict:
+    return {"id": uid, "type": "private", "first_name": f"Guest{uid}"}
+
+
+def start_update(n: int) -> dict:
+    uid = 1000 + n % USERS
+    return {
+        "update_id": n,
+        "message": {
+            "message_id": n,
+            "date": int(time.time()),
+            "chat": _chat(uid),
+            "from": _user(uid),
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+def go_home_update(n: int) -> dict:
+    uid = 1000 + n % USERS
+    return {
+        "update_id": n,
+        "callback_query": {
+            "id": str(n),
+            "from": _user(uid),
+            "chat_instance": str(uid),
+            "data": "go_home",
+            "message": {"message_id": n, "date": int(time.time()), "chat": _chat(uid), "text": "..."},
+        },
+    }
+
+
+def go_home_from_menu_update(n: int) -> dict:
+    """«Главное меню» под присланным PDF: сообщение можно отредактировать на месте."""
+    update = go_home_update(n)
+    update["callback_query"]["message"] = {
+        "message_id": n,
+        "date": int(time.time()),
+        "chat": _chat(1000 + n % USERS),
+        "document": {"file_id": "menu", "file_unique_id": "menu", "file_name": "menu.pdf"},
+    }
+    return update
+
+
+def preorder_update(items: int) -> Callable[[int], dict]:
+    def make(n: int) -> dict:
+        uid = 1000 + n % USERS
+        payload = {
+            "type": "preorder",
+            "phone": "+79990000000",
+            "desired_time": "19:30",
+            "comment": f"у окна #{n}",  # разные заказы: одинаковые отсекла бы защита от повторов
+            "items": [{"id": f"item{i}", "name": f"Позиция {i}", "qty": 1 + i % 3, "sum": 350} for i in range(items)],
+            "total": 350 * items,
+        }
+        return {
+            "update_id": n,
+            "message": {
+                "message_id": n,
+                "date": int(time.time()),
+                "chat": _chat(uid),
+                "from": _user(uid),
+                "web_app_data": {"data": json.dumps(payload, ensure_ascii=False), "button_text": "Заказ"},
+            },
+        }
+
+    return make
+
+
+SCENARIOS: dict[str, Callable[[int], dict]] = {
+    "start": start_update,
+    "go_home": go_home_update,
+    "go_home_from_menu": go_home_from_menu_update,
+    "preorder_1": preorder_update(1),
+    "preorder_10": preorder_update(10),
+    "preorder_50": preorder_update(50),
+}
+
+
+def _pct(xs: list[float], p: float) -> float:
+    return round(xs[min(len(xs) - 1, int(len(xs) * p))] * 1000, 3)
+
+
+async def run(n: int, latency: float, jitter: float) -> dict:
+    stub = StubRequest(latency=latency, jitter=jitter)
+    # лимиты Telegram стенду не нужны: иначе outbox упрётся в 20 сообщений/мин на группу
+    bot.rate_limiter.per_second = bot.rate_limiter.group_per_minute = 10**9
+    app = bot.build_application(request=stub)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    # outbox-воркер на время замеров останавливаем, иначе его отправки попадут в счёт обработчиков
+    if bot.outbox_worker is not None:
+        await bot.outbox_worker.stop()
+
+    report: dict = {}
+    update_id = 1
+    try:
+        for name, make in SCENARIOS.items():
+            # прогрев: кэш file_id, соединение с БД
+            await app.process_update(Update.de_json(make(0), app.bot))
+
+            latencies: list[float] = []
+            calls: Counter = Counter()
+            t_all = time.perf_counter()
+            for _ in range(n):
+                update = Update.de_json(make(update_id), app.bot)
+                update_id += 1
+                mark = len(stub.calls)
+                t0 = time.perf_counter()
+                await app.process_update(update)
+                latencies.append(time.perf_counter() - t0)
+                calls += stub.count_since(mark)
+            elapsed = time.perf_counter() - t_all
+
+            latencies.sort()
+            report[name] = {
+                "updates": n,
+                "throughput_per_s": round(n / elapsed, 1),
+                "p50_ms": _pct(latencies, 0.50),
+                "p95_ms": _pct(latencies, 0.95),
+                "p99_ms": _pct(latencies, 0.99),
+                "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+                "api_calls_per_update": round(sum(calls.values()) / n, 2),
+                "api_calls_by_method": dict(sorted(calls.items())),
+            }
+
+        # дождаться outbox и посчитать фоновые отправки отдельно
+        mark = len(stub.calls)
+        if bot.outbox_worker is not None:
+            while await bot.outbox_worker.deliver_batch():
+                pass
+        report["background_outbox"] = {"api_calls_by_method": dict(stub.count_since(mark))}
+    finally:
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await app.shutdown()
+    return report
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--n", type=int, default=200, help="апдейтов на сценарий")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="задержка каждого вызова Bot API")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    with harness.temp_db():
+        handlers = asyncio.run(run(args.n, args.latency_ms / 1000, args.jitter_ms / 1000))
+
+    harness.report("handlers", args, {"handlers": handlers})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Ночное обслуживание БД (maintenance.py): архивация, incremental vacuum, ANALYZE.
+
+Во временной БД — два года истории: брони, предзаказы с позициями и
+доставленный outbox. Сначала база «старая» (auto_vacuum = NONE, user_version 3):
+init_db() применяет миграцию 4 — разовый VACUUM при старте.
+Потом Maintenance.run() проходит весь план, а рядом каждые 5 мс пишется бронь
+через поток БД — как гости в тихие часы. Меряем:
+  • сколько каждый шаг обслуживания держит поток БД (время внутри db.run);
+  • задержку записи брони во время обслуживания и без него;
+  • размер файла до/после и что архив содержит ровно удалённые строки.
+
+Запуск:  python benchmarks/bench_maintenance.py [--bookings 200000] [--preorders 50000]
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import gzip
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import db  # noqa: E402
+import harness  # noqa: E402
+import maintenance  # noqa: E402
+from bench_db import BOOKING, _monitor  # noqa: E402
+
+DAYS = 730
+RETENTION_DAYS = 365
+
+
+def fill(bookings: int, preorders: int, outbox: int) -> None:
+    now = dt.datetime.utcnow()
+    ts = lambda i, n: (now - dt.timedelta(days=DAYS * (n - i) / n)).strftime("%Y-%m-%d %H:%M:%S")  # noqa: E731
+    slot = lambda i, n: (now - dt.timedelta(days=DAYS * (n - i) / n - 3)).strftime("%Y-%m-%dT19:30")  # noqa: E731
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO bookings (created_at, tg_user_id, tg_username, date, time, guests, name, phone, comment, slot_at)"
+            " VALUES (?, ?, 'guest', '26 января', '19:30', 4, 'Иван Петров', '+79990000000', 'у окна, день рождения', ?)",
+            ((ts(i, bookings), 100_000 + i % 5000, slot(i, bookings)) for i in range(bookings)),
+        )
+        conn.executemany(
+            "INSERT INTO preorders (id, created_at, tg_user_id, phone, desired_time, comment, total)"
+            " VALUES (?, ?, ?, '+79990000000', '19:30', 'без лука', 1400)",
+            ((i + 1, ts(i, preorders), 100_000 + i % 5000) for i in range(preorders)),
+        )
+        conn.executemany(
+            "INSERT INTO preorder_items (preorder_id, item_id, name, qty, sum) VALUES (?, ?, ?, 2, 350)",
+            ((i // 3 + 1, f"item{i % 3}", f"Позиция {i % 3}") for i in range(preorders * 3)),
+        )
+        conn.executemany(
+            "INSERT INTO outbox (created_at, chat_id, text, status) VALUES (?, -1001, ?, 'sent')",
+            ((ts(i, outbox), "🆕 НОВЫЙ ПРЕДЗАКАЗ\n" + "Позиция ×2\n" * 5) for i in range(outbox)),
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def make_legacy() -> float:
+    """База до миграции 4; возвращает время init_db() (разовый VACUUM), мс."""
+    conn = db.connect()
+    try:
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA user_version = 3")
+    finally:
+        conn.close()
+    t0 = time.perf_counter()
+    db.init_db()
+    return (time.perf_counter() - t0) * 1000
+
+
+def file_stats() -> dict:
+    conn = db.connect()
+    try:
+        page = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "pages": conn.execute("PRAGMA page_count").fetchone()[0],
+            "free_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "size_mb": round(conn.execute("PRAGMA page_count").fetchone()[0] * page / 2**20, 1),
+            "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+            "rows": {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("bookings", "preorders", "preorder_items", "outbox")},
+        }
+    finally:
+        conn.close()
+
+
+def archive_stats(path: Path) -> dict:
+    out: dict = {}
+    for f in sorted(path.glob("*.ndjson.gz")):
+        table = f.name.split("-", 1)[0]
+        with gzip.open(f, "rt", encoding="utf-8") as g:
+            ids = [json.loads(line)["id"] for line in g]
+        t = out.setdefault(table, {"files": 0, "rows": 0, "unique_ids": set(), "kb": 0})
+        t["files"] += 1
+        t["rows"] += len(ids)
+        t["unique_ids"].update(ids)
+        t["kb"] += f.stat().st_size // 1024
+    for t in out.values():
+        t["unique_ids"] = len(t["unique_ids"])
+    return out
+
+
+async def writes(duration: float | None, stop: asyncio.Event | None = None) -> list[float]:
+    """Бронь каждые 5 мс: столько, сколько идёт обслуживание (stop) или duration секунд."""
+    lat: list[float] = []
+    deadline = time.monotonic() + duration if duration else float("inf")
+    while time.monotonic() < deadline and not (stop and stop.is_set()):
+        t = time.perf_counter()
+        await db.create_booking(**BOOKING)
+        lat.append(time.perf_counter() - t)
+        await asyncio.sleep(0.005)
+    return lat
+
+
+def _lat(xs: list[float]) -> dict:
+    xs = sorted(xs)
+    return {
+        "n": len(xs),
+        "p50_ms": round(statistics.median(xs) * 1000, 2),
+        "p99_ms": round(xs[int(len(xs) * 0.99)] * 1000, 2),
+        "max_ms": round(xs[-1] * 1000, 2),
+    }
+
+
+async def run(archive_dir: Path) -> dict:
+    steps: dict[str, list[float]] = {}
+    real_run = maintenance.run
+
+    async def timed_run(fn):
+        name = fn.__qualname__.split(".")[0]
+
+        def _timed(conn):
+            t = time.perf_counter()
+            try:
+                return fn(conn)
+            finally:
+                steps.setdefault(name, []).append(time.perf_counter() - t)
+
+        return await real_run(_timed)
+
+    maintenance.run = timed_run
+    try:
+        baseline = await writes(3.0)
+
+        m = maintenance.Maintenance(archive_dir, RETENTION_DAYS)
+        await m.plan()
+        stop = asyncio.Event()
+        lags: list[float] = []
+        mon = asyncio.create_task(_monitor(stop, lags))
+        writer = asyncio.create_task(writes(None, stop))
+        t0 = time.perf_counter()
+        await m.run()
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        during = await writer
+        await mon
+    finally:
+        maintenance.run = real_run
+        await db.close_db()
+
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "db_thread_per_step": {
+            name: {"steps": len(xs), "p50_ms": round(statistics.median(xs) * 1000, 2), "max_ms": round(max(xs) * 1000, 2)}
+            for name, xs in steps.items()
+        },
+        "booking_write_idle": _lat(baseline),
+        "booking_write_during": _lat(during),
+        "loop_stall_max_ms": round(max(lags) * 1000, 1),
+    }
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--bookings", type=int, default=200_000)
+    ap.add_argument("--preorders", type=int, default=50_000)
+    ap.add_argument("--outbox", type=int, default=100_000)
+    args = ap.parse_args()
+
+    with harness.temp_db() as tmp:
+        fill(args.bookings, args.preorders, args.outbox)
+        migration_ms = make_legacy()
+        before = file_stats()
+        report = asyncio.run(run(tmp / "archive"))
+        after = file_stats()
+        archive = archive_stats(tmp / "archive")
+
+    harness.report(
+        "maintenance",
+        args,
+        {
+            "migration_4_vacuum_ms": round(migration_ms, 1),
+            "before": before,
+            "after": after,
+            "archive": archive,
+            **report,
+        },
+        params={**harness.params_of(args), "history_days": DAYS, "retention_days": RETENTION_DAYS},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Сквозной замер: апдейт с предзаказом → сообщение в группу персонала.
+
+Поднимает фейковый Bot API, запускает bot.py отдельным процессом
+(сначала BOT_MODE=polling, потом webhook), подаёт web_app_data апдейты
+и меряет время до sendMessage в чат персонала.
+
+Запуск:  python benchmarks/bench_modes.py [--orders 50]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import harness  # noqa: E402
+from fake_bot_api import FakeBotApi  # noqa: E402
+
+STAFF_CHAT_ID = -1001
+USER_ID = 42
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def preorder_update(n: int) -> dict:
+    payload = {
+        "type": "preorder",
+        "phone": "+79990000000",
+        "desired_time": "19:30",
+        "comment": str(n),  # разные заказы: одинаковые подряд отсекла бы защита от повторов
+        "items": [{"id": "beer", "name": "Пиво", "qty": 2, "sum": 700}],
+        "total": 700,
+    }
+    return {
+        "message": {
+            "message_id": n,
+            "date": int(time.time()),
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Guest", "username": "guest"},
+            "web_app_data": {"data": json.dumps(payload), "button_text": "Заказ"},
+        }
+    }
+
+
+def _pct(xs: list[float], p: float) -> float:
+    return round(xs[min(len(xs) - 1, int(len(xs) * p))] * 1000, 2)
+
+
+async def run_mode(mode: str, orders: int, tmp: Path) -> dict:
+    api = FakeBotApi()
+    port = await api.start()
+    env = {
+        **os.environ,
+        "BOT_API_URL": f"http://127.0.0.1:{port}/bot",
+        "BOT_MODE": mode,
+        "DB_PATH": str(tmp / f"{mode}.db"),
+        "NOTIFY_CHAT_IDS": str(STAFF_CHAT_ID),
+        "WEBAPP_URL": "https://example.org/app",
+        "FLOOD_CONTROL": "0",
+    }
+    if mode == "webhook":
+        hook_port = _free_port()
+        env.update(
+            WEBHOOK_URL=f"http://127.0.0.1:{hook_port}/telegram",
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(hook_port),
+            WEBHOOK_SECRET="bench-secret",
+        )
+
+    ready = api.expect("setWebhook" if mode == "webhook" else "getUpdates")
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(ROOT / "bot.py"), env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await asyncio.wait_for(ready, timeout=20)
+        if mode == "webhook":
+            await asyncio.sleep(0.3)  # дать HTTP серверу бота подняться после setWebhook
+
+        latencies: list[float] = []
+        for n in range(orders):
+            staff = api.expect("sendMessage", STAFF_CHAT_ID)
+            t0 = time.perf_counter()
+            await api.push_update(preorder_update(n))
+            call = await asyncio.wait_for(staff, timeout=10)
+            latencies.append(call.at - t0)
+    finally:
+        proc.terminate()
+        await proc.wait()
+        await api.stop()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "orders": orders,
+        "p50_ms": _pct(latencies, 0.50),
+        "p95_ms": _pct(latencies, 0.95),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+async def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--orders", type=int, default=50)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [await run_mode(mode, args.orders, Path(tmp)) for mode in ("polling", "webhook")]
+    harness.report("modes", args, {"runs": results})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+Стоимость хранения chat_data при росте числа чатов: SqlitePersistence против PicklePersistence.
+
+Для N чатов с уже сохранённым состоянием меряем «старт» (get_chat_data + загрузка
+одного чата перед его апдейтом) и один сброс, в котором поменялись CHANGED чатов
+из TOUCHED активных: сколько строк/байт реально записано.
+
+Запуск:  python benchmarks/bench_persistence.py [--sizes 1000,10000,100000] [--out result.json]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import db  # noqa: E402
+import harness  # noqa: E402
+import persistence  # noqa: E402
+from persistence import SqlitePersistence  # noqa: E402
+from telegram.ext import PicklePersistence, PersistenceInput  # noqa: E402
+
+TOUCHED = 100  # чатов с апдейтами за интервал
+CHANGED = 10  # из них реально поменяли chat_data
+
+
+def _state(chat_id: int) -> dict:
+    return {"home_message_id": chat_id * 7, "lang": "ru"}
+
+
+async def bench_sqlite(tmp: Path, n: int) -> dict:
+    db.set_db_path(tmp / f"sqlite_{n}.db")
+    db.init_db()
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.executemany(
+        "INSERT INTO bot_state (kind, id, data) VALUES ('chat', ?, ?)",
+        ((i, json.dumps(_state(i), separators=(",", ":"), sort_keys=True)) for i in range(n)),
+    )
+    conn.commit()
+    conn.close()
+
+    written: list[int] = []
+    save = persistence.save_bot_state
+
+    async def counting_save(rows):
+        written.append(len(rows))
+        await save(rows)
+
+    persistence.save_bot_state = counting_save
+    try:
+        p = SqlitePersistence()
+        t0 = time.perf_counter()
+        await p.get_chat_data()
+        data: dict = {}
+        await p.refresh_chat_data(0, data)
+        startup = time.perf_counter() - t0
+        assert data == _state(0)
+
+        chats = {0: data}  # PTB отдаёт один и тот же dict чата
+        for i in range(1, TOUCHED):
+            chats[i] = {}
+            await p.refresh_chat_data(i, chats[i])
+        for i in range(CHANGED):
+            chats[i]["home_message_id"] += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(p.update_chat_data(i, chats[i]) for i in range(TOUCHED)))
+        await p.flush()
+        flush = time.perf_counter() - t0
+    finally:
+        persistence.save_bot_state = save
+        await db.close_db()
+
+    return {
+        "startup_ms": round(startup * 1000, 3),
+        "flush_ms": round(flush * 1000, 3),
+        "rows_written": sum(written),
+        "transactions": len(written),
+    }
+
+
+async def bench_pickle(tmp: Path, n: int) -> dict:
+    path = tmp / f"pickle_{n}.bin"
+    store = PersistenceInput(bot_data=False, chat_data=True, user_data=False, callback_data=False)
+    seed = PicklePersistence(path, store_data=store, on_flush=True)
+    await seed.get_chat_data()
+    for i in range(n):
+        await seed.update_chat_data(i, _state(i))
+    await seed.flush()
+
+    p = PicklePersistence(path, store_data=store, on_flush=True)
+    t0 = time.perf_counter()
+    chat_data = await p.get_chat_data()
+    startup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(TOUCHED):
+        state = dict(chat_data[i])
+        if i < CHANGED:
+            state["home_message_id"] += 1
+        await p.update_chat_data(i, state)
+    await p.flush()
+    flush = time.perf_counter() - t0
+
+    return {
+        "startup_ms": round(startup * 1000, 3),
+        "flush_ms": round(flush * 1000, 3),
+        "bytes_written": os.path.getsize(path),
+    }
+
+
+async def run(sizes: list[int]) -> dict:
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            report[f"chats_{n}"] = {
+                "sqlite": await bench_sqlite(Path(tmp), n),
+                "pickle": await bench_pickle(Path(tmp), n),
+            }
+    return report
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--sizes", type=str, default="1000,10000,100000")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    harness.report(
+        "persistence",
+        args,
+        {"persistence": asyncio.run(run(sizes))},
+        params={"sizes": sizes, "touched": TOUCHED, "changed": CHANGED},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Микро-замер разбора и рендера предзаказа из Mini App.
+
+Сравнивает прежний путь (json.loads + f-строки и конкатенация в цикле)
+с preorder.decode_preorder + заранее разобранными шаблонами на заказах
+из 1, 50 и preorder.MAX_ITEMS (100) позиций. Отдельно — пересчёт сумм по каталогу меню.
+
+Запуск:  python benchmarks/bench_preorder.py [--repeat 2000] [--out result.json]
+"""
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import harness  # noqa: E402
+from catalog import MenuCatalog  # noqa: E402
+from preorder import MAX_ITEMS, decode_preorder, render_staff  # noqa: E402
+
+SIZES = (1, 50, MAX_ITEMS)
+
+
+def payload(items: int) -> str:
+    return json.dumps(
+        {
+            "type": "preorder",
+            "phone": "+79990000000",
+            "desired_time": "19:30",
+            "comment": "у окна",
+            "tg": {"username": "guest"},
+            "items": [{"id": f"item{i}", "name": f"Позиция {i}", "qty": 1 + i % 3, "sum": 350} for i in range(items)],
+            "total": 350 * items,
+        },
+        ensure_ascii=False,
+    )
+
+
+def legacy(raw: str) -> str:
+    """Так webapp_order_handler работал до preorder.py."""
+    data = json.loads(raw)
+    tg = data.get("tg") or {}
+    tg_line = f"Telegram: @{tg['username']}\n" if tg.get("username") else ""
+    lines = []
+    for it in data.get("items", []) or []:
+        name = it.get("name") or it.get("id") or "item"
+        qty = it.get("qty")
+        summ = it.get("sum")
+        if summ is not None:
+            lines.append(f"- {name} × {qty} = {summ} ₽")
+        else:
+            lines.append(f"- {name} × {qty}")
+    text = (
+        f"🛒 НОВЫЙ ПРЕДЗАКАЗ #1 (Mini App)\n\n"
+        f"От: @guest\n"
+        f"{tg_line}"
+        f"Телефон: {data.get('phone', '-')}\n"
+        f"Время: {data.get('desired_time', '-')}\n\n"
+        + "\n".join(lines) +
+        f"\n\nИтого: {data.get('total', 0)} ₽"
+    )
+    if data.get("comment"):
+        text += f"\nКомментарий: {data['comment']}"
+    return text
+
+
+def current(raw: str) -> str:
+    # MAX_ITEMS позиций с кириллицей в названиях не влезают в MAX_PAYLOAD_BYTES — для замера лимит снимаем
+    return render_staff(decode_preorder(raw, max_bytes=None), "@guest", 1)
+
+
+def bench(fn, raw: str, repeat: int) -> float:
+    """Лучшее из 5 прогонов, микросекунды на вызов."""
+    return min(timeit.repeat(lambda: fn(raw), number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--repeat", type=int, default=2000, help=f"вызовов на прогон (для {MAX_ITEMS} позиций — в {MAX_ITEMS // 10} раз меньше)")
+    args = ap.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    menu = Path(tmp.name) / "menu.json"
+    menu.write_text(json.dumps({"items": [
+        {"id": f"item{i}", "name": f"Позиция {i}", "price": 350} for i in range(max(SIZES))
+    ]}, ensure_ascii=False), encoding="utf-8")
+    catalog = MenuCatalog(menu)
+    catalog.refresh(force=True)
+
+    report = {}
+    for n in SIZES:
+        raw = payload(n)
+        assert legacy(raw) == current(raw), "тексты персоналу разошлись"
+        repeat = max(1, args.repeat * 10 // max(n, 10))
+        old_us = bench(legacy, raw, repeat)
+        new_us = bench(current, raw, repeat)
+        order = decode_preorder(raw, max_bytes=None)
+        reprice_us = bench(catalog.reprice, order, repeat)
+        report[f"items_{n}"] = {
+            "payload_bytes": len(raw.encode("utf-8")),
+            "legacy_us": round(old_us, 2),
+            "decoder_us": round(new_us, 2),
+            "ratio": round(new_us / old_us, 2),
+            "catalog_reprice_us": round(reprice_us, 2),
+        }
+    tmp.cleanup()
+
+    harness.report("preorder", args, {"preorder": report})
+
+
+if __name__ == "__main__":
+    main()
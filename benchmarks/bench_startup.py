@@ -0,0 +1,126 @@
+"""
+Время старта бота: от запуска процесса до первого getUpdates.
+
+Поднимает FakeBotApi и запускает bot.py (BOT_MODE=polling) отдельным
+процессом несколько раз подряд — на пустой БД (первый старт) и на уже
+созданной, с накопленными бронями и предзаказами (обычный рестарт).
+Меряем:
+  • import_ms — python -c "import bot" (интерпретатор + импорты + конфиг);
+  • first_poll_ms — от spawn до первого getUpdates в FakeBotApi.
+
+Запуск:  python benchmarks/bench_startup.py [--runs 7] [--rows 50000]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import harness  # noqa: E402
+from fake_bot_api import FakeBotApi  # noqa: E402
+
+
+def _env(port: int, db_path: Path) -> dict:
+    return {
+        **os.environ,
+        "BOT_TOKEN": "123:bench",
+        "BOT_API_URL": f"http://127.0.0.1:{port}/bot",
+        "BOT_MODE": "polling",
+        "DB_PATH": str(db_path),
+        "WEBAPP_URL": "https://example.org/app",
+        "NOTIFY_CHAT_IDS": "-1001",
+    }
+
+
+def fill(db_path: Path, rows: int) -> None:
+    """Накопленная история: брони (в т.ч. на вчера/сегодня — их читает availability) и предзаказы."""
+    with sqlite3.connect(db_path) as conn:
+        today = time.strftime("%Y-%m-%d")
+        conn.executemany(
+            "INSERT INTO bookings (tg_user_id, date, time, guests, name, phone, slot_at) VALUES (?, ?, '19:30', 2, 'Гость', '+7999', ?)",
+            ((100_000 + i, today, f"{today}T19:30" if i % 100 == 0 else "2024-01-01T19:30") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO preorders (tg_user_id, phone) VALUES (?, '+7999')",
+            ((100_000 + i,) for i in range(rows)),
+        )
+
+
+async def _import_ms(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import bot; print(time.perf_counter() - t)"
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", code, cwd=str(ROOT), env=env,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    out, _ = await proc.communicate()
+    return float(out.decode().strip()) * 1000
+
+
+async def _first_poll_ms(api: FakeBotApi, env: dict) -> float:
+    polled = api.expect("getUpdates")
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(ROOT / "bot.py"), env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await asyncio.wait_for(polled, timeout=30)
+        return (time.perf_counter() - t0) * 1000
+    finally:
+        proc.terminate()
+        await proc.wait()
+
+
+def _summary(xs: list[float]) -> dict:
+    return {"median": round(statistics.median(xs), 1), "min": round(min(xs), 1), "max": round(max(xs), 1)}
+
+
+async def run(runs: int, rows: int, tmp: Path) -> list[dict]:
+    api = FakeBotApi()
+    port = await api.start()
+    results = []
+    try:
+        # первый старт: каждый раз новая пустая БД
+        env_of = lambda i: _env(port, tmp / f"fresh-{i}.db")  # noqa: E731
+        fresh = [await _first_poll_ms(api, env_of(i)) for i in range(runs)]
+        results.append({"db": "fresh", "first_poll_ms": _summary(fresh)})
+
+        # рестарт: БД уже создана прошлым запуском и наполнена историей
+        db_path = tmp / "existing.db"
+        env = _env(port, db_path)
+        await _first_poll_ms(api, env)
+        fill(db_path, rows)
+        imports = [await _import_ms(env) for _ in range(runs)]
+        restart = [await _first_poll_ms(api, env) for _ in range(runs)]
+        results.append({
+            "db": f"existing ({rows} броней и предзаказов)",
+            "import_ms": _summary(imports),
+            "first_poll_ms": _summary(restart),
+        })
+    finally:
+        await api.stop()
+    return results
+
+
+async def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--rows", type=int, default=50_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = await run(args.runs, args.rows, Path(tmp))
+
+    harness.report("startup", args, {"runs": runs})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Троттлинг гостей (throttle.py).
+
+1) Флуд: один гость жмёт /start, «Главное меню» и повторяет web_app_data
+   с предзаказом; апдейты идут через настоящий build_application() со
+   StubRequest. Считаем вызовы Bot API и сообщения персоналу в outbox
+   с FLOOD_CONTROL и без.
+2) Таблица вёдер: много разных пользователей по разу — время allow()
+   и сколько памяти держит таблица при ограничении max_keys.
+
+Запуск:  python benchmarks/bench_throttle.py [--flood 100] [--users 200000]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("NOTIFY_CHAT_IDS", "-1001,-1002")
+os.environ.setdefault("WEBAPP_URL", "https://example.org/app")
+
+import bot  # noqa: E402
+import db  # noqa: E402
+import harness  # noqa: E402
+from bench_handlers import USERS, go_home_update, preorder_update, start_update  # noqa: E402
+from stub_bot import StubRequest  # noqa: E402
+from telegram import Update  # noqa: E402
+from throttle import FloodControl  # noqa: E402
+
+
+async def flood(enabled: bool, n: int) -> dict:
+    bot.FLOOD_CONTROL = enabled
+    bot.flood_control = FloodControl()
+    bot.rate_limiter.per_second = bot.rate_limiter.group_per_minute = 10**9
+    stub = StubRequest()
+    app = bot.build_application(request=stub)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if bot.outbox_worker is not None:
+        await bot.outbox_worker.stop()
+
+    make_preorder = preorder_update(3)
+    report: dict = {"flood_control": enabled}
+    # построители bench_handlers берут гостя из n % USERS: шаг USERS — всё от одного гостя
+    update_id = 0
+    try:
+        for name, make in (("start", start_update), ("go_home", go_home_update), ("preorder", make_preorder)):
+            mark = len(stub.calls)
+            t0 = time.perf_counter()
+            for _ in range(n):
+                update_id += USERS
+                await app.process_update(Update.de_json(make(update_id), app.bot))
+            report[name] = {
+                "updates": n,
+                "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "api_calls": dict(sorted(stub.count_since(mark).items())),
+            }
+        staff = await db.run(lambda conn: conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0])
+        report["staff_messages_queued"] = staff
+    finally:
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+    return report
+
+
+def _fill(fc: FloodControl, users: int) -> None:
+    # все за 2 с: ни одно ведро не успеет наполниться, держит только max_keys
+    now = 0.0
+    for uid in range(users):
+        now += 2.0 / users
+        fc.allow("expensive", uid, uid, now=now)
+
+
+def table(users: int, max_keys: int) -> dict:
+    fc = FloodControl(max_keys=max_keys)
+    t0 = time.perf_counter()
+    _fill(fc, users)
+    elapsed = time.perf_counter() - t0
+
+    # память — отдельным прогоном: tracemalloc замедляет в разы
+    tracemalloc.start()
+    _fill(FloodControl(max_keys=max_keys), users)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "users": users,
+        "max_keys": max_keys,
+        "allow_ns": round(elapsed / users * 1e9),
+        "keys_kept": len(fc),
+        "peak_mem_mb": round(peak / 2**20, 2),
+    }
+
+
+def main() -> None:
+    ap = harness.parser()
+    ap.add_argument("--flood", type=int, default=100, help="апдейтов каждого вида от одного гостя")
+    ap.add_argument("--users", type=int, default=200_000)
+    ap.add_argument("--max-keys", type=int, default=50_000)
+    args = ap.parse_args()
+
+    runs = []
+    for enabled in (False, True):
+        with harness.temp_db():
+            runs.append(asyncio.run(flood(enabled, args.flood)))
+
+    harness.report("throttle", args, {"flood": runs, "table": table(args.users, args.max_keys)})
+
+
+if __name__ == "__main__":
+    main()
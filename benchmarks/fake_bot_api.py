@@ -0,0 +1,207 @@
+"""
+Локальный фейковый Bot API для стендов и замеров без сети.
+
+Понимает getMe, getUpdates (long polling), setWebhook/deleteWebhook и
+send*/edit*/pin/delete/answer*: отвечает правдоподобными объектами и
+записывает каждый вызов. Апдейты в бота подаются через push_update():
+в очередь getUpdates или POST-ом на установленный вебхук.
+
+Бот подключается через BOT_API_URL=http://127.0.0.1:<port>/bot
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass
+from email.parser import BytesParser
+from email.policy import HTTP
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from httpserver import HttpServer, Request, Response  # noqa: E402
+
+
+@dataclass
+class ApiCall:
+    at: float
+    method: str
+    params: dict
+
+
+def _parse_params(req: Request) -> dict:
+    ctype = req.headers.get("content-type", "")
+    if ctype.startswith("application/json"):
+        return json.loads(req.body or b"{}")
+    if ctype.startswith("multipart/form-data"):
+        msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {ctype}\r\n\r\n".encode() + req.body)
+        params: dict = {}
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                params[name] = f"<upload:{part.get_filename()}>"
+            else:
+                params[name] = part.get_content()
+        return params
+    return dict(parse_qsl(req.body.decode()))
+
+
+def _chat_id(params: dict) -> int:
+    try:
+        return int(json.loads(str(params.get("chat_id", 0))))
+    except (TypeError, ValueError):
+        return 0
+
+
+class FakeResponder:
+    """Правдоподобные ответы Bot API без сети (общие для HTTP-сервера и stub_bot)."""
+
+    def __init__(self) -> None:
+        self._next_message_id = 1000
+
+    def _message(self, params: dict, **extra) -> dict:
+        self._next_message_id += 1
+        cid = _chat_id(params)
+        return {
+            "message_id": self._next_message_id,
+            "date": int(time.time()),
+            "chat": {"id": cid, "type": "private" if cid > 0 else "supergroup"},
+            **extra,
+        }
+
+    def respond(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Spalnik", "username": "spalnik_test_bot"}
+        if method == "sendMessage":
+            return self._message(params, text=params.get("text", ""))
+        if method == "sendPhoto":
+            fid = f"photo-{self._next_message_id}"
+            return self._message(
+                params,
+                caption=params.get("caption", ""),
+                photo=[{"file_id": fid, "file_unique_id": fid, "width": 640, "height": 640}],
+            )
+        if method == "sendDocument":
+            fid = f"doc-{self._next_message_id}"
+            return self._message(params, document={"file_id": fid, "file_unique_id": fid})
+        if method.startswith("edit"):
+            msg = self._message(params)
+            if params.get("message_id"):
+                msg["message_id"] = int(params["message_id"])
+            if method == "editMessageMedia":
+                fid = f"photo-{self._next_message_id}"
+                msg["photo"] = [{"file_id": fid, "file_unique_id": fid, "width": 640, "height": 640}]
+            return msg
+        return True
+
+
+class FakeBotApi:
+    def __init__(self, latency: float = 0.0) -> None:
+        # задержка ответа на каждый вызов, кроме getUpdates (как сеть до api.telegram.org)
+        self.latency = latency
+        self.calls: list[ApiCall] = []
+        self.responder = FakeResponder()
+        self.webhook_url = ""
+        self.webhook_secret = ""
+        self._updates: asyncio.Queue[dict] = asyncio.Queue()
+        self._next_update_id = 1
+        self._waiters: list[tuple[str, Optional[int], asyncio.Future]] = []
+        self.server = HttpServer({}, fallback=self._handle)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        await self.server.start(host, port)
+        return self.server.port
+
+    async def stop(self) -> None:
+        await self.server.stop()
+
+    # ---------- подача апдейтов ----------
+    def make_update(self, payload: dict) -> dict:
+        update = {"update_id": self._next_update_id, **payload}
+        self._next_update_id += 1
+        return update
+
+    async def push_update(self, payload: dict) -> dict:
+        update = self.make_update(payload)
+        if self.webhook_url:
+            await self._post_webhook(update)
+        else:
+            self._updates.put_nowait(update)
+        return update
+
+    async def _post_webhook(self, update: dict) -> None:
+        url = urlsplit(self.webhook_url)
+        body = json.dumps(update).encode()
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        head = (
+            f"POST {url.path or '/'} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {self.webhook_secret}\r\nConnection: close\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    # ---------- ожидание вызовов ----------
+    def expect(self, method: str, chat_id: Optional[int] = None) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((method, chat_id, fut))
+        return fut
+
+    def _record(self, method: str, params: dict) -> None:
+        call = ApiCall(time.perf_counter(), method, params)
+        self.calls.append(call)
+        cid = _chat_id(params)
+        for w in list(self._waiters):
+            m, c, fut = w
+            if m == method and (c is None or c == cid):
+                self._waiters.remove(w)
+                if not fut.done():
+                    fut.set_result(call)
+
+    async def _handle(self, req: Request) -> Response:
+        method = req.path.rsplit("/", 1)[-1]
+        params = _parse_params(req)
+        self._record(method, params)
+
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        elif method == "setWebhook":
+            self.webhook_url = str(params.get("url", ""))
+            self.webhook_secret = str(params.get("secret_token", ""))
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook_url = ""
+            result = True
+        else:
+            result = self.responder.respond(method, params)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        return Response.json({"ok": True, "result": result})
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        timeout = float(params.get("timeout", 0) or 0)
+        out: list[dict] = []
+        try:
+            out.append(await asyncio.wait_for(self._updates.get(), timeout=max(timeout, 0.01)))
+        except asyncio.TimeoutError:
+            return out
+        while not self._updates.empty():
+            out.append(self._updates.get_nowait())
+        return out
+
+
+async def _serve_forever(port: int) -> None:
+    api = FakeBotApi()
+    bound = await api.start(port=port)
+    print(f"Fake Bot API: http://127.0.0.1:{bound}/bot", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_serve_forever(int(sys.argv[1]) if len(sys.argv) > 1 else 8081))
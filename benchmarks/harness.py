@@ -0,0 +1,58 @@
+"""
+Общая обвязка замеров: аргументы, временная БД и JSON-отчёт.
+
+Каждый bench_*.py добавляет в parser() только свои параметры и отдаёт
+результат в report(): {"benchmark", "python", "params", ...} в stdout
+или в файл --out.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", type=str, default="", help="записать JSON в файл, а не в stdout")
+    return ap
+
+
+def params_of(args: argparse.Namespace) -> dict[str, Any]:
+    """Параметры запуска для отчёта (без --out)."""
+    return {k: v for k, v in vars(args).items() if k != "out"}
+
+
+@contextmanager
+def temp_db() -> Iterator[Path]:
+    """Временный каталог с пустой БД последней версии схемы; отдаёт путь каталога."""
+    import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.set_db_path(Path(tmp) / "bench.db")
+        db.init_db()
+        yield Path(tmp)
+
+
+def report(name: str, args: argparse.Namespace, fields: dict[str, Any], params: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    """Собрать и вывести результат; params по умолчанию — аргументы командной строки."""
+    result = {
+        "benchmark": name,
+        "python": platform.python_version(),
+        "params": params_of(args) if params is None else params,
+        **fields,
+    }
+    out = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(out + "\n", encoding="utf-8")
+    else:
+        print(out)
+    return result
@@ -0,0 +1,69 @@
+"""
+Подмена HTTP слоя бота для замеров в одном процессе и без сети.
+
+StubRequest подставляется в build_application(request=...): каждый вызов
+Bot API записывается, ждёт настраиваемую «сетевую» задержку и получает
+правдоподобный ответ от FakeResponder.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from telegram.request import BaseRequest, RequestData  # noqa: E402
+
+from fake_bot_api import ApiCall, FakeResponder  # noqa: E402
+
+
+class StubRequest(BaseRequest):
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 1) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.calls: list[ApiCall] = []
+        self._responder = FakeResponder()
+        self._rnd = random.Random(seed)
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def count_since(self, mark: int) -> Counter:
+        return Counter(c.method for c in self.calls[mark:])
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None,
+    ) -> tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append(ApiCall(time.perf_counter(), api_method, params))
+
+        delay = self.latency + (self._rnd.uniform(0, self.jitter) if self.jitter else 0.0)
+        if api_method == "getUpdates":
+            delay = max(delay, 0.05)  # long polling без апдейтов
+            result = []
+        else:
+            result = self._responder.respond(api_method, params)
+        if delay:
+            await asyncio.sleep(delay)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
@@ -3,38 +3,100 @@ from __future__ import annotations
 # ==========================================================
 # 0) IMPORTS
 # ==========================================================
-import json
+import asyncio
+import atexit
+import functools
 import logging
 import os
+import queue
+import random
+from datetime import date, time as dt_time, timedelta
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
+import httpx
 from telegram import (
+    Bot,
     Update,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    Message,
     WebAppInfo,
 )
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.request import BaseRequest, HTTPXRequest
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
     MessageHandler,
+    ApplicationHandlerStop,
     ContextTypes,
+    TypeHandler,
     filters,
 )
 
-from db import init_db, create_booking
+from availability import Availability, normalize_slot, parse_date, parse_time
+from broadcast import Broadcaster, report_text
+from catalog import MenuCatalog
+from concurrency import ChatOrderedUpdateProcessor
+from dedup import SeenKeys, dedup_keys
+from export import export_file
+from db import (
+    bookings_since,
+    close_db,
+    create_booking,
+    create_broadcast,
+    create_preorder,
+    finish_broadcast,
+    init_db,
+    last_broadcast,
+    recent_dedup_keys,
+    running_broadcast,
+    set_db_path,
+)
+from httpserver import HttpServer
+from maintenance import Maintenance, parse_hours
+from media_cache import MediaCache
+from metrics import (
+    BOOKINGS,
+    DUPLICATES,
+    NOTIFY,
+    PREORDERS,
+    PREORDERS_REPRICED,
+    THROTTLED,
+    InstrumentedRequest,
+    metrics_endpoint,
+    timed_handler,
+)
+from outbox import OutboxWorker
+from persistence import SqlitePersistence
+from preorder import CONFIRMATION_TEXT, PreorderError, decode_preorder, render_staff
+from ratelimit import TelegramRateLimiter, call_with_retry
+from throttle import FloodControl
 
 
 # ==========================================================
 # 1) LOGGING
 # ==========================================================
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-)
+# Запись в stdout/файл идёт в отдельном потоке: обработчики только кладут запись в очередь
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_output, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# формат — только у _log_output: QueueHandler.prepare() вписывает отформатированное в record.msg,
+# и с форматом basicConfig префикс попал бы в строку дважды
+_log_handler = QueueHandler(_log_queue)
+_log_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
+# httpx пишет INFO на каждый запрос к Bot API (включая каждый getUpdates)
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger("spalnik_bot")
 
 
@@ -74,6 +136,68 @@ if not TOKEN:
         "BOT_TOKEN=123456:ABCDEF...\n"
     )
 
+# Файл БД (по умолчанию spalnik.db рядом с bot.py)
+DB_FILE = os.getenv("DB_PATH", "").strip()
+
+# Каталог меню с ценами (см. catalog.py); нет файла — цены из мини-аппа не проверяются
+MENU_CATALOG_FILE = Path(os.getenv("MENU_CATALOG", "").strip() or ASSETS_DIR / "menu.json")
+
+# Адрес Bot API (по умолчанию api.telegram.org; для локального стенда — фейковый сервер)
+BOT_API_URL = os.getenv("BOT_API_URL", "").strip()
+
+# Режим работы: polling (по умолчанию), webhook или cluster (ingress + процессы-воркеры, BOT_MODE=worker)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip()
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0").strip()
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080") or 8080)
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram").strip()
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+
+# Кластер: сколько процессов-воркеров, очередь апдейтов и сокет общего лимитера (по умолчанию рядом с БД)
+CLUSTER_WORKERS = max(1, int(os.getenv("CLUSTER_WORKERS", "2") or 2))
+_CLUSTER_DIR = Path(DB_FILE).resolve().parent if DB_FILE else BASE_DIR
+CLUSTER_QUEUE = Path(os.getenv("CLUSTER_QUEUE", "").strip() or _CLUSTER_DIR / "spalnik-queue.db")
+CLUSTER_SOCKET = Path(os.getenv("CLUSTER_SOCKET", "").strip() or _CLUSTER_DIR / "spalnik-limiter.sock")
+# номер воркера (его задаёт ingress при запуске)
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0") or 0)
+
+# Локальный /metrics в формате Prometheus (0 — выключен; воркер кластера — METRICS_PORT + WORKER_INDEX)
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1").strip()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+
+# Каталог для мини-аппа (GET /menu.json) в режиме polling: свой порт, слушает снаружи (0 — не отдавать).
+# В webhook и cluster каталог отдаёт сервер вебхука
+MENU_LISTEN = os.getenv("MENU_LISTEN", "0.0.0.0").strip()
+MENU_PORT = int(os.getenv("MENU_PORT", "0") or 0)
+
+# Зал: сколько мест, шаг слотов брони и сколько длится бронь (минуты)
+SEATS_CAPACITY = int(os.getenv("SEATS_CAPACITY", "60") or 60)
+BOOKING_SLOT_MINUTES = int(os.getenv("BOOKING_SLOT_MINUTES", "30") or 30)
+BOOKING_DURATION_MINUTES = int(os.getenv("BOOKING_DURATION_MINUTES", "120") or 120)
+
+# Сколько апдейтов обрабатывать параллельно (разные чаты; внутри чата — по очереди). 1 — последовательно
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "1") or 1)
+
+# Как часто сбрасывать изменившиеся chat_data/user_data в БД, секунды
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "10") or 10)
+
+# Троттлинг гостей перед обработчиками (throttle.py); 0 — выключен
+FLOOD_CONTROL = os.getenv("FLOOD_CONTROL", "1").strip() not in ("0", "false", "no", "")
+FLOOD_MAX_KEYS = int(os.getenv("FLOOD_MAX_KEYS", "50000") or 50000)
+
+# Рассылка гостям (/broadcast): сколько сообщений в секунду отдаём ей из лимита бота
+BROADCAST_PER_SECOND = int(os.getenv("BROADCAST_PER_SECOND", "20") or 20)
+
+# Обслуживание БД (maintenance.py): строки старше RETENTION_DAYS дней — в помесячные архивы
+# в ARCHIVE_DIR (0 — не архивировать); vacuum и ANALYZE — в тихие часы MAINTENANCE_HOURS (местное время)
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "365") or 0)
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "").strip() or BASE_DIR / "archive")
+MAINTENANCE_HOURS = parse_hours(os.getenv("MAINTENANCE_HOURS", "4-6").strip() or "4-6")
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "60") or 60)
+
+# Диагностика: доля апдейтов, которые пишутся в лог (0 — выключено, 1 — все)
+DEBUG_UPDATES_SAMPLE = float(os.getenv("DEBUG_UPDATES_SAMPLE", "0") or 0)
+
 # Ссылка на мини-апп (ОБЯЗАТЕЛЬНО HTTPS)
 WEBAPP_URL = os.getenv("WEBAPP_URL", "").strip()
 if not WEBAPP_URL:
@@ -151,42 +275,153 @@ def back_home_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Главное меню", callback_data="go_home")]])
 
 
+# клавиатуры не меняются, пока процесс жив: собираем один раз
+MAIN_KB = main_keyboard()
+BACK_HOME_KB = back_home_kb()
+
+
 # ==========================================================
 # 6) HELPERS
 # ==========================================================
+@functools.lru_cache(maxsize=None)
+def _ssl_context():
+    return httpx.create_ssl_context()
+
+
+def http_request(connection_pool_size: int = 1) -> HTTPXRequest:
+    """
+    HTTPXRequest с общим SSL контекстом: иначе каждый клиент (запросы и
+    long polling) заново читает корневые сертификаты — ~25 мс на старте.
+    """
+    return HTTPXRequest(connection_pool_size=connection_pool_size, httpx_kwargs={"verify": _ssl_context()})
+
+
+# logo.jpg / events.pdf грузятся в Telegram один раз, дальше идёт file_id
+media_cache = MediaCache()
+
+# общий лимитер исходящих сообщений (лимиты Telegram на бота и на группу);
+# в кластере окна одни на все воркеры и живут в ingress
+if BOT_MODE == "worker":
+    from cluster import SharedRateLimiter
+
+    rate_limiter: TelegramRateLimiter = SharedRateLimiter(CLUSTER_SOCKET, CLUSTER_WORKERS)
+else:
+    rate_limiter = TelegramRateLimiter()
+
+# цены меню для пересчёта предзаказов и выдачи мини-аппу (GET /menu.json)
+menu_catalog = MenuCatalog(MENU_CATALOG_FILE)
+
+# занятость зала по слотам (заполняется в post_init, дальше — на каждую бронь)
+availability = Availability(SEATS_CAPACITY, BOOKING_SLOT_MINUTES, BOOKING_DURATION_MINUTES)
+
+# вёдра токенов на пользователя/чат: спам /start, «Главное меню» и web_app_data
+flood_control = FloodControl(max_keys=FLOOD_MAX_KEYS)
+
+# недавно принятые web_app_data: повтор отбрасывается без похода в БД
+seen_updates = SeenKeys()
+
+# фоновая доставка сообщений персоналу (создаётся в post_init)
+outbox_worker: OutboxWorker | None = None
+
+# рассылка гостям (создаётся в post_init; в кластере — только в воркере 0)
+broadcaster: Broadcaster | None = None
+
+# HTTP сервер для /metrics (если задан METRICS_PORT)
+metrics_server: HttpServer | None = None
+
+# HTTP сервер для /menu.json в режиме polling (если задан MENU_PORT)
+menu_server: HttpServer | None = None
+
+
+async def _edit_to_home(message: Message, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Кнопку нажали под сообщением бота: делаем из него главный экран. False — редактировать нельзя."""
+    try:
+        if LOGO_PATH.exists():
+            if message.photo:
+                await message.edit_caption(caption=HOME_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_KB)
+            elif message.document or message.video or message.animation or message.audio:
+                await media_cache.edit_photo(
+                    context.bot,
+                    message.chat_id,
+                    message.message_id,
+                    LOGO_PATH,
+                    caption=HOME_TEXT,
+                    parse_mode=ParseMode.MARKDOWN,
+                    reply_markup=MAIN_KB,
+                )
+            else:
+                # текст в фото не превратить
+                return False
+        elif message.text:
+            await message.edit_text(HOME_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_KB)
+        else:
+            return False
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return True
+        logger.info("ℹ️ Главный экран не отредактировать (%s), шлю заново", e)
+        return False
+    return True
+
+
+async def _pin_home(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int) -> None:
+    await context.bot.pin_chat_message(chat_id=chat_id, message_id=message_id, disable_notification=True)
+    context.chat_data["home_pinned"] = message_id
+
+
 async def show_home(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
-
     old_home = context.chat_data.get("home_message_id")
-    if isinstance(old_home, int):
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=old_home)
-        except Exception:
-            pass
 
-    if LOGO_PATH.exists():
-        with LOGO_PATH.open("rb") as f:
-            msg = await context.bot.send_photo(
-                chat_id=chat_id,
-                photo=f,
-                caption=HOME_TEXT,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=main_keyboard(),
-            )
+    # из колбэка — правим сообщение с кнопкой на месте (один запрос к Bot API)
+    q = update.callback_query
+    if q and isinstance(q.message, Message) and await _edit_to_home(q.message, context):
+        msg = q.message
+    elif LOGO_PATH.exists():
+        msg = await media_cache.send_photo(
+            context.bot,
+            chat_id,
+            LOGO_PATH,
+            caption=HOME_TEXT,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=MAIN_KB,
+        )
     else:
         msg = await context.bot.send_message(
             chat_id=chat_id,
             text=HOME_TEXT,
             parse_mode=ParseMode.MARKDOWN,
-            reply_markup=main_keyboard(),
+            reply_markup=MAIN_KB,
         )
 
     context.chat_data["home_message_id"] = msg.message_id
 
+    # старый главный экран убрать, новый закрепить — параллельно; ошибки не важны
+    jobs = []
+    if isinstance(old_home, int) and old_home != msg.message_id:
+        jobs.append(context.bot.delete_message(chat_id=chat_id, message_id=old_home))
+    if context.chat_data.get("home_pinned") != msg.message_id:
+        jobs.append(_pin_home(context, chat_id, msg.message_id))
+    await asyncio.gather(*jobs, return_exceptions=True)
+
+
+async def _notify_one(context: ContextTypes.DEFAULT_TYPE, cid: int, text: str) -> bool:
     try:
-        await context.bot.pin_chat_message(chat_id=chat_id, message_id=msg.message_id, disable_notification=True)
-    except Exception:
-        pass
+        # ⚠️ без ParseMode, чтобы спецсимволы не ломали отправку
+        await call_with_retry(rate_limiter, cid, lambda: context.bot.send_message(chat_id=cid, text=text))
+        NOTIFY.inc(cid, "ok")
+        return True
+    except Exception as e:
+        NOTIFY.inc(cid, "error")
+        logger.exception("❌ Не смог отправить в чат %s: %s", cid, e)
+        return False
+
+
+def staff_targets(extra_chat_ids: list[int] | None = None) -> set[int]:
+    target_ids = set(NOTIFY_CHAT_IDS)
+    if extra_chat_ids:
+        target_ids.update(extra_chat_ids)
+    return target_ids
 
 
 async def notify_staff(
@@ -194,19 +429,11 @@ async def notify_staff(
     text: str,
     extra_chat_ids: list[int] | None = None,
 ) -> int:
-    """Шлёт в группу(ы). Возвращает сколько чатов успешно отправлено."""
-    ok = 0
-    target_ids = set(NOTIFY_CHAT_IDS)
-    if extra_chat_ids:
-        target_ids.update(extra_chat_ids)
-    for cid in target_ids:
-        try:
-            # ⚠️ без ParseMode, чтобы спецсимволы не ломали отправку
-            await context.bot.send_message(chat_id=cid, text=text)
-            ok += 1
-        except Exception as e:
-            logger.exception("❌ Не смог отправить в чат %s: %s", cid, e)
-    return ok
+    """Шлёт в группу(ы) сразу и параллельно. Возвращает сколько чатов успешно отправлено."""
+    target_ids = staff_targets(extra_chat_ids)
+    results = await asyncio.gather(*(_notify_one(context, cid, text) for cid in target_ids))
+    return sum(results)
+
 
 
 
@@ -242,18 +469,191 @@ async def webappurl_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     )
 
 
+async def availability_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Для персонала (чаты из NOTIFY_CHAT_IDS):
+      /availability [дата]                — загрузка зала по слотам
+      /availability [дата] 19:30 [гостей] — сколько свободно и сядут ли гости
+    """
+    if not update.effective_chat or update.effective_chat.id not in NOTIFY_CHAT_IDS:
+        return
+
+    args = list(context.args or [])
+    time_pos = next((i for i, a in enumerate(args) if ":" in a), None)
+    date_text = " ".join(args[:time_pos] if time_pos is not None else args) or "сегодня"
+    day = parse_date(date_text, date.today())
+    if day is None:
+        await update.message.reply_text("Не понял дату. Пример: /availability пятница 19:30 6")
+        return
+
+    if time_pos is None:
+        taken = availability.day(day)
+        lines = [
+            f"{availability.slot_label(i)} — {n}/{availability.capacity}"
+            for i, n in enumerate(taken)
+            if n
+        ]
+        if not lines:
+            await update.message.reply_text(f"🪑 {day:%d.%m}: броней нет, свободно {availability.capacity} мест.")
+            return
+        await update.message.reply_text(f"🪑 {day:%d.%m}, занято мест по слотам:\n" + "\n".join(lines))
+        return
+
+    t = parse_time(args[time_pos])
+    rest = args[time_pos + 1:]
+    if t is None or (rest and not rest[0].isdigit()):
+        await update.message.reply_text("Не понял время/гостей. Пример: /availability пятница 19:30 6")
+        return
+    slot_at = f"{day.isoformat()}T{t:%H:%M}"
+    free = availability.free(slot_at)
+    text = f"🪑 {day:%d.%m} {t:%H:%M}: свободно {max(free, 0)} из {availability.capacity}"
+    if rest:
+        guests = int(rest[0])
+        text += f"\n{guests} гостей — " + ("✅ посадим" if availability.can_seat(slot_at, guests) else "❌ не поместятся")
+    await update.message.reply_text(text)
+
+
+_BROADCAST_HELP = (
+    "/broadcast текст — разослать всем гостям\n"
+    "/broadcast events текст — с афишей (events.pdf), текст в подписи\n"
+    "/broadcast status — ход рассылки\n"
+    "/broadcast stop — остановить"
+)
+
+
+async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Для персонала: рассылка всем, кто бронировал или делал предзаказ.
+    Сама рассылка идёт в фоне (broadcast.py), здесь — только запись в broadcasts.
+    """
+    if not update.effective_chat or update.effective_chat.id not in NOTIFY_CHAT_IDS:
+        return
+
+    # текст берём как есть, с переносами строк (context.args их теряет)
+    parts = (update.message.text or "").split(None, 1)
+    body = parts[1].strip() if len(parts) > 1 else ""
+    words = body.split(None, 1)
+    sub = words[0].lower() if words else ""
+    rest = words[1] if len(words) > 1 else ""
+
+    if not body:
+        await update.message.reply_text(_BROADCAST_HELP)
+        return
+    if sub == "status":
+        row = await last_broadcast()
+        await update.message.reply_text(report_text(row) if row else "Рассылок ещё не было.")
+        return
+    if sub == "stop":
+        row = await running_broadcast()
+        done = await finish_broadcast(row["id"], "canceled") if row else None
+        await update.message.reply_text(report_text(done) if done else "Сейчас ничего не рассылается.")
+        return
+
+    attachment = None
+    text = body
+    if sub == "events":
+        if not EVENTS_FILE.exists():
+            await update.message.reply_text("Файл афиши не найден (assets/events.pdf).")
+            return
+        attachment, text = EVENTS_FILE.name, rest.strip()
+        # подпись к документу в Telegram — до 1024 символов
+        if len(text) > 1024:
+            await update.message.reply_text(f"Подпись к афише длиннее 1024 символов ({len(text)}).")
+            return
+    if not text:
+        await update.message.reply_text(_BROADCAST_HELP)
+        return
+    if await running_broadcast() is not None:
+        await update.message.reply_text("Уже идёт рассылка: /broadcast status или /broadcast stop.")
+        return
+
+    bid = await create_broadcast(update.effective_chat.id, text, attachment)
+    if broadcaster is not None:
+        broadcaster.wake()
+    await update.message.reply_text(f"📣 Рассылка #{bid} запущена. Отчёт придёт сюда.")
+
+
+_EXPORT_KINDS = {"bookings": "bookings", "брони": "bookings", "preorders": "preorders", "предзаказы": "preorders"}
+_EXPORT_FORMATS = {"csv": "csv", "json": "json", "ndjson": "json"}
+# лимит Telegram на документ от бота
+_EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def _past_date(text: str, today: date) -> date | None:
+    """parse_date смотрит вперёд («26.01» — ближайшее), для выгрузки нужна прошедшая дата."""
+    d = parse_date(text, today)
+    if d is not None and d > today:
+        try:
+            d = d.replace(year=d.year - 1)
+        except ValueError:
+            return None
+    return d
+
+
+async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Для персонала — выгрузка в gzip файл:
+      /export [bookings|preorders] [с] [по] [csv|json]
+    По умолчанию брони за последние 30 дней в CSV; одна дата — с неё по сегодня.
+    """
+    if not update.effective_chat or update.effective_chat.id not in NOTIFY_CHAT_IDS:
+        return
+
+    kind, fmt, dates = "bookings", "csv", []
+    today = date.today()
+    for arg in context.args or []:
+        a = arg.lower()
+        if a in _EXPORT_KINDS:
+            kind = _EXPORT_KINDS[a]
+        elif a in _EXPORT_FORMATS:
+            fmt = _EXPORT_FORMATS[a]
+        else:
+            d = _past_date(arg, today)
+            if d is None or len(dates) == 2:
+                await update.message.reply_text("Не понял. Пример: /export preorders 01.10 31.10 json")
+                return
+            dates.append(d)
+    start = dates[0] if dates else today - timedelta(days=30)
+    end = dates[1] if len(dates) > 1 else today
+    if start > end:
+        start, end = end, start
+
+    path, count = await export_file(kind, fmt, start, end)
+    try:
+        size = path.stat().st_size
+        if size > _EXPORT_MAX_BYTES:
+            await update.message.reply_text(f"Файл {size // 2**20} МБ — больше лимита Telegram. Сузь период.")
+            return
+        ext = "csv.gz" if fmt == "csv" else "ndjson.gz"
+        with path.open("rb") as f:
+            await update.message.reply_document(
+                document=f,
+                filename=f"{kind}_{start.isoformat()}_{end.isoformat()}.{ext}",
+                caption=f"📤 {kind}: {start:%d.%m.%Y}–{end:%d.%m.%Y}, записей: {count}",
+            )
+    finally:
+        path.unlink(missing_ok=True)
+
+
 # ==========================================================
 # 8) CALLBACKS
 # ==========================================================
 async def go_home_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.callback_query.answer()
     for k in ["b_date", "b_time", "b_guests", "b_name", "b_phone"]:
         context.user_data.pop(k, None)
-    await show_home(update, context)
+    # ответ на колбэк не ждём отдельно: пользователь видит результат правки
+    await asyncio.gather(update.callback_query.answer(), show_home(update, context))
 
 
 async def open_menu_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    return
+    q = update.callback_query
+    await q.answer()
+
+    if not MENU_FILE.exists():
+        await q.message.reply_text("📋 Меню пока недоступно.", reply_markup=BACK_HOME_KB)
+        return
+
+    await media_cache.send_document(context.bot, q.message.chat_id, MENU_FILE, reply_markup=BACK_HOME_KB)
 
 
 async def open_events_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -261,11 +661,10 @@ async def open_events_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await q.answer()
 
     if not EVENTS_FILE.exists():
-        await q.message.reply_text("🎉 Пока пусто.", reply_markup=back_home_kb())
+        await q.message.reply_text("🎉 Пока пусто.", reply_markup=BACK_HOME_KB)
         return
 
-    with EVENTS_FILE.open("rb") as f:
-        await q.message.reply_document(document=f, filename=EVENTS_FILE.name, reply_markup=back_home_kb())
+    await media_cache.send_document(context.bot, q.message.chat_id, EVENTS_FILE, reply_markup=BACK_HOME_KB)
 
 
 # ==========================================================
@@ -274,19 +673,19 @@ async def open_events_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def booking_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     q = update.callback_query
     await q.answer()
-    await q.message.reply_text("📅 Напиши дату (например: 26.01 или 26 января):", reply_markup=back_home_kb())
+    await q.message.reply_text("📅 Напиши дату (например: 26.01 или 26 января):", reply_markup=BACK_HOME_KB)
     return B_DATE
 
 
 async def b_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["b_date"] = update.message.text.strip()
-    await update.message.reply_text("⏰ Время (например: 19:30):", reply_markup=back_home_kb())
+    await update.message.reply_text("⏰ Время (например: 19:30):", reply_markup=BACK_HOME_KB)
     return B_TIME
 
 
 async def b_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["b_time"] = update.message.text.strip()
-    await update.message.reply_text("👥 Количество гостей числом (1–50):", reply_markup=back_home_kb())
+    await update.message.reply_text("👥 Количество гостей числом (1–50):", reply_markup=BACK_HOME_KB)
     return B_GUESTS
 
 
@@ -297,17 +696,17 @@ async def b_guests(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         if not (1 <= guests <= 50):
             raise ValueError
     except ValueError:
-        await update.message.reply_text("Напиши число от 1 до 50.", reply_markup=back_home_kb())
+        await update.message.reply_text("Напиши число от 1 до 50.", reply_markup=BACK_HOME_KB)
         return B_GUESTS
 
     context.user_data["b_guests"] = guests
-    await update.message.reply_text("👤 На какое имя бронируем?", reply_markup=back_home_kb())
+    await update.message.reply_text("👤 На какое имя бронируем?", reply_markup=BACK_HOME_KB)
     return B_NAME
 
 
 async def b_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["b_name"] = update.message.text.strip()
-    await update.message.reply_text("📞 Телефон для связи:", reply_markup=back_home_kb())
+    await update.message.reply_text("📞 Телефон для связи:", reply_markup=BACK_HOME_KB)
     return B_PHONE
 
 
@@ -322,34 +721,51 @@ async def b_comment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def finalize_booking(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
-
-    booking_id = create_booking(
+    guests = int(context.user_data.get("b_guests", 1))
+    slot_at = normalize_slot(str(context.user_data.get("b_date", "")), str(context.user_data.get("b_time", "")), date.today())
+    # мест нет — бронь всё равно принимаем, решает персонал
+    free = availability.free(slot_at) if slot_at else None
+
+    def staff_text(booking_id: int) -> str:
+        text = (
+            f"📌 Новая бронь #{booking_id}\n"
+            f"Дата: {context.user_data.get('b_date')}\n"
+            f"Время: {context.user_data.get('b_time')}\n"
+            f"Гостей: {context.user_data.get('b_guests')}\n"
+            f"Имя: {context.user_data.get('b_name')}\n"
+            f"Телефон: {context.user_data.get('b_phone')}\n"
+            f"Комментарий: -"
+        )
+        if slot_at is None:
+            text += "\n⚠️ Дату/время не разобрал — проверьте вручную"
+        elif free is not None and guests > free:
+            text += f"\n⚠️ Зал на это время полон: свободно {max(free, 0)} из {availability.capacity}"
+        return text
+
+    # бронь и уведомление персоналу пишутся одной транзакцией, отправит outbox-воркер
+    booking_id = await create_booking(
         tg_user_id=user.id if user else None,
         tg_username=user.username if user else None,
         date=str(context.user_data.get("b_date", "")),
         time=str(context.user_data.get("b_time", "")),
-        guests=int(context.user_data.get("b_guests", 1)),
+        guests=guests,
         name=str(context.user_data.get("b_name", "")),
         phone=str(context.user_data.get("b_phone", "")),
         comment="",
+        notify_chat_ids=staff_targets(),
+        notify_text=staff_text,
+        slot_at=slot_at,
     )
+    if slot_at:
+        availability.add(slot_at, guests)
+    BOOKINGS.inc()
+    if outbox_worker is not None:
+        outbox_worker.wake()
 
     await update.message.reply_text(
         f"✅ Бронь принята! Номер #{booking_id}",
-        reply_markup=back_home_kb(),
-    )
-
-    ok = await notify_staff(
-        context,
-        f"📌 Новая бронь #{booking_id}\n"
-        f"Дата: {context.user_data.get('b_date')}\n"
-        f"Время: {context.user_data.get('b_time')}\n"
-        f"Гостей: {context.user_data.get('b_guests')}\n"
-        f"Имя: {context.user_data.get('b_name')}\n"
-        f"Телефон: {context.user_data.get('b_phone')}\n"
-        f"Комментарий: -",
+        reply_markup=BACK_HOME_KB,
     )
-    logger.info("Booking notify sent to %s chats", ok)
 
     for k in ["b_date", "b_time", "b_guests", "b_name", "b_phone"]:
         context.user_data.pop(k, None)
@@ -360,7 +776,7 @@ async def finalize_booking(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 async def cancel_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.clear()
     if update.message:
-        await update.message.reply_text("Ок, отменил.", reply_markup=back_home_kb())
+        await update.message.reply_text("Ок, отменил.", reply_markup=BACK_HOME_KB)
     return ConversationHandler.END
 
 
@@ -372,99 +788,94 @@ async def webapp_order_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     raw = update.message.web_app_data.data
-    logger.info("📦 WEB_APP_DATA RAW: %s", raw)
-    logger.info("📦 WEB_APP_DATA LEN: %s", len(raw))
+    logger.info("📦 WEB_APP_DATA: %s байт", len(raw))
+
+    # повторная доставка того же апдейта или тот же заказ второй раз подряд
+    user = update.effective_user
+    keys = dedup_keys(update.update_id, user.id if user else None, raw)
+    if seen_updates.seen(keys):
+        DUPLICATES.inc("memory")
+        logger.info("♻️ Повтор web_app_data (update %s) — пропускаю", update.update_id)
+        return
 
     try:
-        data = json.loads(raw)
-    except Exception as e:
-        logger.exception("❌ JSON parse error: %s", e)
-        await update.message.reply_text("❌ Ошибка чтения заказа (JSON).")
+        order = decode_preorder(raw)
+        if order is not None and menu_catalog.reprice(order):
+            PREORDERS_REPRICED.inc()
+            logger.warning("⚠️ Суммы предзаказа не совпали с меню — пересчитаны по каталогу")
+    except PreorderError as e:
+        logger.warning("❌ Некорректный предзаказ: %s", e)
+        await update.message.reply_text(f"❌ Ошибка в заказе: {e}")
         return
 
-    if data.get("type") != "preorder":
-        logger.info("⚠️ not preorder type: %s", data.get("type"))
+    if order is None:
+        logger.info("⚠️ web_app_data не предзаказ")
         return
 
-    user = update.effective_user
     who = f"@{user.username}" if user and user.username else (user.full_name if user else "Неизвестно")
 
-    phone = str(data.get("phone", "-"))
-    desired_time = str(data.get("desired_time", "-"))
-    comment = str(data.get("comment", "") or "")
-    total = data.get("total", 0)
-    items = data.get("items", []) or []
-    tg = data.get("tg") or {}
-    tg_line = ""
-    if isinstance(tg, dict) and tg:
-        tg_user = tg.get("username") or ""
-        if tg_user:
-            tg_line = f"Telegram: @{tg_user}\n"
-
-    lines = []
-    for it in items:
-        try:
-            name = it.get("name") or it.get("id") or "item"
-            qty = it.get("qty")
-            summ = it.get("sum")
-            if summ is not None:
-                lines.append(f"- {name} × {qty} = {summ} ₽")
-            else:
-                lines.append(f"- {name} × {qty}")
-        except Exception:
-            pass
-
-    text = (
-        "🛒 НОВЫЙ ПРЕДЗАКАЗ (Mini App)\n\n"
-        f"От: {who}\n"
-        f"{tg_line}"
-        f"Телефон: {phone}\n"
-        f"Время: {desired_time}\n\n"
-        + "\n".join(lines) +
-        f"\n\nИтого: {total} ₽"
-    )
-    if comment:
-        text += f"\nКомментарий: {comment}"
-
     source_chat_id = None
     if update.effective_chat and update.effective_chat.type in ("group", "supergroup"):
         source_chat_id = update.effective_chat.id
 
-    ok = await notify_staff(context, text, extra_chat_ids=[source_chat_id] if source_chat_id else None)
-    logger.info("Preorder notify sent to %s chats", ok)
+    # предзаказ, позиции и сообщение персоналу — одной транзакцией, отправит outbox-воркер
+    try:
+        preorder_id = await create_preorder(
+            tg_user_id=user.id if user else None,
+            tg_username=user.username if user else None,
+            phone=order.phone,
+            desired_time=order.desired_time,
+            comment=order.comment,
+            total=float(order.total),
+            items=[it.row() for it in order.items],
+            source_chat_id=source_chat_id,
+            notify_chat_ids=staff_targets([source_chat_id] if source_chat_id else None),
+            notify_text=lambda preorder_id: render_staff(order, who, preorder_id),
+            dedup_keys=keys,
+        )
+    except Exception as e:
+        logger.exception("❌ Не смог сохранить предзаказ: %s", e)
+        await update.message.reply_text("❌ Не получилось принять предзаказ, попробуй ещё раз через минуту.")
+        return
+    seen_updates.remember(keys)
+    if preorder_id is None:
+        DUPLICATES.inc("db")
+        logger.info("♻️ Повтор web_app_data (update %s) уже в БД — пропускаю", update.update_id)
+        return
+    PREORDERS.inc()
+    if outbox_worker is not None:
+        outbox_worker.wake()
+    logger.info("Preorder #%s saved and queued for staff", preorder_id)
 
-    if ok > 0:
-        # Ответ в тот чат, где был открыт мини‑апп
+    # Ответ в тот чат, где был открыт мини‑апп
+    try:
+        await update.message.reply_text(CONFIRMATION_TEXT)
+    except Exception:
+        pass
+    # И отдельное подтверждение пользователю в личку (если доступно)
+    if user:
         try:
-            await update.message.reply_text("✅ Предзаказ принят! Мы скоро свяжемся.")
+            await context.bot.send_message(
+                chat_id=user.id,
+                text=CONFIRMATION_TEXT,
+            )
         except Exception:
             pass
-        # И отдельное подтверждение пользователю в личку (если доступно)
-        if user:
-            try:
-                await context.bot.send_message(
-                    chat_id=user.id,
-                    text="✅ Предзаказ принят! Мы скоро свяжемся.",
-                )
-            except Exception:
-                pass
-    else:
-        await update.message.reply_text(
-            "❌ Заказ дошёл до бота, но НЕ отправился в группу.\n"
-            "Проверь: бот добавлен в группу, chat_id верный, нет ограничений на отправку."
-        )
 
 
 async def debug_all_updates(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Диагностика: лог всех входящих апдейтов."""
+    """Диагностика: выборочный лог входящих апдейтов (включается DEBUG_UPDATES_SAMPLE)."""
+    if random.random() >= DEBUG_UPDATES_SAMPLE:
+        return
     try:
         if update.message and update.message.web_app_data:
             logger.info("✅ DEBUG: web_app_data received")
         elif update.message:
-            logger.info("ℹ️ DEBUG: message chat=%s type=%s text=%s",
+            # текст гостей в лог не пишем — только длину
+            logger.info("ℹ️ DEBUG: message chat=%s type=%s len=%s",
                         update.effective_chat.id if update.effective_chat else None,
                         update.effective_chat.type if update.effective_chat else None,
-                        update.message.text)
+                        len(update.message.text or ""))
         elif update.callback_query:
             logger.info("ℹ️ DEBUG: callback %s", update.callback_query.data)
         else:
@@ -477,42 +888,250 @@ async def debug_all_updates(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 # ==========================================================
-# 11) GLOBAL ERROR HANDLER
+# 11) FLOOD CONTROL
+# ==========================================================
+# callback_data → бюджет; всё, что шлёт фото/PDF, — дорогое
+_CALLBACK_ACTIONS = {"go_home": "expensive", "open_menu": "expensive", "open_events": "expensive"}
+_COMMAND_ACTIONS = {"start": "expensive", "testnotify": "staff", "export": "expensive"}
+
+
+def throttle_action(update: Update) -> str | None:
+    """Какой бюджет тратит апдейт; None — не троттлим (обычные сообщения групп и пр.)."""
+    q = update.callback_query
+    if q is not None:
+        return _CALLBACK_ACTIONS.get(q.data or "", "cheap")
+    msg = update.message
+    if msg is None:
+        return None
+    if msg.web_app_data:
+        return "staff"
+    text = msg.text or ""
+    if text.startswith("/"):
+        command = text[1:].split(maxsplit=1)[0].split("@", 1)[0] if len(text) > 1 else ""
+        return _COMMAND_ACTIONS.get(command.lower(), "cheap")
+    return None
+
+
+async def flood_guard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Первым в цепочке: лишние нажатия не доходят до обработчиков и Bot API."""
+    action = throttle_action(update)
+    if action is None:
+        return
+    user = update.effective_user
+    chat = update.effective_chat
+    verdict = flood_control.allow(action, user.id if user else None, chat.id if chat else None)
+    if verdict is None:
+        return
+
+    THROTTLED.inc(action)
+    wait, notify = verdict
+    # одно предупреждение на серию отказов, остальные — без вызовов Bot API
+    if notify:
+        text = f"⏳ Слишком часто. Попробуй через {max(1, round(wait))} с."
+        try:
+            if update.callback_query:
+                await update.callback_query.answer(text)
+            elif update.message:
+                await update.message.reply_text(text)
+        except Exception as e:
+            logger.info("ℹ️ Не смог предупредить о троттлинге: %s", e)
+    raise ApplicationHandlerStop
+
+
+# ==========================================================
+# 12) GLOBAL ERROR HANDLER
 # ==========================================================
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.exception("Unhandled error: %s", context.error)
 
 
 # ==========================================================
-# 12) MAIN
+# 13) MAIN
 # ==========================================================
-def main() -> None:
-    init_db(str(BASE_DIR / "schema.sql"))
+async def prune_availability(context: ContextTypes.DEFAULT_TYPE) -> None:
+    availability.prune(date.today() - timedelta(days=1))
+
+
+async def post_init(app) -> None:
+    global outbox_worker, broadcaster, metrics_server, menu_server
+    since = date.today() - timedelta(days=1)
+    for slot_at, guests in await bookings_since(since.isoformat()):
+        availability.add(slot_at, guests)
+    # повтор сразу после рестарта тоже отсекается в памяти
+    seen_updates.remember(await recent_dedup_keys(seen_updates.max_keys))
+    if app.job_queue is None:
+        logger.warning("⚠️ Нет JobQueue (pip install \"python-telegram-bot[job-queue]\"): обслуживание БД и очистка загрузки зала выключены")
+    else:
+        # прошедшие дни загрузки зала в памяти не копим (в каждом процессе своя)
+        app.job_queue.run_daily(prune_availability, dt_time(0, 5), name="availability-prune")
+    # в кластере outbox разбирают все воркеры сразу
+    outbox_worker = OutboxWorker(app.bot, rate_limiter, exclusive=BOT_MODE != "worker")
+    await outbox_worker.start()
+    # рассылку ведёт один процесс; незаконченная после рестарта продолжится с курсора
+    if BOT_MODE != "worker" or WORKER_INDEX == 0:
+        broadcaster = Broadcaster(
+            app.bot,
+            rate_limiter,
+            media_cache,
+            ASSETS_DIR,
+            per_second=BROADCAST_PER_SECOND,
+            on_report=outbox_worker.wake,
+        )
+        await broadcaster.start()
+        # обслуживание БД — тоже один процесс на файл
+        if app.job_queue is not None:
+            app.job_queue.run_repeating(
+                Maintenance(ARCHIVE_DIR, RETENTION_DAYS, MAINTENANCE_HOURS).tick,
+                interval=MAINTENANCE_INTERVAL,
+                first=MAINTENANCE_INTERVAL,
+                name="db-maintenance",
+            )
 
-    app = ApplicationBuilder().token(TOKEN).build()
+    if METRICS_PORT:
+        metrics_server = HttpServer({
+            ("GET", "/metrics"): metrics_endpoint,
+            ("GET", "/menu.json"): menu_catalog.http_handler,
+        })
+        await metrics_server.start(METRICS_LISTEN, METRICS_PORT + (WORKER_INDEX if BOT_MODE == "worker" else 0))
+    # в polling нет сервера вебхука: без MENU_PORT мини-апп не получит цены
+    if BOT_MODE == "polling" and MENU_PORT:
+        menu_server = HttpServer({("GET", "/menu.json"): menu_catalog.http_handler})
+        await menu_server.start(MENU_LISTEN, MENU_PORT)
+
+
+async def post_shutdown(app) -> None:
+    if metrics_server is not None:
+        await metrics_server.stop()
+    if menu_server is not None:
+        await menu_server.stop()
+    if broadcaster is not None:
+        await broadcaster.stop()
+    if outbox_worker is not None:
+        await outbox_worker.stop()
+    await close_db()
+
+
+def build_application(request: BaseRequest | None = None) -> Application:
+    """Собрать Application со всеми обработчиками (request — подмена HTTP слоя для стендов)."""
+    builder = ApplicationBuilder().token(TOKEN).post_init(post_init).post_shutdown(post_shutdown)
+    # chat_data/user_data (home_message_id, ...) переживают рестарт
+    builder = builder.persistence(SqlitePersistence(update_interval=STATE_FLUSH_INTERVAL))
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENT_UPDATES))
+    if BOT_API_URL:
+        builder = builder.base_url(BOT_API_URL)
+    # все вызовы Bot API (кроме long polling) идут через обёртку с метриками
+    builder = builder.request(InstrumentedRequest(request or http_request(connection_pool_size=256)))
+    builder = builder.get_updates_request(request or http_request())
+    app = builder.build()
 
     # commands
     app.add_handler(CommandHandler("start", start_cmd))
     app.add_handler(CommandHandler("chatid", chatid_cmd))
     app.add_handler(CommandHandler("testnotify", testnotify_cmd))
     app.add_handler(CommandHandler("webappurl", webappurl_cmd))
+    app.add_handler(CommandHandler("availability", availability_cmd))
+    app.add_handler(CommandHandler("broadcast", broadcast_cmd))
+    app.add_handler(CommandHandler("export", export_cmd))
     app.add_handler(CommandHandler("cancel", cancel_cmd))
 
     # callbacks
     app.add_handler(CallbackQueryHandler(go_home_cb, pattern="^go_home$"))
+    app.add_handler(CallbackQueryHandler(open_menu_cb, pattern="^open_menu$"))
     app.add_handler(CallbackQueryHandler(open_events_cb, pattern="^open_events$"))
 
     # booking conversation
     # booking conversation removed (бронь в мини-аппе)
 
-    # ✅ web app data handler (шире, чтобы не потерять апдейты)
-    app.add_handler(MessageHandler(filters.ALL, webapp_order_handler))
-    # debug handler
-    app.add_handler(MessageHandler(filters.ALL, debug_all_updates))
+    # ✅ web app data: только сервисные сообщения с web_app_data, обычные сообщения групп не трогаем
+    app.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, webapp_order_handler))
+    # троттлинг: раньше всех обработчиков, ApplicationHandlerStop обрывает цепочку
+    if FLOOD_CONTROL:
+        app.add_handler(TypeHandler(Update, flood_guard), group=-2)
+    # debug handler: отдельная группа, не мешает основным; по умолчанию выключен
+    if DEBUG_UPDATES_SAMPLE > 0:
+        app.add_handler(TypeHandler(Update, debug_all_updates), group=-1)
 
     # error handler
     app.add_error_handler(error_handler)
 
+    # метрики: время и исключения каждого зарегистрированного обработчика
+    for group in app.handlers.values():
+        for handler in group:
+            handler.callback = timed_handler(handler.callback)
+
+    return app
+
+
+def main() -> None:
+    if DB_FILE:
+        set_db_path(Path(DB_FILE))
+    init_db()
+    menu_catalog.refresh(force=True)
+
+    if BOT_MODE == "cluster":
+        from cluster import ClusterConfig, run_ingress
+        from webhook import WebhookConfig
+
+        if not WEBHOOK_URL:
+            raise RuntimeError("❌ BOT_MODE=cluster, но не задан WEBHOOK_URL (публичный https адрес вебхука).")
+        if not WEBHOOK_SECRET:
+            logger.warning("⚠️ WEBHOOK_SECRET пустой: вебхук примет запрос от кого угодно.")
+
+        logger.info("🤖 Бот запущен (CLUSTER, воркеров: %s)", CLUSTER_WORKERS)
+        run_ingress(
+            Bot(
+                TOKEN,
+                request=http_request(),
+                get_updates_request=http_request(),
+                **({"base_url": BOT_API_URL} if BOT_API_URL else {}),
+            ),
+            WebhookConfig(
+                url=WEBHOOK_URL,
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                path=WEBHOOK_PATH,
+                secret=WEBHOOK_SECRET,
+            ),
+            ClusterConfig(workers=CLUSTER_WORKERS, queue_path=CLUSTER_QUEUE, limiter_socket=CLUSTER_SOCKET),
+            extra_routes={("GET", "/menu.json"): menu_catalog.http_handler},
+        )
+        return
+
+    app = build_application()
+
+    if BOT_MODE == "worker":
+        from cluster import ClusterConfig, run_worker
+
+        run_worker(
+            app,
+            ClusterConfig(workers=CLUSTER_WORKERS, queue_path=CLUSTER_QUEUE, limiter_socket=CLUSTER_SOCKET),
+            WORKER_INDEX,
+        )
+        return
+
+    if BOT_MODE == "webhook":
+        from webhook import WebhookConfig, run_webhook
+
+        if not WEBHOOK_URL:
+            raise RuntimeError("❌ BOT_MODE=webhook, но не задан WEBHOOK_URL (публичный https адрес вебхука).")
+        if not WEBHOOK_SECRET:
+            logger.warning("⚠️ WEBHOOK_SECRET пустой: вебхук примет запрос от кого угодно.")
+
+        logger.info("🤖 Бот запущен (WEBHOOK)")
+        run_webhook(
+            app,
+            WebhookConfig(
+                url=WEBHOOK_URL,
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                path=WEBHOOK_PATH,
+                secret=WEBHOOK_SECRET,
+            ),
+            extra_routes={("GET", "/menu.json"): menu_catalog.http_handler},
+        )
+        return
+
     logger.info("🤖 Бот запущен (POLLING)")
     app.run_polling()
 
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Callable, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden
+
+from db import (
+    advance_broadcast,
+    broadcast_recipients,
+    enqueue_notifications,
+    finish_broadcast,
+    record_broadcast,
+    running_broadcast,
+)
+from media_cache import MediaCache
+from metrics import BROADCAST
+from ratelimit import TelegramRateLimiter, call_with_retry
+
+logger = logging.getLogger("spalnik_bot.broadcast")
+
+# Рассылке — 20 из 30 сообщений/с бота: остальное остаётся персоналу и ответам гостям
+PER_SECOND = 20
+# Сколько получателей читаем из БД за раз и сколько шлём параллельно между сдвигами курсора
+PAGE_SIZE = 500
+CHUNK_SIZE = 20
+# как часто проверять, не запустили ли рассылку из другого процесса
+IDLE_INTERVAL = 5.0
+
+# BadRequest, после которых писать гостю бессмысленно — как блокировка
+_GONE_ERRORS = ("chat not found", "user not found", "peer_id_invalid")
+
+
+def _recipient_gone(e: Exception) -> bool:
+    if isinstance(e, Forbidden):
+        return True
+    return isinstance(e, BadRequest) and any(s in str(e).lower() for s in _GONE_ERRORS)
+
+
+def report_text(row: sqlite3.Row) -> str:
+    status = {"running": "идёт", "done": "завершена", "canceled": "остановлена"}.get(row["status"], row["status"])
+    return (
+        f"📣 Рассылка #{row['id']} {status}: отправлено {row['sent']}, "
+        f"заблокировали бота {row['blocked']}, ошибок {row['failed']}."
+    )
+
+
+class Broadcaster:
+    """
+    Фоновая рассылка гостям (таблица broadcasts).
+
+    Получатели не грузятся в память: их читает broadcast_recipients страницами
+    по tg_user_id после курсора. Курсор сдвигается в БД до отправки каждой
+    пачки, поэтому после рестарта рассылка продолжается с места остановки и
+    никому не приходит дважды (пачка, прерванная на лету, теряется — это
+    лучше дубля). Отменённую рассылку видно по тому же сдвигу курсора.
+
+    Шлём через свой лимитер (per_second) и общий — чтобы рассылка не съедала
+    лимит бота целиком. Вложение уходит первым сообщением одно: MediaCache
+    запоминает file_id, остальные получают его без повторной загрузки.
+    Гости, заблокировавшие бота, попадают в blocked_users и дальше пропускаются.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        limiter: TelegramRateLimiter,
+        media_cache: MediaCache,
+        assets_dir: Path,
+        per_second: int = PER_SECOND,
+        page_size: int = PAGE_SIZE,
+        chunk_size: int = CHUNK_SIZE,
+        on_report: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.bot = bot
+        self.limiter = limiter
+        self.media_cache = media_cache
+        self.assets_dir = assets_dir
+        self.throttle = TelegramRateLimiter(per_second=per_second)
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        # отчёт уходит через outbox — on_report будит его воркер
+        self.on_report = on_report
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="broadcaster")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                row = await running_broadcast()
+                if row is not None:
+                    await self.run_broadcast(row)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("❌ Рассылка: ошибка: %s", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=IDLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_broadcast(self, row: sqlite3.Row) -> None:
+        bid = row["id"]
+        text = row["text"]
+        cursor = row["cursor"]
+        path: Optional[Path] = None
+        if row["attachment"]:
+            path = self.assets_dir / row["attachment"]
+            if not path.exists():
+                logger.warning("⚠️ Рассылка #%s: нет файла %s, шлю только текст", bid, path.name)
+                path = None
+        if cursor:
+            logger.info("📣 Рассылка #%s: продолжаю после tg_user_id %s", bid, cursor)
+        else:
+            logger.info("📣 Рассылка #%s: старт", bid)
+
+        uploaded = path is None
+        while True:
+            ids, last = await broadcast_recipients(cursor, self.page_size)
+            if last is None:
+                break
+            for i in range(0, max(len(ids), 1), self.chunk_size):
+                chunk = ids[i:i + self.chunk_size]
+                # курсор — до отправки: повтор после сбоя не задвоит сообщения
+                chunk_end = last if i + self.chunk_size >= len(ids) else chunk[-1]
+                if not await advance_broadcast(bid, chunk_end):
+                    logger.info("⏹ Рассылка #%s остановлена", bid)
+                    return
+                if not chunk:
+                    continue
+                results: list[Optional[BaseException]] = []
+                # вложение — по одному, пока не загрузится: дальше MediaCache отдаёт file_id
+                while not uploaded and chunk:
+                    results += await asyncio.gather(self._send(chunk[0], text, path), return_exceptions=True)
+                    uploaded = results[-1] is None
+                    chunk = chunk[1:]
+                results += await asyncio.gather(*(self._send(uid, text, path) for uid in chunk), return_exceptions=True)
+                await self._record(bid, ids[i:i + self.chunk_size], results)
+            cursor = last
+
+        done = await finish_broadcast(bid, "done")
+        if done is None:
+            return
+        logger.info("✅ %s", report_text(done))
+        if done["created_by"] is not None:
+            await enqueue_notifications([done["created_by"]], report_text(done))
+            if self.on_report is not None:
+                self.on_report()
+
+    async def _record(self, bid: int, ids: list[int], results: list[Optional[BaseException]]) -> None:
+        sent = failed = 0
+        blocked: list[tuple[int, str]] = []
+        for uid, res in zip(ids, results):
+            if res is None:
+                sent += 1
+                BROADCAST.inc("ok")
+            elif _recipient_gone(res):
+                blocked.append((uid, f"{type(res).__name__}: {res}"))
+                BROADCAST.inc("blocked")
+            else:
+                failed += 1
+                BROADCAST.inc("error")
+                logger.warning("⚠️ Рассылка #%s: гостю %s не ушло: %s", bid, uid, res)
+        await record_broadcast(bid, sent, failed, blocked)
+
+    async def _send(self, chat_id: int, text: str, path: Optional[Path]) -> None:
+        await self.throttle.acquire(chat_id)
+        if path is not None:
+            call = lambda: self.media_cache.send_document(self.bot, chat_id, path, caption=text)  # noqa: E731
+        else:
+            call = lambda: self.bot.send_message(chat_id=chat_id, text=text)  # noqa: E731
+        await call_with_retry(self.limiter, chat_id, call)
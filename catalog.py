@@ -0,0 +1,239 @@
+"""
+Каталог меню: assets/menu.json → индекс в памяти по id позиции.
+
+Файл читается один раз и перечитывается, только когда меняется его mtime.
+По каталогу пересчитываются суммы предзаказа (цены приходят из мини-аппа
+и доверять им нельзя), и он же отдаётся мини-аппу компактным JSON с ETag.
+
+Черновик menu.json можно собрать из menu.pdf (нужен pypdf):
+    python catalog.py extract assets/menu.pdf > assets/menu.json
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from httpserver import Request, Response
+from preorder import Preorder, PreorderError
+
+logger = logging.getLogger("spalnik_bot.catalog")
+
+# stat() файла не чаще раза в секунду: горячий путь — только поиск в dict
+CHECK_INTERVAL = 1.0
+
+
+class MenuItem:
+    __slots__ = ("id", "name", "price", "category")
+
+    def __init__(self, id: str, name: str, price: int, category: str = "") -> None:
+        self.id = id
+        self.name = name
+        self.price = price
+        self.category = category
+
+
+class MenuCatalog:
+    """
+    Формат menu.json:
+        {"version": "2026-02", "items": [{"id": "...", "name": "...", "price": 450, "category": "..."}]}
+
+    Нет файла — каталог пустой и предзаказы не проверяются (как раньше).
+    Битый файл при перезагрузке — остаётся прежний индекс, ошибка в лог.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._items: dict[str, MenuItem] = {}
+        self._stat: Optional[tuple[int, int]] = None
+        self._checked = 0.0
+        self.version = ""
+        self.etag = ""
+        self._export = b""
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._items)
+
+    def get(self, item_id: str) -> Optional[MenuItem]:
+        self.refresh()
+        return self._items.get(item_id)
+
+    # ------------------------------------------------------
+    # загрузка
+    # ------------------------------------------------------
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked < CHECK_INTERVAL:
+            return
+        self._checked = now
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._stat is not None:
+                logger.warning("⚠️ Каталог меню %s пропал, проверка цен выключена", self.path)
+                self._set({}, "")
+            self._stat = None
+            return
+        key = (st.st_mtime_ns, st.st_size)
+        if key == self._stat:
+            return
+        self._stat = key
+        try:
+            self._load()
+        except Exception as e:
+            logger.error("❌ Не смог прочитать каталог меню %s: %s", self.path, e)
+
+    def _load(self) -> None:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        items: dict[str, MenuItem] = {}
+        for n, it in enumerate(data["items"], 1):
+            item_id = str(it["id"])
+            price = it["price"]
+            if type(price) is not int or price < 0:
+                raise ValueError(f"позиция #{n} ({item_id}): цена должна быть целым числом рублей")
+            if item_id in items:
+                raise ValueError(f"позиция #{n}: повторяется id {item_id}")
+            items[item_id] = MenuItem(item_id, str(it["name"]), price, str(it.get("category") or ""))
+        self._set(items, str(data.get("version") or ""))
+        logger.info("📋 Каталог меню: %s позиций, версия %s", len(items), self.version)
+
+    def _set(self, items: dict[str, MenuItem], version: str) -> None:
+        body = {
+            "items": [
+                {"id": it.id, "name": it.name, "price": it.price, "category": it.category}
+                for it in items.values()
+            ],
+        }
+        # без явной версии в файле версией считается хэш позиций
+        if not version:
+            version = hashlib.sha256(json.dumps(body, ensure_ascii=False, sort_keys=True).encode()).hexdigest()[:16]
+        self._items = items
+        self.version = version
+        self._export = json.dumps({"version": version, **body}, ensure_ascii=False, separators=(",", ":")).encode()
+        self.etag = '"%s"' % hashlib.sha256(self._export).hexdigest()[:16]
+
+    # ------------------------------------------------------
+    # проверка предзаказа
+    # ------------------------------------------------------
+    def reprice(self, order: Preorder) -> bool:
+        """
+        Проставить суммы позиций и итог по ценам каталога.
+
+        True — мини-апп прислал другие суммы (их заменили).
+        PreorderError — позиции нет в меню. Пустой каталог ничего не трогает.
+        """
+        self.refresh()
+        items = self._items
+        if not items:
+            return False
+        changed = False
+        total = 0
+        for it in order.items:
+            entry = items.get(it.id) if it.id is not None else None
+            if entry is None:
+                raise PreorderError(f"позиции «{it.name}» нет в меню")
+            line = entry.price * it.qty
+            if it.sum != line or it.name != entry.name:
+                changed = True
+                it.sum = line
+                it.name = entry.name
+            total += line
+        if order.total != total:
+            changed = True
+            order.total = total
+        return changed
+
+    # ------------------------------------------------------
+    # выдача мини-аппу
+    # ------------------------------------------------------
+    def export(self) -> tuple[bytes, str]:
+        self.refresh()
+        return self._export, self.etag
+
+    async def http_handler(self, req: Request) -> Response:
+        """GET /menu.json: 304, если у клиента та же версия (If-None-Match)."""
+        body, etag = self.export()
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            # мини-апп живёт на другом домене
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "ETag",
+        }
+        if not self._items:
+            return Response(404, headers=headers)
+        tags = {t.strip().removeprefix("W/") for t in req.headers.get("if-none-match", "").split(",")}
+        if etag in tags or "*" in tags:
+            return Response(304, headers=headers)
+        return Response(200, body, "application/json; charset=utf-8", headers)
+
+
+# ==========================================================
+# ЧЕРНОВИК КАТАЛОГА ИЗ menu.pdf
+# ==========================================================
+# «... 485 г 980», «... 500 мл 290», «... 160|50|40 г 620», «лимон 40»
+_PRICE_RE = re.compile(r"^(?P<head>.*?)\s*(?:(?P<portion>\d+(?:\|\d+)*)\s*(?:г|мл)\s+)?(?P<price>\d{2,5})\s*$")
+_SEPARATOR_RE = re.compile(r"-{5,}")
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z",
+    "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r",
+    "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower().translate(_TRANSLIT)).strip("-") or "item"
+
+
+def extract_from_pdf(pdf_path: Path) -> dict:
+    """
+    Черновик menu.json из текста PDF: блоки между строками «-----»,
+    последняя строка блока — «[порция г|мл] цена». Вёрстка меню свободная,
+    поэтому результат надо просмотреть и поправить руками.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("❌ Для разбора PDF нужен pypdf: pip install pypdf") from None
+
+    text = "\n".join(page.extract_text() or "" for page in PdfReader(str(pdf_path)).pages)
+    items = []
+    seen: dict[str, int] = {}
+    category = ""
+    for block in _SEPARATOR_RE.split(text):
+        lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
+        if not lines:
+            continue
+        m = _PRICE_RE.match(lines[-1])
+        if m is None:
+            continue
+        # заголовки разделов в меню набраны строчными: «мясо», «кофе»
+        while len(lines) > 1 and lines[0].islower():
+            head = lines.pop(0)
+            if len(head.split()) <= 3 and not re.search(r"[\d,]", head):
+                category = head
+        first = m.group("head") if len(lines) == 1 else lines[0]
+        name = first.split(". ", 1)[0].rstrip(".,").strip()
+        if not name:
+            continue
+        slug = _slug(name)
+        seen[slug] = seen.get(slug, 0) + 1
+        if seen[slug] > 1:
+            slug = f"{slug}-{seen[slug]}"
+        items.append({"id": slug, "name": name, "price": int(m.group("price")), "category": category})
+
+    return {"version": time.strftime("%Y-%m-%d"), "items": items}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "extract":
+        sys.exit("usage: python catalog.py extract assets/menu.pdf > assets/menu.json")
+    print(json.dumps(extract_from_pdf(Path(sys.argv[2])), ensure_ascii=False, indent=2))
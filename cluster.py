@@ -0,0 +1,454 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import os
+import signal
+import sqlite3
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from telegram import Bot, Update
+from telegram.ext import Application
+
+from db import DbThread
+from httpserver import HttpServer, Request, Response
+from ratelimit import GLOBAL_PER_SECOND, GROUP_PER_MINUTE, TelegramRateLimiter
+from webhook import SECRET_HEADER, WebhookConfig
+
+logger = logging.getLogger("spalnik_bot.cluster")
+
+# Очередь апдейтов — отдельный файл: запись ingress не спорит за блокировку с основной БД
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS update_queue (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  shard_key INTEGER NOT NULL,   -- chat id (нет чата — user id), по нему выбирается воркер
+  shard INTEGER NOT NULL,       -- abs(shard_key) % число воркеров
+  data TEXT NOT NULL            -- апдейт, как его прислал Telegram
+);
+CREATE INDEX IF NOT EXISTS idx_update_queue_shard ON update_queue (shard, id);
+"""
+
+# Сколько апдейтов воркер забирает за раз и сколько держит в обработке
+CLAIM_BATCH = 100
+# Пауза, когда очередь воркера пуста, секунды
+POLL_INTERVAL = 0.02
+# Пауза перед перезапуском упавшего воркера, секунды
+RESTART_DELAY = 1.0
+
+
+@dataclass
+class ClusterConfig:
+    workers: int
+    queue_path: Path
+    limiter_socket: Path  # Unix socket общего лимитера (держит ingress)
+
+
+def shard_key(update: dict) -> int:
+    """Чат апдейта (как effective_chat), без чата — пользователь. 0 — не нашли."""
+    user_id = 0
+    for name, body in update.items():
+        if name == "update_id" or not isinstance(body, dict):
+            continue
+        chat = body.get("chat") or (body.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+        sender = body.get("from") or body.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            user_id = int(sender["id"])
+    return user_id
+
+
+def shard_of(key: int, workers: int) -> int:
+    # abs() с обеих сторон: в SQLite % от отрицательного отрицателен, в Python — нет
+    return abs(key) % workers
+
+
+def init_queue(conn: sqlite3.Connection, workers: int) -> int:
+    """Схема очереди; то, что осталось с прошлого запуска, раскладываем по текущему числу воркеров."""
+    # executescript сделал бы COMMIT посреди транзакции потока БД
+    for stmt in QUEUE_SCHEMA.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+    return conn.execute("UPDATE update_queue SET shard = abs(shard_key) % ?", (workers,)).rowcount
+
+
+def _claim(conn: sqlite3.Connection, shard: int, after: int, limit: int, done: list[int]) -> list[tuple[int, str]]:
+    """
+    Удалить обработанные done и взять следующие апдейты шарда после id after.
+
+    Строка уходит из очереди только после обработки: упавший воркер после
+    перезапуска (after = 0) заново получит всё, что не успел.
+    """
+    if done:
+        conn.execute(f"DELETE FROM update_queue WHERE id IN ({','.join('?' * len(done))})", done)
+    if limit <= 0:
+        return []
+    rows = conn.execute(
+        "SELECT id, data FROM update_queue WHERE shard = ? AND id > ? ORDER BY id LIMIT ?",
+        (shard, after, limit),
+    ).fetchall()
+    return [(int(r["id"]), str(r["data"])) for r in rows]
+
+
+# ==========================================================
+# ОБЩИЙ ЛИМИТЕР: окна в ingress, воркеры спрашивают через Unix socket
+# ==========================================================
+# Протокол построчный: воркер шлёт "<req_id> <chat_id>\n", ingress отвечает "<req_id>\n",
+# когда место в окнах зарезервировано. Запросы одного соединения ждут независимо.
+async def _serve_limiter_client(
+    limiter: TelegramRateLimiter,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    grants: set[asyncio.Task] = set()
+
+    async def grant(req_id: str, chat_id: int) -> None:
+        await limiter.acquire(chat_id)
+        writer.write(f"{req_id}\n".encode())
+
+    try:
+        while line := await reader.readline():
+            try:
+                req_id, chat_id = line.decode().split()
+                task = asyncio.create_task(grant(req_id, int(chat_id)))
+            except ValueError:
+                logger.warning("⚠️ Лимитер: некорректный запрос %r", line)
+                continue
+            grants.add(task)
+            task.add_done_callback(grants.discard)
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        for task in grants:
+            task.cancel()
+        writer.close()
+
+
+class SharedRateLimiter(TelegramRateLimiter):
+    """
+    Лимитер воркера: те же лимиты Telegram, но одни окна на все процессы.
+
+    acquire(chat_id) резервирует место у ingress через Unix socket. Если ingress
+    недоступен, работает как обычный TelegramRateLimiter с долей лимитов
+    1/workers — так все воркеры вместе всё равно не выходят за лимит.
+    """
+
+    def __init__(self, socket_path: Path, workers: int) -> None:
+        super().__init__(
+            per_second=max(1, GLOBAL_PER_SECOND // workers),
+            group_per_minute=max(1, GROUP_PER_MINUTE // workers),
+        )
+        self.socket_path = socket_path
+        self._ids = itertools.count(1)
+        self._waiting: dict[str, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connecting = asyncio.Lock()
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._connecting:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(str(self.socket_path))
+                self._reader_task = asyncio.create_task(self._read_grants(reader, self._writer), name="limiter-client")
+            return self._writer
+
+    async def _read_grants(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                fut = self._waiting.pop(line.decode().strip(), None)
+                if fut is not None and not fut.done():
+                    fut.set_result(None)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            # ingress ушёл: ожидающие досидят в локальном лимитере
+            for fut in self._waiting.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("лимитер ingress недоступен"))
+            self._waiting.clear()
+
+    async def acquire(self, chat_id: int) -> None:
+        req_id = str(next(self._ids))
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            writer = await self._connect()
+            self._waiting[req_id] = fut
+            writer.write(f"{req_id} {chat_id}\n".encode())
+            await fut
+        except (OSError, ConnectionError) as e:
+            self._waiting.pop(req_id, None)
+            logger.debug("Лимитер ingress недоступен (%s), локальная доля лимита", e)
+            await super().acquire(chat_id)
+
+
+# ==========================================================
+# INGRESS: вебхук → очередь в SQLite, запуск и надзор за воркерами
+# ==========================================================
+class Ingress:
+    """
+    Лёгкий процесс перед воркерами: принимает вебхук, кладёт апдейт в update_queue
+    с номером воркера по chat id и отвечает Telegram после COMMIT. Объектов PTB
+    не строит — только json.loads, чтобы найти чат.
+
+    Все апдейты чата попадают к одному воркеру и забираются им по порядку id,
+    так что порядок внутри чата сохраняется. Здесь же живёт общий лимитер
+    исходящих сообщений и надзор за процессами воркеров (упал — перезапуск).
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        cfg: WebhookConfig,
+        cluster: ClusterConfig,
+        worker_cmd: list[str],
+        extra_routes: dict | None = None,
+    ) -> None:
+        self.bot = bot
+        self.cfg = cfg
+        self.cluster = cluster
+        self.worker_cmd = worker_cmd
+        self.queue = DbThread(cluster.queue_path)
+        self.limiter = TelegramRateLimiter()
+        self.procs: list[Optional[asyncio.subprocess.Process]] = [None] * cluster.workers
+        self._supervisors: list[asyncio.Task] = []
+        self._limiter_server: Optional[asyncio.AbstractServer] = None
+        self._stopping = False
+        routes = {
+            ("POST", cfg.path): self._webhook,
+            ("GET", cfg.health_path): self._health,
+        }
+        if extra_routes:
+            routes.update(extra_routes)
+        self.http = HttpServer(routes)
+
+    async def _webhook(self, req: Request) -> Response:
+        if self.cfg.secret and not hmac.compare_digest(req.headers.get(SECRET_HEADER, ""), self.cfg.secret):
+            logger.warning("⚠️ Вебхук без верного secret token отклонён")
+            return Response(403)
+        try:
+            update = req.json()
+        except ValueError:
+            return Response(400)
+        if not isinstance(update, dict) or "update_id" not in update:
+            return Response(400)
+        key = shard_key(update)
+        row = (key, shard_of(key, self.cluster.workers), req.body.decode())
+        await self.queue.submit(
+            lambda conn: conn.execute("INSERT INTO update_queue (shard_key, shard, data) VALUES (?, ?, ?)", row)
+        )
+        return Response(200)
+
+    async def _health(self, req: Request) -> Response:
+        depth = await self.queue.submit(
+            lambda conn: conn.execute("SELECT COUNT(*) FROM update_queue").fetchone()[0]
+        )
+        alive = sum(1 for p in self.procs if p is not None and p.returncode is None)
+        return Response.json(
+            {
+                "status": "ok" if alive == self.cluster.workers else "degraded",
+                "mode": "cluster",
+                "workers": self.cluster.workers,
+                "workers_alive": alive,
+                "queued_updates": depth,
+            },
+            status=200 if alive else 503,
+        )
+
+    async def _supervise(self, index: int) -> None:
+        env = {**os.environ, "BOT_MODE": "worker", "WORKER_INDEX": str(index)}
+        while not self._stopping:
+            proc = await asyncio.create_subprocess_exec(*self.worker_cmd, env=env)
+            self.procs[index] = proc
+            logger.info("👷 Воркер %s запущен (pid %s)", index, proc.pid)
+            code = await proc.wait()
+            if self._stopping:
+                break
+            logger.error("❌ Воркер %s завершился с кодом %s, перезапуск через %.0f с", index, code, RESTART_DELAY)
+            await asyncio.sleep(RESTART_DELAY)
+
+    async def start(self) -> None:
+        moved = await self.queue.submit(lambda conn: init_queue(conn, self.cluster.workers))
+        if moved:
+            logger.info("📥 В очереди %s апдейтов с прошлого запуска", moved)
+
+        sock = self.cluster.limiter_socket
+        sock.unlink(missing_ok=True)
+        self._limiter_server = await asyncio.start_unix_server(
+            lambda r, w: _serve_limiter_client(self.limiter, r, w), path=str(sock)
+        )
+        self._supervisors = [
+            asyncio.create_task(self._supervise(i), name=f"worker-{i}") for i in range(self.cluster.workers)
+        ]
+
+        await self.bot.initialize()
+        await self.bot.set_webhook(
+            url=self.cfg.url,
+            secret_token=self.cfg.secret or None,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await self.http.start(self.cfg.listen, self.cfg.port)
+        logger.info("🤖 Ingress %s → %s:%s%s, воркеров: %s", self.cfg.url, self.cfg.listen, self.cfg.port, self.cfg.path, self.cluster.workers)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        await self.http.stop()
+        for proc in self.procs:
+            if proc is not None and proc.returncode is None:
+                proc.terminate()
+        await asyncio.gather(*self._supervisors, return_exceptions=True)
+        if self._limiter_server is not None:
+            self._limiter_server.close()
+            self.cluster.limiter_socket.unlink(missing_ok=True)
+        await self.bot.shutdown()
+        await self.queue.stop()
+
+
+def run_ingress(bot: Bot, cfg: WebhookConfig, cluster: ClusterConfig, extra_routes: dict | None = None) -> None:
+    """Ingress + cluster.workers процессов `python bot.py` с BOT_MODE=worker. Стоп по SIGINT/SIGTERM."""
+    ingress = Ingress(bot, cfg, cluster, [sys.executable, os.path.abspath(sys.argv[0])], extra_routes)
+    _run_until_signal(ingress.start, ingress.stop, "ingress")
+
+
+# ==========================================================
+# WORKER: забирает апдейты своего шарда и кормит ими Application
+# ==========================================================
+class UpdateFeeder:
+    """
+    Забирает из update_queue апдейты своего шарда по порядку id и отдаёт их
+    обработчикам PTB (как его _update_fetcher: через app.update_processor).
+    В обработке не больше CLAIM_BATCH: остальное ждёт в SQLite, а не в памяти.
+
+    Строка удаляется из очереди, только когда PTB её обработал. Если воркер
+    упал, после перезапуска он начинает с начала своего шарда: доставка
+    «хотя бы раз», повтор предзаказа отсекает dedup.py.
+    """
+
+    def __init__(self, app: Application, cluster: ClusterConfig, shard: int) -> None:
+        self.app = app
+        self.shard = shard
+        self.queue = DbThread(cluster.queue_path)
+        self._task: Optional[asyncio.Task] = None
+        # id последней взятой строки; в обработке — _inflight, обработанные ждут удаления в _done
+        self._after = 0
+        self._inflight: set[asyncio.Task] = set()
+        self._done: list[int] = []
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name=f"feeder-{self.shard}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # начатое дорабатываем и отмечаем; не успели — останется в очереди до перезапуска
+        if self._inflight:
+            await asyncio.wait(self._inflight, timeout=10)
+        if self._done:
+            await self.queue.submit(lambda conn: _claim(conn, self.shard, self._after, 0, self._done))
+        await self.queue.stop()
+
+    async def _process(self, queue_id: int, update: Update) -> None:
+        # ошибки обработчиков PTB отдаёт error_handler; прерванный остановкой (CancelledError)
+        # не отмечаем — после перезапуска он придёт снова
+        try:
+            await self.app.update_processor.process_update(update, self.app.process_update(update))
+        except Exception as e:
+            logger.exception("❌ Воркер %s: апдейт %s не обработан: %s", self.shard, queue_id, e)
+        self._done.append(queue_id)
+
+    async def _run(self) -> None:
+        concurrent = self.app.update_processor.max_concurrent_updates > 1
+        while True:
+            done, self._done = self._done, []
+            try:
+                batch = await self.queue.submit(
+                    lambda conn: _claim(conn, self.shard, self._after, CLAIM_BATCH - len(self._inflight), done)
+                )
+            except asyncio.CancelledError:
+                self._done[:0] = done
+                raise
+            except Exception as e:
+                logger.exception("❌ Воркер %s: ошибка очереди апдейтов: %s", self.shard, e)
+                self._done[:0] = done
+                batch = []
+            for queue_id, data in batch:
+                self._after = queue_id
+                try:
+                    update = Update.de_json(json.loads(data), self.app.bot)
+                except Exception as e:
+                    logger.warning("⚠️ Некорректный апдейт в очереди: %s", e)
+                    self._done.append(queue_id)
+                    continue
+                if concurrent:
+                    task = asyncio.create_task(self._process(queue_id, update))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
+                else:
+                    await self._process(queue_id, update)
+            if not batch:
+                await asyncio.sleep(POLL_INTERVAL)
+
+
+def run_worker(app: Application, cluster: ClusterConfig, shard: int) -> None:
+    """Как run_webhook, только апдейты берутся из общей очереди; set_webhook делает ingress."""
+    feeder = UpdateFeeder(app, cluster, shard)
+
+    async def start() -> None:
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+        await feeder.start()
+        logger.info("👷 Воркер %s из %s готов", shard, cluster.workers)
+
+    async def stop() -> None:
+        await feeder.stop()
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+    _run_until_signal(start, stop, f"воркера {shard}")
+
+
+def _run_until_signal(
+    start: Callable[[], Awaitable[None]],
+    stop: Callable[[], Awaitable[None]],
+    what: str,
+) -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    def _stop() -> None:
+        raise SystemExit
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, _stop)
+        except NotImplementedError:
+            pass
+
+    try:
+        loop.run_until_complete(start())
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Остановка %s", what)
+    finally:
+        try:
+            loop.run_until_complete(stop())
+        finally:
+            loop.close()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import UPDATE_WAIT_SECONDS
+
+Key = tuple[str, int]
+
+# Сколько апдейтов может ждать своей очереди (задачи уже созданы PTB); больше — PTB ждёт
+MAX_PENDING = 10_000
+
+
+def _keys(update: object) -> list[Key]:
+    if not isinstance(update, Update):
+        return []
+    keys: list[Key] = []
+    if update.effective_chat:
+        keys.append(("chat", update.effective_chat.id))
+    if update.effective_user:
+        keys.append(("user", update.effective_user.id))
+    return keys
+
+
+class _Ticket:
+    __slots__ = ("keys", "ready")
+
+    def __init__(self, keys: list[Key]) -> None:
+        self.keys = keys
+        self.ready = asyncio.Event()
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка апдейтов с порядком внутри чата и пользователя.
+
+    У каждого чата и каждого пользователя своя очередь. Апдейт встаёт во все
+    свои очереди сразу (без await между ними) и выполняется, когда стоит первым
+    во всех: порядок строго по поступлению и одинаковый во всех очередях,
+    поэтому взаимных блокировок нет. Разные чаты идут параллельно, но не больше
+    workers одновременно; ожидание своей очереди слот воркера не занимает.
+    """
+
+    def __init__(self, workers: int, max_pending: int = MAX_PENDING) -> None:
+        # семафор базового класса ограничивает только число задач в полёте
+        super().__init__(max(max_pending, workers))
+        self.workers = workers
+        self._slots = asyncio.Semaphore(workers)
+        # пустые очереди удаляем: память не растёт с числом чатов
+        self._queues: dict[Key, deque[_Ticket]] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _is_first(self, ticket: _Ticket) -> bool:
+        return all(self._queues[k][0] is ticket for k in ticket.keys)
+
+    def _leave(self, ticket: _Ticket) -> None:
+        for k in ticket.keys:
+            q = self._queues[k]
+            was_first = q[0] is ticket
+            q.remove(ticket)
+            if not q:
+                del self._queues[k]
+            elif was_first:
+                q[0].ready.set()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        ticket = _Ticket(_keys(update))
+        for k in ticket.keys:
+            self._queues.setdefault(k, deque()).append(ticket)
+
+        t0 = time.perf_counter()
+        try:
+            while not self._is_first(ticket):
+                ticket.ready.clear()
+                await ticket.ready.wait()
+            async with self._slots:
+                UPDATE_WAIT_SECONDS.observe(time.perf_counter() - t0)
+                await coroutine
+        finally:
+            self._leave(ticket)
+            # отменили, пока ждали очередь: корутину апдейта закрываем, чтобы не висела
+            if inspect.iscoroutine(coroutine) and inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                coroutine.close()
@@ -1,28 +1,199 @@
 from __future__ import annotations
 
+import asyncio
+import datetime as _dt
+import logging
+import queue
 import sqlite3
+import threading
+import time as _time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+from availability import normalize_slot
+from migrations import migrate
 
 DB_PATH = Path(__file__).resolve().parent / "spalnik.db"
 
+# Сколько накопившихся запросов склеиваем в одну транзакцию
+BATCH_LIMIT = 64
+
+logger = logging.getLogger("spalnik_bot.db")
+
+T = TypeVar("T")
+
+
+def set_db_path(path: Path) -> None:
+    """Другой файл БД (из config.env или для тестовых стендов). Вызывать до первого запроса."""
+    global DB_PATH
+    DB_PATH = path
 
-def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+
+def connect(path: Optional[Path] = None) -> sqlite3.Connection:
+    # isolation_level=None: транзакциями управляем сами (BEGIN/COMMIT в потоке БД)
+    conn = sqlite3.connect(path or DB_PATH, timeout=5.0, isolation_level=None, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
 
-def init_db(schema_path: str) -> None:
-    schema_file = Path(schema_path)
-    sql = schema_file.read_text(encoding="utf-8")
+def init_db() -> None:
+    """Довести схему БД до последней версии (migrations.py); если она уже последняя — один PRAGMA."""
+    conn = connect()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+# ==========================================================
+# ПОТОК БД: одно долгоживущее соединение, запросы из event loop
+# ==========================================================
+_Job = tuple[Callable[[sqlite3.Connection], Any], asyncio.AbstractEventLoop, "asyncio.Future[Any]"]
+
+
+def _resolve(fut: "asyncio.Future[Any]", result: Any, error: Optional[BaseException]) -> None:
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+
+class DbThread:
+    """
+    Все обращения к SQLite идут через один поток с одним соединением.
+
+    Корутины кладут в очередь функцию fn(conn) и ждут future, event loop не блокируется.
+    Всё, что успело накопиться в очереди, выполняется одной транзакцией
+    (каждая функция — в своём SAVEPOINT, чтобы ошибка одной не откатывала соседей).
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        # None — основная БД (DB_PATH на момент старта потока)
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[_Job]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], T]) -> "asyncio.Future[T]":
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[T]" = loop.create_future()
+        # под замком: поток, не сумевший открыть БД, не разминётся с этим заданием (см. _fail_pending)
+        with self._lock:
+            self._ensure_started()
+            self._queue.put((fn, loop, fut))
+        return fut
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="spalnik-db", daemon=True)
+            self._thread.start()
+
+    async def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        await asyncio.to_thread(thread.join)
+
+    def _run(self) -> None:
+        try:
+            conn = connect(self.path)
+        except Exception as e:
+            logger.exception("❌ Не удалось открыть БД: %s", e)
+            self._fail_pending(e)
+            return
+        try:
+            running = True
+            while running:
+                job = self._queue.get()
+                if job is None:
+                    break
+                batch = [job]
+                while len(batch) < BATCH_LIMIT:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        running = False
+                        break
+                    batch.append(nxt)
+                self._run_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _fail_pending(self, error: BaseException) -> None:
+        """Соединения нет: всё, что уже в очереди, завершается этой ошибкой; следующий submit начнёт заново."""
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    self._reply(job, None, error)
 
-    with _connect() as conn:
-        conn.executescript(sql)
-        conn.commit()
+    @staticmethod
+    def _reply(job: _Job, result: Any, error: Optional[BaseException]) -> None:
+        _, loop, fut = job
+        try:
+            loop.call_soon_threadsafe(_resolve, fut, result, error)
+        except RuntimeError:
+            # event loop уже закрыт — отдавать результат некому
+            pass
 
+    @classmethod
+    def _run_batch(cls, conn: sqlite3.Connection, batch: list[_Job]) -> None:
+        results: list[tuple[Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, _, _ in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    res = fn(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((None, e))
+                else:
+                    conn.execute("RELEASE job")
+                    results.append((res, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.exception("❌ Ошибка транзакции БД: %s", e)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(None, e)] * len(batch)
 
-def create_booking(
+        for job, (res, err) in zip(batch, results):
+            cls._reply(job, res, err)
+
+
+_db = DbThread()
+
+
+async def run(fn: Callable[[sqlite3.Connection], T]) -> T:
+    """Выполнить fn(conn) в потоке БД (внутри транзакции) и вернуть результат."""
+    return await _db.submit(fn)
+
+
+async def close_db() -> None:
+    await _db.stop()
+
+
+# ==========================================================
+# BOOKINGS
+# ==========================================================
+async def create_booking(
     tg_user_id: Optional[int],
     tg_username: Optional[str],
     date: str,
@@ -31,16 +202,444 @@ def create_booking(
     name: str,
     phone: str,
     comment: str = "",
+    notify_chat_ids: Iterable[int] = (),
+    notify_text: Optional[Callable[[int], str]] = None,
+    slot_at: Optional[str] = None,
 ) -> int:
-    with _connect() as conn:
+    """
+    Сохранить бронь. Если передан notify_text(booking_id) — в той же транзакции
+    кладём уведомление персоналу в outbox, чтобы бронь и сообщение не разошлись.
+    slot_at не передали — разбираем date/time сами.
+    """
+    if slot_at is None:
+        slot_at = normalize_slot(date, time, _dt.date.today())
+
+    def _insert(conn: sqlite3.Connection) -> int:
         cur = conn.execute(
             """
-            INSERT INTO bookings (tg_user_id, tg_username, date, time, guests, name, phone, comment)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO bookings (tg_user_id, tg_username, date, time, guests, name, phone, comment, slot_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (tg_user_id, tg_username, date, time, guests, name, phone, comment),
+            (tg_user_id, tg_username, date, time, guests, name, phone, comment, slot_at),
+        )
+        booking_id = int(cur.lastrowid)
+        if notify_text is not None:
+            _enqueue(conn, notify_chat_ids, notify_text(booking_id))
+        return booking_id
+
+    return await run(_insert)
+
+
+async def bookings_since(slot_from: str) -> list[tuple[str, int]]:
+    """(slot_at, guests) неотменённых броней начиная с slot_from — для загрузки зала при старте."""
+
+    def _select(conn: sqlite3.Connection) -> list[tuple[str, int]]:
+        rows = conn.execute(
+            "SELECT slot_at, guests FROM bookings WHERE slot_at >= ? AND canceled = 0 ORDER BY slot_at",
+            (slot_from,),
+        ).fetchall()
+        return [(str(r["slot_at"]), int(r["guests"])) for r in rows]
+
+    return await run(_select)
+
+
+# ==========================================================
+# PREORDERS
+# ==========================================================
+# (item_id, name, qty, sum)
+PreorderItemRow = tuple[Optional[str], str, int, Optional[float]]
+
+
+async def create_preorder(
+    tg_user_id: Optional[int],
+    tg_username: Optional[str],
+    phone: str,
+    desired_time: str,
+    comment: str,
+    total: float,
+    items: list[PreorderItemRow],
+    source_chat_id: Optional[int] = None,
+    notify_chat_ids: Iterable[int] = (),
+    notify_text: Optional[Callable[[int], str]] = None,
+    dedup_keys: Iterable[tuple[bytes, float]] = (),
+) -> Optional[int]:
+    """
+    Предзаказ + позиции одним executemany + уведомление в outbox — всё одной транзакцией.
+
+    dedup_keys — ключи апдейта (dedup.py): если любой уже записан и не истёк,
+    это повтор — ничего не пишем и возвращаем None. Иначе ключи сохраняются
+    в той же транзакции, что и предзаказ: второй раз «НОВЫЙ ПРЕДЗАКАЗ» не уйдёт
+    ни после рестарта, ни при падении посередине.
+    """
+    keys = list(dedup_keys)
+
+    def _insert(conn: sqlite3.Connection) -> Optional[int]:
+        if keys and not _claim_keys(conn, keys):
+            return None
+        cur = conn.execute(
+            """
+            INSERT INTO preorders (tg_user_id, tg_username, phone, desired_time, comment, total, source_chat_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (tg_user_id, tg_username, phone, desired_time, comment, total, source_chat_id),
+        )
+        preorder_id = int(cur.lastrowid)
+        conn.executemany(
+            "INSERT INTO preorder_items (preorder_id, item_id, name, qty, sum) VALUES (?, ?, ?, ?, ?)",
+            [(preorder_id, *it) for it in items],
+        )
+        if notify_text is not None:
+            _enqueue(conn, notify_chat_ids, notify_text(preorder_id))
+        return preorder_id
+
+    return await run(_insert)
+
+
+# за одну запись чистим не больше стольких истёкших ключей: без отдельной задачи и без долгих DELETE
+_PURGE_KEYS = 50
+
+
+def _claim_keys(conn: sqlite3.Connection, keys: list[tuple[bytes, float]]) -> bool:
+    """False — хотя бы один ключ уже есть и не истёк (повтор)."""
+    now = _time.time()
+    marks = ",".join("?" * len(keys))
+    if conn.execute(
+        f"SELECT 1 FROM processed_updates WHERE key IN ({marks}) AND expires_at > ? LIMIT 1",
+        (*(k for k, _ in keys), now),
+    ).fetchone():
+        return False
+    conn.execute(
+        "DELETE FROM processed_updates WHERE key IN"
+        " (SELECT key FROM processed_updates WHERE expires_at <= ? ORDER BY expires_at LIMIT ?)",
+        (now, _PURGE_KEYS),
+    )
+    conn.executemany("INSERT OR REPLACE INTO processed_updates (key, expires_at) VALUES (?, ?)", keys)
+    return True
+
+
+async def recent_dedup_keys(limit: int) -> list[tuple[bytes, float]]:
+    """Самые свежие неистёкшие ключи — прогреть LRU после рестарта."""
+
+    def _query(conn: sqlite3.Connection) -> list[tuple[bytes, float]]:
+        rows = conn.execute(
+            "SELECT key, expires_at FROM processed_updates WHERE expires_at > ? ORDER BY expires_at DESC LIMIT ?",
+            (_time.time(), limit),
+        ).fetchall()
+        return [(bytes(r[0]), float(r[1])) for r in reversed(rows)]
+
+    return await run(_query)
+
+
+# created_at хранится в UTC; «сегодня» считаем по местному времени сервера
+_TODAY_START_UTC = "datetime('now', 'localtime', 'start of day', 'utc')"
+
+
+async def todays_open_preorders() -> list[sqlite3.Row]:
+    """Открытые предзаказы за сегодня (range scan по idx_preorders_created_at)."""
+
+    def _query(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+        return conn.execute(
+            f"""
+            SELECT id, created_at, tg_user_id, tg_username, phone, desired_time, comment, total
+            FROM preorders
+            WHERE created_at >= {_TODAY_START_UTC} AND status = 'open'
+            ORDER BY created_at
+            """
+        ).fetchall()
+
+    return await run(_query)
+
+
+async def top_items(days: int = 7, limit: int = 10) -> list[sqlite3.Row]:
+    """Самые заказываемые позиции за последние days дней."""
+
+    def _query(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+        return conn.execute(
+            """
+            SELECT i.name AS name, SUM(i.qty) AS qty, COUNT(DISTINCT p.id) AS orders
+            FROM preorders p
+            JOIN preorder_items i ON i.preorder_id = p.id
+            WHERE p.created_at >= datetime('now', ?)
+            GROUP BY i.name
+            ORDER BY qty DESC
+            LIMIT ?
+            """,
+            (f"-{int(days)} days", limit),
+        ).fetchall()
+
+    return await run(_query)
+
+
+# ==========================================================
+# MEDIA CACHE
+# ==========================================================
+async def get_media_file_id(path: str, sha256: str) -> Optional[str]:
+    def _get(conn: sqlite3.Connection) -> Optional[str]:
+        row = conn.execute(
+            "SELECT file_id FROM media_cache WHERE path = ? AND sha256 = ?",
+            (path, sha256),
+        ).fetchone()
+        return str(row["file_id"]) if row else None
+
+    return await run(_get)
+
+
+async def save_media_file_id(path: str, sha256: str, file_id: str) -> None:
+    def _save(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            INSERT INTO media_cache (path, sha256, file_id) VALUES (?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+              sha256 = excluded.sha256,
+              file_id = excluded.file_id,
+              updated_at = datetime('now')
+            """,
+            (path, sha256, file_id),
+        )
+
+    await run(_save)
+
+
+async def drop_media_file_id(path: str) -> None:
+    def _drop(conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM media_cache WHERE path = ?", (path,))
+
+    await run(_drop)
+
+
+# ==========================================================
+# СОСТОЯНИЕ ЧАТОВ И ПОЛЬЗОВАТЕЛЕЙ (persistence.py)
+# ==========================================================
+async def load_bot_state(kind: str, key: int) -> Optional[str]:
+    def _load(conn: sqlite3.Connection) -> Optional[str]:
+        row = conn.execute("SELECT data FROM bot_state WHERE kind = ? AND id = ?", (kind, key)).fetchone()
+        return str(row["data"]) if row else None
+
+    return await run(_load)
+
+
+async def save_bot_state(rows: list[tuple[str, int, Optional[str]]]) -> None:
+    """(kind, id, json) — записать; (kind, id, None) — удалить. Всё одной транзакцией."""
+    upserts = [(kind, key, data) for kind, key, data in rows if data is not None]
+    deletes = [(kind, key) for kind, key, data in rows if data is None]
+
+    def _save(conn: sqlite3.Connection) -> None:
+        conn.executemany(
+            """
+            INSERT INTO bot_state (kind, id, data) VALUES (?, ?, ?)
+            ON CONFLICT(kind, id) DO UPDATE SET
+              data = excluded.data,
+              updated_at = datetime('now')
+            """,
+            upserts,
+        )
+        conn.executemany("DELETE FROM bot_state WHERE kind = ? AND id = ?", deletes)
+
+    await run(_save)
+
+
+# ==========================================================
+# OUTBOX
+# ==========================================================
+def _enqueue(conn: sqlite3.Connection, chat_ids: Iterable[int], text: str) -> None:
+    conn.executemany(
+        "INSERT INTO outbox (chat_id, text) VALUES (?, ?)",
+        [(cid, text) for cid in chat_ids],
+    )
+
+
+async def enqueue_notifications(chat_ids: Iterable[int], text: str) -> None:
+    ids = list(chat_ids)
+    await run(lambda conn: _enqueue(conn, ids, text))
+
+
+# Взятое в работу и не отмеченное за это время считаем брошенным (процесс упал)
+OUTBOX_CLAIM_TIMEOUT = 300.0
+
+
+async def claim_outbox(limit: int) -> list[sqlite3.Row]:
+    """
+    Забрать пачку сообщений, которым пора уйти, и пометить их как 'sending'.
+
+    Выборка и пометка — в одной транзакции (BEGIN IMMEDIATE), поэтому несколько
+    процессов с одной БД одно сообщение не возьмут. Зависшие в 'sending' дольше
+    OUTBOX_CLAIM_TIMEOUT забираются заново.
+    """
+
+    def _claim(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+        now = _time.time()
+        rows = conn.execute(
+            """
+            SELECT id, chat_id, text, attempts FROM outbox
+            WHERE (status = 'pending' AND next_attempt_at <= ?)
+               OR (status = 'sending' AND IFNULL(claimed_at, 0) < ?)
+            ORDER BY next_attempt_at, id
+            LIMIT ?
+            """,
+            (now, now - OUTBOX_CLAIM_TIMEOUT, limit),
+        ).fetchall()
+        if rows:
+            conn.executemany(
+                "UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                [(now, r["id"]) for r in rows],
+            )
+        return rows
+
+    return await run(_claim)
+
+
+async def release_stale_outbox() -> int:
+    """
+    После рестарта: то, что было 'sending' в момент падения, снова в очередь.
+
+    Только когда outbox разбирает один процесс: в кластере это были бы чужие
+    сообщения в полёте, там брошенные подбирает claim_outbox по таймауту.
+    """
+
+    def _release(conn: sqlite3.Connection) -> int:
+        return conn.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'").rowcount
+
+    return await run(_release)
+
+
+async def finish_outbox(
+    sent: list[int],
+    retry: list[tuple[int, str, float]],
+    dead: list[tuple[int, str]],
+) -> None:
+    """sent — id доставленных; retry — (id, ошибка, когда повторить); dead — (id, ошибка)."""
+
+    def _finish(conn: sqlite3.Connection) -> None:
+        conn.executemany(
+            "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = datetime('now') WHERE id = ?",
+            [(i,) for i in sent],
+        )
+        conn.executemany(
+            """
+            UPDATE outbox SET status = 'pending', attempts = attempts + 1, last_error = ?, next_attempt_at = ?
+            WHERE id = ?
+            """,
+            [(err, at, i) for i, err, at in retry],
+        )
+        conn.executemany(
+            "UPDATE outbox SET status = 'dead', attempts = attempts + 1, last_error = ? WHERE id = ?",
+            [(err, i) for i, err in dead],
+        )
+
+    await run(_finish)
+
+
+# ==========================================================
+# BROADCASTS
+# ==========================================================
+async def create_broadcast(created_by: Optional[int], text: str, attachment: Optional[str] = None) -> int:
+    def _insert(conn: sqlite3.Connection) -> int:
+        cur = conn.execute(
+            "INSERT INTO broadcasts (created_by, text, attachment) VALUES (?, ?, ?)",
+            (created_by, text, attachment),
         )
-        conn.commit()
         return int(cur.lastrowid)
 
+    return await run(_insert)
+
+
+async def running_broadcast() -> Optional[sqlite3.Row]:
+    """Незаконченная рассылка (после рестарта продолжаем её с cursor)."""
+
+    def _get(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
+        return conn.execute("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id LIMIT 1").fetchone()
+
+    return await run(_get)
+
+
+async def last_broadcast() -> Optional[sqlite3.Row]:
+    def _get(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
+        return conn.execute("SELECT * FROM broadcasts ORDER BY id DESC LIMIT 1").fetchone()
+
+    return await run(_get)
+
+
+# Гости, которым можно писать: все, кто бронировал или делал предзаказ
+_RECIPIENT_SOURCES = ("bookings", "preorders")
+
+
+async def broadcast_recipients(after: int, limit: int) -> tuple[list[int], Optional[int]]:
+    """
+    Следующая страница получателей с tg_user_id > after, по возрастанию, без заблокировавших.
+    Возвращает (ids, last): last — до какого id страница просмотрена (новый курсор),
+    None — получатели кончились.
+
+    Каждый источник читается keyset-страницей по своему индексу; всё, что меньше
+    конца самой короткой полной страницы, собрано полностью из обоих.
+    """
+
+    def _page(conn: sqlite3.Connection) -> tuple[list[int], Optional[int]]:
+        ids: set[int] = set()
+        bound: Optional[int] = None
+        for table in _RECIPIENT_SOURCES:
+            rows = [
+                int(r[0])
+                for r in conn.execute(
+                    f"SELECT DISTINCT tg_user_id FROM {table} WHERE tg_user_id > ? ORDER BY tg_user_id LIMIT ?",
+                    (after, limit),
+                )
+            ]
+            ids.update(rows)
+            if len(rows) == limit:
+                bound = rows[-1] if bound is None else min(bound, rows[-1])
+        page = sorted(i for i in ids if bound is None or i <= bound)[:limit]
+        if not page:
+            return [], None
+        blocked = {
+            int(r[0])
+            for r in conn.execute(
+                "SELECT tg_user_id FROM blocked_users WHERE tg_user_id BETWEEN ? AND ?",
+                (page[0], page[-1]),
+            )
+        }
+        return [i for i in page if i not in blocked], page[-1]
+
+    return await run(_page)
+
+
+async def advance_broadcast(broadcast_id: int, cursor: int) -> bool:
+    """Сдвинуть курсор до отправки пачки. False — рассылку отменили."""
+
+    def _advance(conn: sqlite3.Connection) -> bool:
+        return conn.execute(
+            "UPDATE broadcasts SET cursor = ? WHERE id = ? AND status = 'running'",
+            (cursor, broadcast_id),
+        ).rowcount > 0
+
+    return await run(_advance)
+
+
+async def record_broadcast(broadcast_id: int, sent: int, failed: int, blocked: list[tuple[int, str]]) -> None:
+    """Итоги пачки + гости, заблокировавшие бота (tg_user_id, ошибка) — одной транзакцией."""
+
+    def _record(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "UPDATE broadcasts SET sent = sent + ?, failed = failed + ?, blocked = blocked + ? WHERE id = ?",
+            (sent, failed, len(blocked), broadcast_id),
+        )
+        conn.executemany(
+            "INSERT INTO blocked_users (tg_user_id, reason) VALUES (?, ?) ON CONFLICT(tg_user_id) DO NOTHING",
+            blocked,
+        )
+
+    await run(_record)
+
+
+async def finish_broadcast(broadcast_id: int, status: str) -> Optional[sqlite3.Row]:
+    """status: 'done' | 'canceled'. Возвращает строку рассылки (для отчёта) или None, если уже закрыта."""
+
+    def _finish(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
+        changed = conn.execute(
+            "UPDATE broadcasts SET status = ?, finished_at = datetime('now') WHERE id = ? AND status = 'running'",
+            (status, broadcast_id),
+        ).rowcount
+        if not changed:
+            return None
+        return conn.execute("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,)).fetchone()
 
+    return await run(_finish)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+# Сколько ключей держим в памяти; дальше вытесняются самые давние (их помнит БД)
+MAX_KEYS = 20_000
+# Telegram хранит недоставленные апдейты до суток: столько помним update_id
+UPDATE_TTL = 24 * 3600.0
+# Тот же заказ от того же гостя (двойное нажатие, повторная отправка из мини-аппа)
+PAYLOAD_TTL = 600.0
+
+
+def update_key(update_id: int) -> bytes:
+    return hashlib.blake2b(b"u:%d" % update_id, digest_size=16).digest()
+
+
+def payload_key(user_id: int, payload: str) -> bytes:
+    return hashlib.blake2b(b"p:%d:" % user_id + payload.encode("utf-8"), digest_size=16).digest()
+
+
+def dedup_keys(update_id: Optional[int], user_id: Optional[int], payload: str, now: Optional[float] = None) -> list[tuple[bytes, float]]:
+    """Ключи апдейта с моментом, когда их можно забыть (time.time())."""
+    if now is None:
+        now = time.time()
+    keys = []
+    if update_id is not None:
+        keys.append((update_key(update_id), now + UPDATE_TTL))
+    if user_id is not None:
+        keys.append((payload_key(user_id, payload), now + PAYLOAD_TTL))
+    return keys
+
+
+class SeenKeys:
+    """
+    Ограниченный LRU недавно обработанных ключей: проверка повтора — O(1), без БД.
+
+    Это только кэш: истина — таблица processed_updates (переживает рестарт),
+    запись в неё идёт в одной транзакции с предзаказом. Промах здесь значит
+    «спроси БД», а не «новый».
+    """
+
+    def __init__(self, max_keys: int = MAX_KEYS) -> None:
+        self.max_keys = max_keys
+        self._expires: OrderedDict[bytes, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def seen(self, keys: Iterable[tuple[bytes, float]], now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        expires = self._expires
+        for key, _ in keys:
+            t = expires.get(key)
+            if t is None:
+                continue
+            if t <= now:
+                del expires[key]
+                continue
+            expires.move_to_end(key)
+            return True
+        return False
+
+    def remember(self, keys: Iterable[tuple[bytes, float]]) -> None:
+        expires = self._expires
+        for key, t in keys:
+            expires[key] = t
+            expires.move_to_end(key)
+        while len(expires) > self.max_keys:
+            expires.popitem(last=False)
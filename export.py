@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import datetime as _dt
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+from db import connect
+
+logger = logging.getLogger("spalnik_bot.export")
+
+# Сколько строк за раз тянуть из курсора: память не зависит от размера выгрузки
+FETCH_SIZE = 500
+
+FORMATS = ("csv", "json")
+KINDS = ("bookings", "preorders")
+
+# created_at хранится в UTC; границы и время в файле — по местному времени сервера.
+# Сортировка по колонке таблицы (не по выражению): идём по индексу created_at без сортировки в памяти
+_BOOKINGS_SQL = """
+    SELECT id, datetime(created_at, 'localtime') AS created_at, tg_user_id, tg_username,
+           date, time, slot_at, guests, name, phone, comment, canceled
+    FROM bookings b
+    WHERE b.created_at >= datetime(?, 'utc') AND b.created_at < datetime(?, '+1 day', 'utc')
+    ORDER BY b.created_at, b.id
+"""
+
+_PREORDERS_SQL = """
+    SELECT id, datetime(created_at, 'localtime') AS created_at, tg_user_id, tg_username,
+           phone, desired_time, comment, total, status
+    FROM preorders p
+    WHERE p.created_at >= datetime(?, 'utc') AND p.created_at < datetime(?, '+1 day', 'utc')
+    ORDER BY p.created_at, p.id
+"""
+
+# позиции — в том же порядке, что и предзаказы: склеиваем двумя курсорами без словаря в памяти
+_ITEMS_SQL = """
+    SELECT i.preorder_id, i.item_id, i.name, i.qty, i.sum
+    FROM preorders p
+    JOIN preorder_items i ON i.preorder_id = p.id
+    WHERE p.created_at >= datetime(?, 'utc') AND p.created_at < datetime(?, '+1 day', 'utc')
+    ORDER BY p.created_at, p.id, i.id
+"""
+
+
+# колонки CSV (и ключи JSON) в порядке SELECT
+COLUMNS = {
+    "bookings": (
+        "id", "created_at", "tg_user_id", "tg_username", "date", "time", "slot_at",
+        "guests", "name", "phone", "comment", "canceled",
+    ),
+    "preorders": (
+        "id", "created_at", "tg_user_id", "tg_username", "phone", "desired_time",
+        "comment", "total", "status", "items",
+    ),
+}
+
+
+def _rows(cur: sqlite3.Cursor) -> Iterator[sqlite3.Row]:
+    while True:
+        chunk = cur.fetchmany(FETCH_SIZE)
+        if not chunk:
+            return
+        yield from chunk
+
+
+def _bookings(conn: sqlite3.Connection, start: str, end: str) -> Iterator[dict]:
+    for row in _rows(conn.execute(_BOOKINGS_SQL, (start, end))):
+        yield dict(row)
+
+
+def _preorders(conn: sqlite3.Connection, start: str, end: str) -> Iterator[dict]:
+    items = _rows(conn.execute(_ITEMS_SQL, (start, end)))
+    pending: Optional[sqlite3.Row] = next(items, None)
+    for row in _rows(conn.execute(_PREORDERS_SQL, (start, end))):
+        record = dict(row)
+        record["items"] = []
+        while pending is not None and pending["preorder_id"] == row["id"]:
+            record["items"].append({"id": pending["item_id"], "name": pending["name"], "qty": pending["qty"], "sum": pending["sum"]})
+            pending = next(items, None)
+        yield record
+
+
+def _items_text(items: list[dict]) -> str:
+    return "; ".join(f"{i['name']} ×{i['qty']}" for i in items)
+
+
+def write_export(kind: str, fmt: str, start: _dt.date, end: _dt.date, out: Path, db_path: Optional[Path] = None) -> int:
+    """
+    Выгрузка в gzip-файл out построчно; возвращает число записей.
+
+    Отдельное соединение и одна читающая транзакция: в WAL это снимок на момент
+    начала, и поток БД бота (записи) им не блокируется.
+    """
+    rows = _bookings if kind == "bookings" else _preorders
+    conn = connect(db_path)
+    count = 0
+    try:
+        conn.execute("BEGIN")
+        # utf-8-sig: Excel иначе не узнаёт кириллицу в CSV
+        encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+        with gzip.open(out, "wt", encoding=encoding, newline="", compresslevel=6) as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS[kind])
+            if fmt == "csv":
+                writer.writeheader()
+            for record in rows(conn, start.isoformat(), end.isoformat()):
+                if fmt == "csv":
+                    if "items" in record:
+                        record["items"] = _items_text(record["items"])
+                    writer.writerow(record)
+                else:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                    f.write("\n")
+                count += 1
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return count
+
+
+async def export_file(kind: str, fmt: str, start: _dt.date, end: _dt.date) -> tuple[Path, int]:
+    """
+    Выгрузка во временный файл в отдельном потоке (event loop не ждёт).
+    Файл удаляет вызывающий после отправки.
+    """
+    suffix = ".csv.gz" if fmt == "csv" else ".ndjson.gz"
+    fd, name = tempfile.mkstemp(prefix=f"spalnik-{kind}-", suffix=suffix)
+    os.close(fd)
+    path = Path(name)
+    try:
+        count = await asyncio.to_thread(write_export, kind, fmt, start, end, path)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    logger.info("📤 Выгрузка %s %s..%s: %s записей, %s байт", kind, start, end, count, path.stat().st_size)
+    return path, count
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger("spalnik_bot.http")
+
+# Больше апдейт от Telegram не бывает; всё крупнее — мусор или атака
+MAX_BODY = 1024 * 1024
+# Строка запроса или заголовка; длиннее — 400 (это же limit буфера StreamReader)
+MAX_LINE = 8 * 1024
+# Заголовков в запросе и их общий размер: проверяются до секрета вебхука
+MAX_HEADERS = 100
+MAX_HEADER_BYTES = 32 * 1024
+# Сколько ждать каждую часть запроса (строку, тело); молчащий клиент не держит задачу вечно
+READ_TIMEOUT = 10.0
+# Сколько держать keep-alive соединение без нового запроса
+IDLE_TIMEOUT = 75.0
+
+REASONS = {
+    200: "OK",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: str
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        return cls(status, json.dumps(data, ensure_ascii=False).encode(), "application/json")
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HttpServer:
+    """
+    Минимальный HTTP/1.1 сервер на asyncio (без aiohttp/tornado).
+
+    Хватает для вебхука Telegram, health-check и служебных эндпоинтов:
+    маршруты (METHOD, path) -> корутина, keep-alive, Content-Length
+    (Transfer-Encoding — 501 и закрыть соединение: Telegram шлёт тело с Content-Length).
+    Слушает и интернет (вебхук), поэтому у каждого чтения есть таймаут,
+    а у строк, числа и размера заголовков — предел.
+    """
+
+    def __init__(self, routes: dict[tuple[str, str], Handler], fallback: Optional[Handler] = None) -> None:
+        self.routes = routes
+        self.fallback = fallback
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: set[asyncio.Task] = set()
+
+    async def start(self, host: str, port: int) -> None:
+        self._server = await asyncio.start_server(self._client, host, port, limit=MAX_LINE)
+        logger.info("🌐 HTTP сервер слушает %s:%s", host, port)
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        # висящие keep-alive / long-poll соединения закрываем сами
+        for task in list(self._clients):
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+
+    async def _dispatch(self, req: Request) -> Response:
+        handler = self.routes.get((req.method, req.path))
+        if handler is None:
+            if any(path == req.path for _, path in self.routes):
+                return Response(405)
+            if self.fallback is None:
+                return Response(404)
+            handler = self.fallback
+        try:
+            return await handler(req)
+        except Exception as e:
+            logger.exception("❌ Ошибка HTTP обработчика %s %s: %s", req.method, req.path, e)
+            return Response(500)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                req = await self._read_request(reader)
+                if req is None:
+                    break
+                if isinstance(req, Response):
+                    await self._write(writer, req, keep_alive=False)
+                    break
+                resp = await self._dispatch(req)
+                keep_alive = req.headers.get("connection", "").lower() != "close"
+                await self._write(writer, resp, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        """Request; Response — ответить ошибкой и закрыть; None — клиент ушёл или молчит."""
+        try:
+            line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            # строка длиннее MAX_LINE (StreamReader превращает LimitOverrunError в ValueError)
+            return Response(400)
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return Response(400)
+
+        headers: dict[str, str] = {}
+        count = size = 0
+        try:
+            while True:
+                h = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                count += 1
+                size += len(h)
+                if count > MAX_HEADERS or size > MAX_HEADER_BYTES:
+                    return Response(400)
+                k, _, v = h.decode("latin-1").partition(":")
+                k, v = k.strip().lower(), v.strip()
+                # два разных Content-Length: прокси и мы можем по-разному найти конец тела
+                if k == "content-length" and headers.get(k, v) != v:
+                    return Response(400)
+                headers[k] = v
+
+            # chunked не разбираем: тело прочиталось бы как следующий запрос keep-alive
+            if "transfer-encoding" in headers:
+                return Response(501)
+            try:
+                length = int(headers.get("content-length", "0"))
+            except ValueError:
+                return Response(400)
+            if length < 0:
+                return Response(400)
+            if length > MAX_BODY:
+                return Response(413)
+            body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b""
+        except asyncio.TimeoutError:
+            return Response(408)
+        except ValueError:
+            return Response(400)
+
+        path, _, query = target.partition("?")
+        return Request(method.upper(), path, query, headers, body)
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, resp: Response, keep_alive: bool) -> None:
+        head = [
+            f"HTTP/1.1 {resp.status} {REASONS.get(resp.status, 'Unknown')}",
+            f"Content-Type: {resp.content_type}",
+            f"Content-Length: {len(resp.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head += [f"{k}: {v}" for k, v in resp.headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + resp.body)
+        await writer.drain()
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as _dt
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import Counter as _Counter
+from pathlib import Path
+from typing import Callable, Optional
+
+from db import run
+from metrics import ARCHIVED
+
+logger = logging.getLogger("spalnik_bot.maintenance")
+
+# Шаг архивации: не больше BATCH_ROWS строк и не дольше ARCHIVE_STEP_SECONDS в потоке БД
+BATCH_ROWS = 200
+ARCHIVE_STEP_SECONDS = 0.002
+# Сколько один шаг incremental vacuum держит поток БД (страницы переносятся по одной)
+VACUUM_STEP_SECONDS = 0.003
+# Строк на индекс для ANALYZE: статистики хватает планировщику, шаг не зависит от размера таблицы
+ANALYSIS_LIMIT = 400
+# Пауза между шагами: запросы гостей не стоят в очереди за обслуживанием
+STEP_PAUSE = 0.02
+# Сколько работает один запуск задачи из JobQueue; не успели — продолжим со следующего
+TICK_SECONDS = 5.0
+
+# Что можно убрать в архив, кроме возраста (created_at старше срока хранения)
+_ARCHIVABLE: dict[str, Callable[[sqlite3.Row, str], bool]] = {
+    # бронь на будущую дату остаётся, даже если создана давно
+    "bookings": lambda row, cutoff: (row["slot_at"] or "")[:10] < cutoff[:10],
+    "preorders": lambda row, cutoff: True,
+    # pending/sending ещё доставит outbox-воркер
+    "outbox": lambda row, cutoff: row["status"] in ("sent", "dead"),
+    "broadcasts": lambda row, cutoff: row["status"] != "running",
+}
+
+
+def parse_hours(spec: str) -> tuple[int, int]:
+    """'3-6' → (3, 6): с 03:00 до 06:00 по местному времени; '23-5' — через полночь."""
+    start, _, end = spec.partition("-")
+    return int(start) % 24, int(end or start) % 24
+
+
+def _take(table: str, after: int, cutoff: str) -> Callable[[sqlite3.Connection], tuple[list[dict], int, bool]]:
+    """
+    Следующие строки по id после курсора: (что в архив, новый курсор, есть ли ещё).
+
+    id растёт вместе с created_at, поэтому первая строка моложе cutoff — конец таблицы
+    для этой ночи. Идём по первичному ключу: шаг не зависит от размера таблицы.
+    """
+    archivable = _ARCHIVABLE[table]
+
+    def _select(conn: sqlite3.Connection) -> tuple[list[dict], int, bool]:
+        deadline = time.perf_counter() + ARCHIVE_STEP_SECONDS
+        records, last, seen = [], after, 0
+        more = True
+        for row in conn.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (after, BATCH_ROWS)):
+            if row["created_at"] >= cutoff:
+                more = False
+                break
+            last = row["id"]
+            seen += 1
+            if archivable(row, cutoff):
+                records.append(dict(row))
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            more = seen == BATCH_ROWS
+        if table == "preorders" and records:
+            by_id = {r["id"]: r for r in records}
+            for r in records:
+                r["items"] = []
+            marks = ",".join("?" * len(by_id))
+            for it in conn.execute(
+                f"SELECT preorder_id, item_id, name, qty, sum FROM preorder_items WHERE preorder_id IN ({marks}) ORDER BY preorder_id, id",
+                tuple(by_id),
+            ):
+                by_id[it["preorder_id"]]["items"].append({"id": it["item_id"], "name": it["name"], "qty": it["qty"], "sum": it["sum"]})
+        return records, last, more
+
+    return _select
+
+
+def _delete(table: str, ids: list[int]) -> Callable[[sqlite3.Connection], None]:
+    def _run(conn: sqlite3.Connection) -> None:
+        # позиции предзаказов уходят каскадом (ON DELETE CASCADE)
+        conn.execute(f"DELETE FROM {table} WHERE id IN ({','.join('?' * len(ids))})", ids)
+
+    return _run
+
+
+def _append(path: Path, records: list[dict]) -> None:
+    """
+    Дописать записи в архив (новым gzip-членом: файл читается как один поток).
+    fsync до удаления строк из БД: сбой между ними даёт повтор записи в архиве
+    (тот же id), но не потерю.
+    """
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+            for r in records:
+                gz.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                gz.write(b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _vacuum_step(conn: sqlite3.Connection) -> int:
+    """Вернуть в ОС страницы из freelist, пока не вышло VACUUM_STEP_SECONDS; возвращает остаток."""
+    # auto_vacuum = INCREMENTAL включает миграция 4; без него freelist не уменьшится
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    deadline = time.perf_counter() + VACUUM_STEP_SECONDS
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free and time.perf_counter() < deadline:
+        # sqlite3 делает один шаг выражения, а incremental_vacuum освобождает страницу за шаг
+        conn.execute("PRAGMA incremental_vacuum(1)")
+        free -= 1
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _tables(conn: sqlite3.Connection) -> list[str]:
+    return [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+
+def _analyze(table: str) -> Callable[[sqlite3.Connection], None]:
+    def _run(conn: sqlite3.Connection) -> None:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT:d}")
+        conn.execute(f'ANALYZE "{table}"')
+
+    return _run
+
+
+class Maintenance:
+    """
+    Ночное обслуживание БД маленькими шагами через поток БД (db.run):
+      1) строки старше retention_days — в помесячные архивы archive_dir/<таблица>-YYYY-MM.ndjson.gz
+         и из БД (брони на будущее, недоставленное и идущие рассылки остаются);
+      2) incremental vacuum — освободившиеся страницы возвращаются ОС;
+      3) ANALYZE каждой таблицы с analysis_limit.
+    Каждый шаг — отдельная транзакция на единицы миллисекунд, между шагами пауза:
+    брони и предзаказы идут между ними. tick() вызывается из JobQueue и работает
+    только в тихие часы; план составляется раз за ночь, прерванный — продолжается.
+    """
+
+    def __init__(self, archive_dir: Path, retention_days: int, quiet_hours: tuple[int, int] = (4, 6)) -> None:
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.quiet_hours = quiet_hours
+        self._night: Optional[_dt.date] = None
+        self._plan: list[tuple[str, str]] = []
+        self._cursors: dict[str, int] = {}
+        self._stats: _Counter = _Counter()
+        self._started = 0.0
+
+    def quiet(self, now: _dt.datetime) -> bool:
+        start, end = self.quiet_hours
+        if start <= end:
+            return start <= now.hour < end
+        return now.hour >= start or now.hour < end
+
+    async def tick(self, context: object = None) -> None:
+        """Колбэк JobQueue.run_repeating."""
+        now = _dt.datetime.now()
+        if not self.quiet(now):
+            return
+        # ночь 23-5 — одна, хотя дата в полночь меняется
+        night = (now - _dt.timedelta(hours=self.quiet_hours[0])).date()
+        if night != self._night:
+            self._night = night
+            await self.plan()
+        try:
+            await self.run(TICK_SECONDS)
+        except Exception as e:
+            # следующий запуск начнёт шаг заново: он идемпотентен
+            logger.exception("❌ Обслуживание БД: %s", e)
+
+    async def plan(self) -> None:
+        self._plan = [("archive", t) for t in _ARCHIVABLE] if self.retention_days > 0 else []
+        self._plan.append(("vacuum", ""))
+        self._plan += [("analyze", t) for t in await run(_tables)]
+        self._cursors.clear()
+        self._stats.clear()
+        self._started = time.perf_counter()
+
+    async def run(self, budget: float = float("inf")) -> bool:
+        """Шаги плана, пока не кончится budget секунд. True — план выполнен."""
+        deadline = time.monotonic() + budget
+        while self._plan and time.monotonic() < deadline:
+            kind, table = self._plan[0]
+            if kind == "archive":
+                done = await self._archive_step(table)
+            elif kind == "vacuum":
+                done = await run(_vacuum_step) == 0
+            else:
+                await run(_analyze(table))
+                self._stats["analyzed"] += 1
+                done = True
+            if done:
+                self._plan.pop(0)
+                if not self._plan:
+                    self._report()
+            await asyncio.sleep(STEP_PAUSE)
+        return not self._plan
+
+    async def _archive_step(self, table: str) -> bool:
+        cutoff = (_dt.datetime.utcnow() - _dt.timedelta(days=self.retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        records, cursor, more = await run(_take(table, self._cursors.get(table, 0), cutoff))
+        self._cursors[table] = cursor
+        if records:
+            by_month: dict[str, list[dict]] = {}
+            for r in records:
+                by_month.setdefault(r["created_at"][:7], []).append(r)
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            for month, chunk in by_month.items():
+                await asyncio.to_thread(_append, self.archive_dir / f"{table}-{month}.ndjson.gz", chunk)
+            await run(_delete(table, [r["id"] for r in records]))
+            self._stats[table] += len(records)
+            ARCHIVED.inc(table, amount=len(records))
+        return not more
+
+    def _report(self) -> None:
+        archived = {t: n for t, n in self._stats.items() if t in _ARCHIVABLE}
+        logger.info(
+            "🧹 Обслуживание БД за %.1f с: в архив %s, ANALYZE таблиц: %s",
+            time.perf_counter() - self._started,
+            ", ".join(f"{t} {n}" for t, n in archived.items()) or "ничего",
+            self._stats["analyzed"],
+        )
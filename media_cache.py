@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+from telegram import Bot, InputFile, InputMediaPhoto, Message
+from telegram.error import BadRequest
+
+from db import drop_media_file_id, get_media_file_id, save_media_file_id
+
+logger = logging.getLogger("spalnik_bot.media")
+
+SendFn = Callable[[Union[InputFile, str]], Awaitable[Message]]
+
+
+# Ошибки edit_message_media, в которых file_id не виноват: перезаливать файл бессмысленно
+_EDIT_ERRORS = ("can't be edited", "to edit not found", "not modified", "no media")
+
+
+def _edit_file_rejected(e: BadRequest) -> bool:
+    msg = str(e).lower()
+    return not any(s in msg for s in _EDIT_ERRORS)
+
+
+# Ошибки отправки, в которых виноват сохранённый file_id; остальные (chat not found, ...) —
+# не повод перезаливать файл и забывать рабочий file_id
+_FILE_ID_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file",
+    "failed to get http url content",
+    "wrong type of the web page content",
+    "wrong padding",
+    "can't use file of type",
+)
+
+
+def _file_id_rejected(e: BadRequest) -> bool:
+    msg = str(e).lower()
+    return any(s in msg for s in _FILE_ID_ERRORS)
+
+
+def _photo_file_id(msg: Message) -> Optional[str]:
+    return msg.photo[-1].file_id if msg.photo else None
+
+
+def _document_file_id(msg: Message) -> Optional[str]:
+    return msg.document.file_id if msg.document else None
+
+
+class MediaCache:
+    """
+    Файл из assets/ загружается в Telegram один раз, дальше шлём его file_id.
+
+    file_id хранится в SQLite (таблица media_cache) вместе с sha256 файла:
+    если файл поменяли — хэш не совпадёт и файл уйдёт заново.
+    Если Telegram не принял сохранённый file_id — грузим байты ещё раз.
+    """
+
+    def __init__(self) -> None:
+        # path -> (mtime_ns, size, sha256): не пересчитываем хэш на каждое нажатие
+        self._digests: dict[Path, tuple[int, int, str]] = {}
+        # (path, sha256) -> file_id: горячий кэш без похода в БД
+        self._file_ids: dict[tuple[str, str], str] = {}
+
+    def _digest(self, path: Path) -> str:
+        st = path.stat()
+        cached = self._digests.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        h = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    async def _lookup(self, key: str, digest: str) -> Optional[str]:
+        file_id = self._file_ids.get((key, digest))
+        if file_id is None:
+            file_id = await get_media_file_id(key, digest)
+            if file_id:
+                self._file_ids[(key, digest)] = file_id
+        return file_id
+
+    async def _forget(self, key: str, digest: str) -> None:
+        self._file_ids.pop((key, digest), None)
+        await drop_media_file_id(key)
+
+    async def _send(
+        self,
+        path: Path,
+        send: SendFn,
+        extract: Callable[[Message], Optional[str]],
+        rejected: Callable[[BadRequest], bool] = _file_id_rejected,
+    ) -> Message:
+        key = path.name
+        digest = self._digest(path)
+
+        file_id = await self._lookup(key, digest)
+        if file_id:
+            try:
+                return await send(file_id)
+            except BadRequest as e:
+                if not rejected(e):
+                    raise
+                logger.warning("⚠️ Telegram не принял file_id для %s (%s), загружаю заново", key, e)
+                await self._forget(key, digest)
+
+        with path.open("rb") as f:
+            msg = await send(InputFile(f, filename=path.name))
+
+        new_id = extract(msg)
+        if new_id:
+            self._file_ids[(key, digest)] = new_id
+            await save_media_file_id(key, digest, new_id)
+        return msg
+
+    async def send_photo(self, bot: Bot, chat_id: int, path: Path, **kwargs) -> Message:
+        return await self._send(
+            path,
+            lambda photo: bot.send_photo(chat_id=chat_id, photo=photo, **kwargs),
+            _photo_file_id,
+        )
+
+    async def send_document(self, bot: Bot, chat_id: int, path: Path, **kwargs) -> Message:
+        return await self._send(
+            path,
+            lambda document: bot.send_document(chat_id=chat_id, document=document, **kwargs),
+            _document_file_id,
+        )
+
+    async def edit_photo(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: int,
+        path: Path,
+        caption: Optional[str] = None,
+        parse_mode: Optional[str] = None,
+        **kwargs,
+    ) -> Message:
+        """Заменить медиа существующего сообщения на фото (edit_message_media)."""
+        return await self._send(
+            path,
+            lambda photo: bot.edit_message_media(
+                chat_id=chat_id,
+                message_id=message_id,
+                media=InputMediaPhoto(photo, caption=caption, parse_mode=parse_mode),
+                **kwargs,
+            ),
+            _photo_file_id,
+            _edit_file_rejected,
+        )
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Optional
+
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import BaseRequest, RequestData
+
+from httpserver import Request, Response
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: list["_Metric"] = []
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _REGISTRY.append(self)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Счётчик с метками; значения — обычный dict, без блокировок (всё в одном event loop)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        key = tuple(str(v) for v in labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: Any) -> float:
+        return self._values.get(tuple(str(v) for v in labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v:g}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Гистограмма: счётчики по корзинам + сумма + количество (как в Prometheus)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+        # key -> [count по корзинам..., +Inf], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        key = tuple(str(v) for v in labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, (counts, total) in sorted(self._values.items()):
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                labels = _fmt_labels(self.labelnames, key, 'le="%g"' % le)
+                lines.append(f"{self.name}_bucket{labels} {acc}")
+            acc += counts[-1]
+            labels = _fmt_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {acc}")
+            labels = _fmt_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total[0]:.6f}")
+            lines.append(f"{self.name}_count{labels} {acc}")
+        return lines
+
+
+def render() -> str:
+    lines: list[str] = []
+    for m in _REGISTRY:
+        lines += m.render()
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================================
+# МЕТРИКИ БОТА
+# ==========================================================
+HANDLER_SECONDS = Histogram("spalnik_handler_seconds", "Время работы обработчика апдейта", ("handler",))
+UPDATE_WAIT_SECONDS = Histogram("spalnik_update_wait_seconds", "Ожидание апдейта в очереди чата и свободного воркера")
+HANDLER_ERRORS = Counter("spalnik_handler_errors_total", "Исключения в обработчиках", ("handler", "exception"))
+API_SECONDS = Histogram("spalnik_bot_api_seconds", "Время запроса к Bot API", ("method",))
+API_ERRORS = Counter("spalnik_bot_api_errors_total", "Ошибки запросов к Bot API", ("method", "exception"))
+PREORDERS = Counter("spalnik_preorders_total", "Принятые предзаказы")
+PREORDERS_REPRICED = Counter("spalnik_preorders_repriced_total", "Предзаказы, пересчитанные по каталогу меню")
+DUPLICATES = Counter("spalnik_duplicate_updates_total", "Повторные web_app_data, отброшенные без обработки", ("source",))
+BOOKINGS = Counter("spalnik_bookings_total", "Принятые брони")
+THROTTLED = Counter("spalnik_throttled_total", "Апдейты, отброшенные троттлингом", ("action",))
+BROADCAST = Counter("spalnik_broadcast_total", "Сообщения рассылки гостям", ("result",))
+ARCHIVED = Counter("spalnik_archived_rows_total", "Строки, перенесённые в архив обслуживанием БД", ("table",))
+NOTIFY = Counter("spalnik_notify_total", "Сообщения персоналу по чатам", ("chat_id", "result"))
+
+
+def timed_handler(callback: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Обёртка колбэка PTB: гистограмма времени и счётчик исключений по типу."""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        t0 = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except ApplicationHandlerStop:
+            # штатная остановка цепочки (троттлинг), не ошибка
+            raise
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - t0, name)
+
+    return wrapper
+
+
+# HTTP статус ответа Bot API → исключение, которое из него сделает PTB
+_STATUS_ERRORS = {400: "BadRequest", 401: "InvalidToken", 403: "Forbidden", 404: "InvalidToken", 409: "Conflict", 429: "RetryAfter"}
+
+
+class InstrumentedRequest(BaseRequest):
+    """Обёртка над HTTP слоем PTB: меряет каждый вызов Bot API по имени метода."""
+
+    def __init__(self, inner: BaseRequest) -> None:
+        self.inner = inner
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.inner.read_timeout
+
+    async def initialize(self) -> None:
+        await self.inner.initialize()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        t0 = time.perf_counter()
+        try:
+            code, payload = await self.inner.do_request(url, method, request_data, *args, **kwargs)
+        except Exception as e:
+            API_ERRORS.inc(api_method, type(e).__name__)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - t0, api_method)
+        if code >= 400:
+            API_ERRORS.inc(api_method, _STATUS_ERRORS.get(code, f"HTTP{code}"))
+        return code, payload
+
+
+async def metrics_endpoint(req: Request) -> Response:
+    return Response(200, render().encode(), "text/plain; version=0.0.4; charset=utf-8")
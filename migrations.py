@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import datetime as _dt
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Union
+
+from availability import normalize_slot
+
+logger = logging.getLogger("spalnik_bot.db")
+
+SCHEMA_FILE = Path(__file__).resolve().parent / "schema.sql"
+
+# Шаг миграции: SQL (несколько выражений через ;) или функция fn(conn)
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+def sql_statements(sql: str) -> Iterator[str]:
+    """Разбить скрипт на выражения (executescript нельзя: он сам делает COMMIT)."""
+    buf: list[str] = []
+    for line in sql.splitlines(keepends=True):
+        buf.append(line)
+        stmt = "".join(buf)
+        if sqlite3.complete_statement(stmt):
+            buf.clear()
+            stmt = stmt.strip()
+            if stmt and stmt != ";":
+                yield stmt
+    rest = "".join(buf).strip()
+    if rest:
+        yield rest
+
+
+# ==========================================================
+# 1: БАЗОВАЯ СХЕМА
+# ==========================================================
+# Колонки, которых может не быть в таблицах, созданных до миграций
+_MISSING_COLUMNS = {
+    "bookings": {
+        "canceled": "INTEGER NOT NULL DEFAULT 0",
+        "canceled_at": "TEXT",
+        "slot_at": "TEXT",
+    },
+    "outbox": {
+        "claimed_at": "REAL",
+    },
+}
+
+
+def _add_missing_columns(conn: sqlite3.Connection) -> None:
+    for table, columns in _MISSING_COLUMNS.items():
+        cols = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if not cols:
+            continue
+        for name, decl in columns.items():
+            if name not in cols:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+                logger.info("🛠 %s: добавлена колонка %s", table, name)
+
+
+def _backfill_booking_slots(conn: sqlite3.Connection) -> None:
+    """Старые брони: date/time текстом → slot_at (год угадываем от даты создания брони)."""
+    rows = conn.execute("SELECT id, date, time, created_at FROM bookings WHERE slot_at IS NULL").fetchall()
+    if not rows:
+        return
+    updates = []
+    for row in rows:
+        created = _dt.datetime.strptime(row["created_at"][:10], "%Y-%m-%d").date()
+        slot_at = normalize_slot(row["date"], row["time"], created)
+        if slot_at:
+            updates.append((slot_at, row["id"]))
+    conn.executemany("UPDATE bookings SET slot_at = ? WHERE id = ?", updates)
+    logger.info("🛠 bookings.slot_at: заполнено %s из %s, не разобрано %s", len(updates), len(rows), len(rows) - len(updates))
+
+
+def _baseline(conn: sqlite3.Connection) -> None:
+    """
+    schema.sql целиком. Все выражения в нём IF NOT EXISTS, поэтому годится и для
+    новой БД, и для созданной до миграций (user_version = 0): колонки добавляем
+    до схемы — индексы в schema.sql на них ссылаются.
+    """
+    _add_missing_columns(conn)
+    for stmt in sql_statements(SCHEMA_FILE.read_text(encoding="utf-8")):
+        conn.execute(stmt)
+    _backfill_booking_slots(conn)
+
+
+# ==========================================================
+# 4: INCREMENTAL VACUUM
+# ==========================================================
+def _incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """
+    auto_vacuum = INCREMENTAL: удалённое (архив, maintenance.py) возвращается ОС
+    маленькими шагами PRAGMA incremental_vacuum. У созданного файла режим меняет
+    только полный VACUUM — один раз, при старте, до приёма апдейтов.
+
+    VACUUM переписывает весь файл: на большой БД старт ждёт его целиком. Чтобы
+    не ждать, его можно сделать заранее при остановленном боте:
+        python -c "import db; db.init_db()"
+    Если файл держит другой процесс (воркеры кластера, бот не остановлен) —
+    migrate() откладывает миграцию до следующего старта, бот работает без неё.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    t0 = time.perf_counter()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    logger.info("🛠 БД: VACUUM за %.1f с", time.perf_counter() - t0)
+
+
+# Шаги вне транзакции (VACUUM внутри неё нельзя); должны быть идемпотентны — после сбоя повторятся.
+# БД занята (SQLITE_BUSY/LOCKED) — миграция и следующие за ней откладываются до следующего старта
+_OUTSIDE_TRANSACTION = {_incremental_vacuum}
+
+
+# ==========================================================
+# СПИСОК МИГРАЦИЙ
+# ==========================================================
+# (номер, что делает, шаг). Номера идут подряд; применённую миграцию не меняем —
+# изменения схемы дописываются новой миграцией в конец.
+MIGRATIONS: list[tuple[int, str, Step]] = [
+    (1, "базовая схема (schema.sql)", _baseline),
+    (2, "индекс броней по created_at (выгрузка /export)", """
+        CREATE INDEX IF NOT EXISTS idx_bookings_created_at ON bookings (created_at);
+    """),
+    (3, "обработанные web_app_data (защита от повторов)", """
+        CREATE TABLE IF NOT EXISTS processed_updates (
+            key        BLOB PRIMARY KEY,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_processed_updates_expires_at ON processed_updates (expires_at);
+    """),
+    (4, "auto_vacuum = INCREMENTAL", _incremental_vacuum),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def user_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection) -> list[int]:
+    """
+    Применить недостающие миграции, каждую своей транзакцией вместе с
+    PRAGMA user_version. Возвращает номера применённых.
+
+    Несколько процессов (воркеры кластера) могут стартовать одновременно:
+    версия перечитывается под BEGIN IMMEDIATE, миграцию применяет первый.
+    """
+    current = user_version(conn)
+    if current >= LATEST:
+        return []
+
+    applied = []
+    for version, title, step in MIGRATIONS:
+        if version <= current:
+            continue
+        outside = step in _OUTSIDE_TRANSACTION
+        if outside:
+            try:
+                step(conn)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                logger.warning("⚠️ БД: миграция %s (%s) отложена до следующего старта — файл занят: %s", version, title, e)
+                break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if user_version(conn) >= version:
+                conn.execute("COMMIT")
+                continue
+            if isinstance(step, str):
+                for stmt in sql_statements(step):
+                    conn.execute(stmt)
+            elif not outside:
+                step(conn)
+            conn.execute(f"PRAGMA user_version = {version:d}")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        logger.info("🛠 БД: миграция %s — %s", version, title)
+        applied.append(version)
+    return applied
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from telegram import Bot
+from telegram.error import RetryAfter
+
+from db import claim_outbox, finish_outbox, release_stale_outbox
+from metrics import NOTIFY
+from ratelimit import TelegramRateLimiter, call_with_retry
+
+logger = logging.getLogger("spalnik_bot.outbox")
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 8
+# пауза между попытками: 5 с, 10 с, 20 с ... но не больше 10 минут
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 600.0
+# как часто заглядывать в таблицу, даже если никто не будил
+IDLE_INTERVAL = 5.0
+
+
+class OutboxWorker:
+    """
+    Фоновая доставка сообщений персоналу из таблицы outbox.
+
+    Обработчики только пишут в outbox и зовут wake(); воркер забирает пачку,
+    шлёт параллельно через общий лимитер и отмечает результат. Неудачные
+    попытки откладываются с экспоненциальной паузой, после MAX_ATTEMPTS
+    сообщение уходит в 'dead'. После рестарта недоставленное продолжает уходить.
+
+    exclusive=False — outbox разбирают несколько процессов (кластер): зависшее
+    в 'sending' не возвращаем в очередь сами, его подберёт claim_outbox по таймауту.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        limiter: TelegramRateLimiter,
+        batch_size: int = BATCH_SIZE,
+        max_attempts: int = MAX_ATTEMPTS,
+        exclusive: bool = True,
+    ) -> None:
+        self.bot = bot
+        self.limiter = limiter
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.exclusive = exclusive
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def start(self) -> None:
+        if self.exclusive:
+            released = await release_stale_outbox()
+            if released:
+                logger.info("📮 Outbox: вернул в очередь %s сообщений после рестарта", released)
+        self._task = asyncio.create_task(self._run(), name="outbox-worker")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # сбрасываем до выборки: wake() во время выборки не потеряется
+            self._wake.clear()
+            try:
+                delivered = await self.deliver_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("❌ Outbox: ошибка воркера: %s", e)
+                delivered = 0
+                if self.exclusive:
+                    try:
+                        await release_stale_outbox()
+                    except Exception:
+                        pass
+
+            if delivered < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=IDLE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def deliver_batch(self) -> int:
+        """Одна пачка: возвращает, сколько сообщений было взято в работу."""
+        rows = await claim_outbox(self.batch_size)
+        if not rows:
+            return 0
+
+        results = await asyncio.gather(
+            *(self._send(r["chat_id"], r["text"]) for r in rows),
+            return_exceptions=True,
+        )
+
+        sent: list[int] = []
+        retry: list[tuple[int, str, float]] = []
+        dead: list[tuple[int, str]] = []
+        now = time.time()
+        for row, res in zip(rows, results):
+            if res is None:
+                NOTIFY.inc(row["chat_id"], "ok")
+                sent.append(row["id"])
+                continue
+            NOTIFY.inc(row["chat_id"], "error")
+            attempts = row["attempts"] + 1
+            err = f"{type(res).__name__}: {res}"
+            if attempts >= self.max_attempts:
+                logger.error("☠️ Outbox #%s в чат %s не доставлено за %s попыток: %s", row["id"], row["chat_id"], attempts, err)
+                dead.append((row["id"], err))
+            else:
+                if isinstance(res, RetryAfter):
+                    delay = float(res.retry_after)
+                else:
+                    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+                logger.warning("⚠️ Outbox #%s в чат %s: %s, повтор через %.0f с", row["id"], row["chat_id"], err, delay)
+                retry.append((row["id"], err, now + delay))
+
+        await finish_outbox(sent, retry, dead)
+        if sent:
+            logger.info("📮 Outbox: доставлено %s из %s", len(sent), len(rows))
+        return len(rows)
+
+    async def _send(self, chat_id: int, text: str) -> None:
+        # ⚠️ без ParseMode, как и в notify_staff; повторы — через next_attempt_at в БД
+        await call_with_retry(self.limiter, chat_id, lambda: self.bot.send_message(chat_id=chat_id, text=text), attempts=1)
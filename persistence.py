@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from db import load_bot_state, save_bot_state
+
+logger = logging.getLogger("spalnik_bot.persistence")
+
+Key = tuple[str, int]
+
+# Сколько чатов/пользователей помнят последний записанный JSON; давние вытесняются
+# (их данные подтянутся из БД заново при следующем апдейте)
+MAX_KEYS = 20_000
+
+
+def _dump(data: dict) -> Optional[str]:
+    # пустой dict не храним: строка удаляется
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")) if data else None
+
+
+class SqlitePersistence(BasePersistence):
+    """
+    chat_data и user_data в таблице bot_state (spalnik.db), по строке JSON на чат/пользователя.
+
+    Старт ничего не читает: get_chat_data()/get_user_data() отдают {}, а данные
+    конкретного чата подтягиваются в refresh_*_data() перед первым его апдейтом.
+    PTB раз в update_interval зовёт update_*_data() для всех чатов, где были
+    апдейты; пишем только те, чей JSON изменился, одним executemany.
+
+    Последний записанный JSON помним для max_keys недавних ключей (LRU).
+    Значения должны сериализоваться в JSON (ключи-числа станут строками).
+    bot_data, callback_data и состояния ConversationHandler не храним.
+    """
+
+    def __init__(self, update_interval: float = 10, max_keys: int = MAX_KEYS) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.max_keys = max_keys
+        # последний JSON, который лежит в БД (None — строки нет); ключ есть только у загруженных
+        self._saved: OrderedDict[Key, Optional[str]] = OrderedDict()
+        self._pending: dict[Key, Optional[str]] = {}
+        self._writer: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------
+    # загрузка: лениво, по одному чату
+    # ------------------------------------------------------
+    async def get_chat_data(self) -> dict[int, Any]:
+        return {}
+
+    async def get_user_data(self) -> dict[int, Any]:
+        return {}
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._refresh(("chat", chat_id), chat_data)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._refresh(("user", user_id), user_data)
+
+    async def _refresh(self, key: Key, data: dict) -> None:
+        if key in self._saved:
+            self._saved.move_to_end(key)
+            return
+        text = await load_bot_state(*key)
+        if key not in self._saved:
+            self._remember([(key, text)])
+        if text:
+            # то, что обработчики уже успели записать в память, не перетираем
+            for k, v in json.loads(text).items():
+                data.setdefault(k, v)
+
+    # ------------------------------------------------------
+    # запись: только изменившиеся ключи, пачкой
+    # ------------------------------------------------------
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._stage(("chat", chat_id), _dump(data))
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._stage(("user", user_id), _dump(data))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage(("chat", chat_id), None, force=True)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage(("user", user_id), None, force=True)
+
+    def _stage(self, key: Key, text: Optional[str], force: bool = False) -> None:
+        if not force:
+            # чат без обработчика: данных не загружали и не меняли — строку в БД не трогаем
+            if key not in self._saved and text is None:
+                return
+            if key in self._saved and self._saved[key] == text:
+                # вернулось к записанному: неудачная запись из очереди уже не нужна
+                self._pending.pop(key, None)
+                return
+        self._pending[key] = text
+        # PTB вызывает update_*_data пачкой через gather: задача-писатель
+        # стартует после того, как все они отработают, и пишет их разом
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write())
+
+    async def _write(self) -> None:
+        """Пишет очередь, пока она не опустеет; запись всегда одна, поэтому _saved не обгоняет БД."""
+        try:
+            while self._pending:
+                pending, self._pending = self._pending, {}
+                try:
+                    await save_bot_state([(kind, key, text) for (kind, key), text in pending.items()])
+                except Exception as e:
+                    logger.error("❌ Не смог сохранить состояние %s чатов/пользователей: %s", len(pending), e)
+                    # вернуть в очередь, если за время записи не пришло что-то новее
+                    for key, text in pending.items():
+                        if key not in self._pending:
+                            self._pending[key] = text
+                    return
+                self._remember(pending.items())
+                logger.debug("💾 Состояние: записано %s ключей", len(pending))
+        finally:
+            self._writer = None
+
+    def _remember(self, items: Iterable[tuple[Key, Optional[str]]]) -> None:
+        saved = self._saved
+        for key, text in items:
+            saved[key] = text
+            saved.move_to_end(key)
+        while len(saved) > self.max_keys:
+            saved.popitem(last=False)
+
+    async def flush(self) -> None:
+        if self._pending and self._writer is None:
+            self._writer = asyncio.create_task(self._write())
+        if self._writer is not None:
+            await self._writer
+
+    # ------------------------------------------------------
+    # не храним
+    # ------------------------------------------------------
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        pass
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Optional, Union
+
+# Telegram не пропускает web_app_data длиннее 4096 байт; всё крупнее — не от Mini App
+MAX_PAYLOAD_BYTES = 4096
+# в 4096 байт реальные позиции (id, название, qty, sum) влезают максимум сотней
+MAX_ITEMS = 100
+MAX_QTY = 99
+MAX_TEXT = 500
+
+Number = Union[int, float]
+
+
+class PreorderError(ValueError):
+    """Payload мини-аппа не проходит проверку; текст ошибки можно показать гостю."""
+
+
+class PreorderItem:
+    __slots__ = ("id", "name", "qty", "sum")
+
+    def __init__(self, id: Optional[str], name: str, qty: int, sum: Optional[Number]) -> None:
+        self.id = id
+        self.name = name
+        self.qty = qty
+        self.sum = sum
+
+    def row(self) -> tuple[Optional[str], str, int, Optional[float]]:
+        """Строка для preorder_items (item_id, name, qty, sum)."""
+        return self.id, self.name, self.qty, None if self.sum is None else float(self.sum)
+
+
+class Preorder:
+    __slots__ = ("phone", "desired_time", "comment", "total", "items", "tg_username")
+
+    def __init__(
+        self,
+        phone: str,
+        desired_time: str,
+        comment: str,
+        total: Number,
+        items: list[PreorderItem],
+        tg_username: str,
+    ) -> None:
+        self.phone = phone
+        self.desired_time = desired_time
+        self.comment = comment
+        self.total = total
+        self.items = items
+        self.tg_username = tg_username
+
+
+# ==========================================================
+# DECODER
+# ==========================================================
+# json.loads отдаёт ровно эти типы, поэтому проверки через type(), а не isinstance
+_NUMBER_TYPES = (int, float)
+
+
+def _valid_amount(x: Number) -> bool:
+    # json.loads пропускает NaN, Infinity и 1e400 (→ inf): в БД и в сообщение персоналу их не пускаем;
+    # целое длиннее float (10**400) тоже не сумма
+    try:
+        return math.isfinite(x) and x >= 0
+    except OverflowError:
+        return False
+
+
+def _text(data: dict, key: str, default: str = "", limit: int = MAX_TEXT) -> str:
+    v = data.get(key)
+    if v is None or v == "":
+        return default
+    if type(v) not in (str, int, float):
+        raise PreorderError(f"поле {key}: ожидается строка")
+    s = str(v).strip()
+    if len(s) > limit:
+        raise PreorderError(f"поле {key}: длиннее {limit} символов")
+    return s
+
+
+def _item(n: int, it: Any) -> PreorderItem:
+    if type(it) is not dict:
+        raise PreorderError(f"позиция #{n}: ожидается объект")
+    get = it.get
+
+    item_id = get("id")
+    if item_id is not None:
+        if type(item_id) is int:
+            item_id = str(item_id)
+        elif type(item_id) is not str:
+            raise PreorderError(f"позиция #{n}: некорректный id")
+
+    name = get("name") or item_id
+    if type(name) is not str:
+        raise PreorderError(f"позиция #{n}: нет названия")
+    name = name.strip()
+    if not name:
+        raise PreorderError(f"позиция #{n}: нет названия")
+    if len(name) > 200:
+        raise PreorderError(f"позиция #{n}: слишком длинное название")
+
+    qty = get("qty")
+    if type(qty) is not int:
+        if type(qty) is not float or not qty.is_integer():
+            raise PreorderError(f"позиция #{n}: количество должно быть целым от 1 до {MAX_QTY}")
+        qty = int(qty)
+    if not 1 <= qty <= MAX_QTY:
+        raise PreorderError(f"позиция #{n}: количество должно быть целым от 1 до {MAX_QTY}")
+
+    summ = get("sum")
+    if summ is not None and (type(summ) not in _NUMBER_TYPES or not _valid_amount(summ)):
+        raise PreorderError(f"позиция #{n}: некорректная сумма")
+
+    return PreorderItem(item_id, name, qty, summ)
+
+
+def decode_preorder(raw: str, max_bytes: Optional[int] = MAX_PAYLOAD_BYTES) -> Optional[Preorder]:
+    """
+    Разобрать web_app_data. None — это не предзаказ (другой type),
+    PreorderError — предзаказ, но битый.
+    """
+    # UTF-8 даёт не больше 4 байт на символ: короткие строки не кодируем
+    if max_bytes is not None and len(raw) * 4 > max_bytes and len(raw.encode("utf-8")) > max_bytes:
+        raise PreorderError(f"заказ больше {max_bytes} байт")
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise PreorderError("заказ не в формате JSON") from None
+    if type(data) is not dict:
+        raise PreorderError("заказ должен быть JSON-объектом")
+    if data.get("type") != "preorder":
+        return None
+
+    items_raw = data.get("items") or []
+    if type(items_raw) is not list:
+        raise PreorderError("items должен быть списком")
+    if len(items_raw) > MAX_ITEMS:
+        raise PreorderError(f"больше {MAX_ITEMS} позиций")
+    items = [_item(n, it) for n, it in enumerate(items_raw, 1)]
+
+    total = data.get("total", 0)
+    if type(total) not in _NUMBER_TYPES or not _valid_amount(total):
+        raise PreorderError("некорректное поле total")
+
+    tg = data.get("tg")
+    tg_username = _text(tg, "username", limit=64) if type(tg) is dict else ""
+
+    return Preorder(
+        phone=_text(data, "phone", "-", limit=32),
+        desired_time=_text(data, "desired_time", "-", limit=64),
+        comment=_text(data, "comment"),
+        total=total,
+        items=items,
+        tg_username=tg_username,
+    )
+
+
+# ==========================================================
+# RENDERING
+# ==========================================================
+# Шаблоны разбираются один раз при импорте: дальше только bound .format
+_STAFF_HEAD = (
+    "🛒 НОВЫЙ ПРЕДЗАКАЗ #{id} (Mini App)\n\n"
+    "От: {who}\n"
+    "{tg_line}"
+    "Телефон: {phone}\n"
+    "Время: {time}\n\n"
+).format
+_TG_LINE = "Telegram: @{}\n".format
+_ITEM_WITH_SUM = "- {} × {} = {} ₽".format
+_ITEM = "- {} × {}".format
+_STAFF_TAIL = "\n\nИтого: {} ₽".format
+_COMMENT = "\nКомментарий: {}".format
+
+CONFIRMATION_TEXT = "✅ Предзаказ принят! Мы скоро свяжемся."
+
+
+def render_items(order: Preorder) -> str:
+    return "\n".join([
+        _ITEM(it.name, it.qty) if it.sum is None else _ITEM_WITH_SUM(it.name, it.qty, it.sum)
+        for it in order.items
+    ])
+
+
+def render_staff(order: Preorder, who: str, preorder_id: int) -> str:
+    """Сообщение персоналу о предзаказе (без ParseMode — как отправляет outbox)."""
+    parts = [
+        _STAFF_HEAD(
+            id=preorder_id,
+            who=who,
+            tg_line=_TG_LINE(order.tg_username) if order.tg_username else "",
+            phone=order.phone,
+            time=order.desired_time,
+        ),
+        render_items(order),
+        _STAFF_TAIL(order.total),
+    ]
+    if order.comment:
+        parts.append(_COMMENT(order.comment))
+    return "".join(parts)
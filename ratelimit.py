@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+logger = logging.getLogger("spalnik_bot.ratelimit")
+
+T = TypeVar("T")
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота, ~20 в минуту в одну группу
+GLOBAL_PER_SECOND = 30
+GROUP_PER_MINUTE = 20
+
+
+class TelegramRateLimiter:
+    """
+    Скользящие окна отправок: общее на секунду и отдельное на минуту для каждой группы.
+
+    acquire(chat_id) ждёт, пока отправка в этот чат уложится в оба лимита,
+    и резервирует под неё место. Один экземпляр на всё приложение.
+    """
+
+    def __init__(self, per_second: int = GLOBAL_PER_SECOND, group_per_minute: int = GROUP_PER_MINUTE) -> None:
+        self.per_second = per_second
+        self.group_per_minute = group_per_minute
+        self._global: deque[float] = deque()
+        self._groups: dict[int, deque[float]] = {}
+        self._lock = asyncio.Lock()
+
+    def _reserve(self, chat_id: int, now: float) -> float:
+        """0 — место зарезервировано, иначе сколько секунд подождать."""
+        g = self._global
+        while g and g[0] <= now - 1.0:
+            g.popleft()
+        if len(g) >= self.per_second:
+            return g[0] + 1.0 - now
+
+        grp = None
+        if chat_id < 0:  # группы и каналы в Telegram — отрицательные id
+            grp = self._groups.get(chat_id)
+            if grp is not None:
+                while grp and grp[0] <= now - 60.0:
+                    grp.popleft()
+                if len(grp) >= self.group_per_minute:
+                    return grp[0] + 60.0 - now
+            else:
+                grp = self._groups[chat_id] = deque()
+
+        g.append(now)
+        if grp is not None:
+            grp.append(now)
+        self._prune_groups(now)
+        return 0.0
+
+    def _prune_groups(self, now: float) -> None:
+        # пустые окна не держим, чтобы словарь не рос бесконечно
+        if len(self._groups) < 256:
+            return
+        for cid in [cid for cid, d in self._groups.items() if not d or d[-1] <= now - 60.0]:
+            del self._groups[cid]
+
+    async def acquire(self, chat_id: int) -> None:
+        while True:
+            async with self._lock:
+                wait = self._reserve(chat_id, time.monotonic())
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+async def call_with_retry(
+    limiter: TelegramRateLimiter,
+    chat_id: int,
+    call: Callable[[], Awaitable[T]],
+    attempts: int = 3,
+    base_delay: float = 0.5,
+) -> T:
+    """
+    Вызов Bot API через лимитер с повторами.
+
+    RetryAfter (429) — ждём ровно retry_after; сетевые ошибки и таймауты — экспоненциальная пауза.
+    BadRequest / Forbidden не повторяем: бот не в группе, неверный chat_id и т.п.
+    """
+    for attempt in range(1, attempts + 1):
+        await limiter.acquire(chat_id)
+        try:
+            return await call()
+        except (BadRequest, Forbidden):
+            raise
+        except RetryAfter as e:
+            if attempt == attempts:
+                raise
+            delay = float(e.retry_after)
+            logger.warning("⏳ 429 для чата %s, жду %.1f с", chat_id, delay)
+        except NetworkError as e:
+            if attempt == attempts:
+                raise
+            delay = base_delay * 2 ** (attempt - 1)
+            logger.warning("⚠️ Сетевая ошибка для чата %s (%s), повтор через %.1f с", chat_id, e, delay)
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -1,3 +1,5 @@
+-- Базовая схема = миграция 1 (migrations.py). Применяется один раз; дальнейшие
+-- изменения схемы — новыми миграциями в migrations.py, не правкой этого файла.
 PRAGMA foreign_keys = ON;
 
 CREATE TABLE IF NOT EXISTS bookings (
@@ -10,5 +12,100 @@ CREATE TABLE IF NOT EXISTS bookings (
   guests INTEGER NOT NULL,
   name TEXT NOT NULL,
   phone TEXT NOT NULL,
-  comment TEXT
+  comment TEXT,
+  canceled INTEGER NOT NULL DEFAULT 0,
+  canceled_at TEXT,
+  slot_at TEXT              -- 'YYYY-MM-DDTHH:MM' из date/time (availability.normalize_slot), NULL — не разобрали
 );
+
+CREATE INDEX IF NOT EXISTS idx_bookings_slot ON bookings (slot_at);
+
+-- Кэш Telegram file_id для файлов из assets/ (ключ: путь + sha256 содержимого)
+CREATE TABLE IF NOT EXISTS media_cache (
+  path TEXT PRIMARY KEY,
+  sha256 TEXT NOT NULL,
+  file_id TEXT NOT NULL,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Outbox: сообщения персоналу, которые доставляет фоновый воркер
+-- status: pending → sending → sent, после MAX попыток → dead
+-- claimed_at: когда взято в 'sending' (брошенное после падения процесса забирается заново)
+CREATE TABLE IF NOT EXISTS outbox (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  chat_id INTEGER NOT NULL,
+  text TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  next_attempt_at REAL NOT NULL DEFAULT 0,
+  last_error TEXT,
+  claimed_at REAL,
+  sent_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+
+-- Предзаказы из Mini App
+CREATE TABLE IF NOT EXISTS preorders (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  tg_user_id INTEGER,
+  tg_username TEXT,
+  phone TEXT NOT NULL,
+  desired_time TEXT,
+  comment TEXT,
+  total REAL NOT NULL DEFAULT 0,
+  status TEXT NOT NULL DEFAULT 'open',
+  source_chat_id INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_preorders_created_at ON preorders (created_at);
+CREATE INDEX IF NOT EXISTS idx_preorders_tg_user_id ON preorders (tg_user_id);
+CREATE INDEX IF NOT EXISTS idx_preorders_phone ON preorders (phone);
+
+CREATE TABLE IF NOT EXISTS preorder_items (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  preorder_id INTEGER NOT NULL REFERENCES preorders (id) ON DELETE CASCADE,
+  item_id TEXT,
+  name TEXT NOT NULL,
+  qty INTEGER NOT NULL,
+  sum REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_preorder_items_preorder_id ON preorder_items (preorder_id);
+
+-- chat_data / user_data из PTB (persistence.py): одна строка на чат или пользователя, JSON
+CREATE TABLE IF NOT EXISTS bot_state (
+  kind TEXT NOT NULL,        -- 'chat' | 'user'
+  id INTEGER NOT NULL,
+  data TEXT NOT NULL,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+  PRIMARY KEY (kind, id)
+) WITHOUT ROWID;
+
+-- Рассылки гостям (/broadcast, broadcast.py)
+-- status: running → done | canceled; cursor — tg_user_id, до которого (включительно) рассылка прошла
+CREATE TABLE IF NOT EXISTS broadcasts (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  created_by INTEGER,        -- чат персонала, откуда запустили (туда же отчёт)
+  text TEXT NOT NULL,
+  attachment TEXT,           -- имя файла из assets/ (events.pdf) или NULL
+  status TEXT NOT NULL DEFAULT 'running',
+  cursor INTEGER NOT NULL DEFAULT 0,
+  sent INTEGER NOT NULL DEFAULT 0,
+  failed INTEGER NOT NULL DEFAULT 0,
+  blocked INTEGER NOT NULL DEFAULT 0,
+  finished_at TEXT
+);
+
+-- Гости, заблокировавшие бота: в рассылки больше не попадают
+CREATE TABLE IF NOT EXISTS blocked_users (
+  tg_user_id INTEGER PRIMARY KEY,
+  blocked_at TEXT NOT NULL DEFAULT (datetime('now')),
+  reason TEXT
+) WITHOUT ROWID;
+
+-- получатели рассылки идут по tg_user_id с курсором: range scan по индексам
+CREATE INDEX IF NOT EXISTS idx_bookings_tg_user_id ON bookings (tg_user_id);
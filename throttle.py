@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Iterable, Optional
+
+# Сколько ключей (пользователь/чат × бюджет) держим в памяти; дальше вытесняем самые давние
+MAX_KEYS = 50_000
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Token bucket: burst действий подряд, дальше rate в секунду."""
+
+    burst: float
+    rate: float
+
+
+# Дешёвые действия (ответ на колбэк, /chatid), дорогие (главный экран: фото + закреп,
+# PDF меню) и то, что уходит персоналу (предзаказ, /testnotify)
+CHEAP = Budget(burst=20, rate=1.0)
+EXPENSIVE = Budget(burst=5, rate=0.2)
+STAFF = Budget(burst=3, rate=1 / 60)
+# Предупреждение «слишком часто» — не чаще раза в 30 с на пользователя
+NOTICE = Budget(burst=1, rate=1 / 30)
+
+BUDGETS = {"cheap": CHEAP, "expensive": EXPENSIVE, "staff": STAFF, "notice": NOTICE}
+
+
+class TokenBuckets:
+    """
+    Таблица token bucket'ов с ограниченной памятью.
+
+    Ведро хранится одним float — моментом, когда оно снова будет полным
+    (как в GCRA): токенов сейчас burst - (full_at - now) * rate. Записи лежат
+    в OrderedDict по давности обращения; полное ведро ничем не отличается от
+    отсутствующего, поэтому чистка снимает с начала словаря наполнившиеся
+    и останавливается на первом ещё не полном. При переполнении max_keys
+    вытесняется самое давнее ведро (его владелец получит полное — в пользу гостя).
+    """
+
+    def __init__(self, max_keys: int = MAX_KEYS) -> None:
+        self.max_keys = max_keys
+        self._full_at: OrderedDict[Hashable, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+    def take(self, keys: Iterable[Hashable], budget: Budget, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Списать cost из всех вёдер keys разом. 0 — списано; иначе через сколько
+        секунд хватит во всех (ничего не списано).
+        """
+        if now is None:
+            now = time.monotonic()
+        full_at = self._full_at
+        keys = list(keys)
+        # сколько секунд «долга» ведро может набрать, чтобы на cost ещё хватило
+        slack = (budget.burst - cost) / budget.rate
+        starts = [max(full_at.get(k, now), now) for k in keys]
+        wait = max((t - now - slack for t in starts), default=0.0)
+        if wait > 0:
+            return wait
+
+        step = cost / budget.rate
+        for k, t in zip(keys, starts):
+            full_at[k] = t + step
+            full_at.move_to_end(k)
+        self._evict(now)
+        return 0.0
+
+    def _evict(self, now: float) -> None:
+        full_at = self._full_at
+        while full_at:
+            key, t = next(iter(full_at.items()))
+            if t > now and len(full_at) <= self.max_keys:
+                break
+            full_at.popitem(last=False)
+
+
+class FloodControl:
+    """
+    Троттлинг перед обработчиками: у каждого пользователя и каждого чата свои
+    вёдра на каждый бюджет. Действие проходит, только если токен есть и у
+    пользователя, и у чата (в личке это один и тот же id — проверяем один раз).
+
+    allow() → None, если можно; иначе (wait, notify): notify=True — раз в NOTICE
+    можно сказать пользователю «подожди», остальные отказы молча.
+    """
+
+    def __init__(self, budgets: dict[str, Budget] = BUDGETS, max_keys: int = MAX_KEYS) -> None:
+        self.budgets = budgets
+        # ключ вёдра — одно int: id * 16 + (номер бюджета * 2 + чат/пользователь), без кортежей
+        assert len(budgets) <= 8
+        self._slots = {name: i * 2 for i, name in enumerate(budgets)}
+        self._table = TokenBuckets(max_keys)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def allow(
+        self,
+        action: str,
+        user_id: Optional[int],
+        chat_id: Optional[int],
+        now: Optional[float] = None,
+    ) -> Optional[tuple[float, bool]]:
+        if now is None:
+            now = time.monotonic()
+        slot = self._slots[action]
+        keys = []
+        if user_id is not None:
+            keys.append(user_id * 16 + slot)
+        if chat_id is not None and chat_id != user_id:
+            keys.append(chat_id * 16 + slot + 1)
+        wait = self._table.take(keys, self.budgets[action], now=now)
+        if wait <= 0:
+            return None
+        who = user_id if user_id is not None else chat_id
+        notify = who is None or self._table.take([who * 16 + self._slots["notice"]], self.budgets["notice"], now=now) == 0
+        return wait, notify
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import signal
+from dataclasses import dataclass
+
+from telegram import Update
+from telegram.ext import Application
+
+from httpserver import HttpServer, Request, Response
+
+logger = logging.getLogger("spalnik_bot.webhook")
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+@dataclass
+class WebhookConfig:
+    url: str  # публичный HTTPS адрес, который отдаём Telegram в setWebhook
+    listen: str = "0.0.0.0"
+    port: int = 8080
+    path: str = "/telegram"
+    secret: str = ""
+    health_path: str = "/healthz"
+
+
+def build_routes(app: Application, cfg: WebhookConfig) -> dict:
+    """Маршруты вебхука; отдельно от сервера, чтобы другие режимы могли их дополнить."""
+
+    async def webhook(req: Request) -> Response:
+        if cfg.secret and not hmac.compare_digest(req.headers.get(SECRET_HEADER, ""), cfg.secret):
+            logger.warning("⚠️ Вебхук без верного secret token отклонён")
+            return Response(403)
+        try:
+            update = Update.de_json(req.json(), app.bot)
+        except Exception as e:
+            logger.warning("⚠️ Некорректный апдейт во вебхуке: %s", e)
+            return Response(400)
+        if update is None:
+            return Response(400)
+        await app.update_queue.put(update)
+        return Response(200)
+
+    async def health(req: Request) -> Response:
+        return Response.json(
+            {
+                "status": "ok" if app.running else "starting",
+                "mode": "webhook",
+                "pending_updates": app.update_queue.qsize(),
+            },
+            status=200 if app.running else 503,
+        )
+
+    return {
+        ("POST", cfg.path): webhook,
+        ("GET", cfg.health_path): health,
+    }
+
+
+def run_webhook(app: Application, cfg: WebhookConfig, extra_routes: dict | None = None) -> None:
+    """
+    Аналог app.run_polling(), только апдейты приходят POST-запросами от Telegram.
+
+    Жизненный цикл такой же: initialize → post_init → start → ... → stop → post_stop
+    → shutdown → post_shutdown. Останавливается по SIGINT/SIGTERM.
+    """
+    loop = asyncio.get_event_loop()
+    routes = build_routes(app, cfg)
+    if extra_routes:
+        routes.update(extra_routes)
+    server = HttpServer(routes)
+
+    def _stop() -> None:
+        raise SystemExit
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, _stop)
+        except NotImplementedError:
+            pass
+
+    try:
+        loop.run_until_complete(app.initialize())
+        if app.post_init:
+            loop.run_until_complete(app.post_init(app))
+        loop.run_until_complete(
+            app.bot.set_webhook(
+                url=cfg.url,
+                secret_token=cfg.secret or None,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        )
+        loop.run_until_complete(app.start())
+        loop.run_until_complete(server.start(cfg.listen, cfg.port))
+        logger.info("🤖 Вебхук %s → %s:%s%s", cfg.url, cfg.listen, cfg.port, cfg.path)
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Остановка вебхук-сервера")
+    finally:
+        try:
+            loop.run_until_complete(server.stop())
+            if app.running:
+                loop.run_until_complete(app.stop())
+                if app.post_stop:
+                    loop.run_until_complete(app.post_stop(app))
+            loop.run_until_complete(app.shutdown())
+            if app.post_shutdown:
+                loop.run_until_complete(app.post_shutdown(app))
+        finally:
+            loop.close()